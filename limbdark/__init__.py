@@ -1,6 +1,10 @@
-__all__ = ['interpolator', 'claret', 'util']
+__all__ = ['interpolator', 'claret', 'util', 'cache', 'stats', 'store', 'chain', 'multi']
 __version__ = '0.3.2'
 
 from .util import BANDS, LAWS
 from .interpolator import LDInterpolator
-from .claret import claret
+from .claret import claret, claret_batch
+from .chain import claret_chain
+from .multi import claret_multi
+from .cache import cache_info, clear_cache
+from .stats import LDResult
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+"""
+Limb darkening for many stars from the command line. Stars are read from a
+CSV or JSON-lines file (or stdin) with columns teff uteff logg ulogg feh ufeh,
+and optionally band, law and any other columns (e.g. an id), which are copied
+to the output. Results are written as they are computed, in blocks of stars:
+
+    limbdark batch stars.csv --band Kp -o results.jsonl
+    cat stars.jsonl | limbdark batch --band T --cov > results.csv
+"""
+
+import sys
+import csv
+import json
+import argparse
+import itertools
+import numpy as np
+
+from .claret import claret_batch, coefficient_names
+from .util import LAWS
+
+FORMATS = "csv jsonl".split()
+
+PARAMETERS = "teff uteff logg ulogg feh ufeh".split()
+
+
+def guess_format(path, default=None):
+
+    """
+    Returns csv or jsonl from the extension of path, or default if it has neither.
+    """
+
+    if path:
+        if path.endswith('.csv'):
+            return 'csv'
+        if path.endswith(('.jsonl', '.json', '.ndjson')):
+            return 'jsonl'
+
+    return default
+
+
+def sniff(lines):
+
+    """
+    Guesses the format of a stream of lines from its first line (jsonl if it
+    starts with {, else csv), returning the format and the unconsumed lines.
+    """
+
+    lines = iter(lines)
+    first = next(lines, '')
+    fmt = 'jsonl' if first.lstrip().startswith('{') else 'csv'
+
+    return fmt, itertools.chain([first], lines)
+
+
+def read_records(f, fmt=None):
+
+    """
+    Yields one dict per star from a CSV or JSON-lines stream; blank lines are skipped.
+    fmt : csv or jsonl (optional, default guesses from the first line, see sniff)
+    """
+
+    lines = (line for line in f if line.strip())
+    if fmt is None:
+        fmt, lines = sniff(lines)
+
+    if fmt == 'jsonl':
+        for line in lines:
+            yield json.loads(line)
+    elif fmt == 'csv':
+        yield from csv.DictReader(lines)
+    else:
+        raise(ValueError(f"format must be one of: {' '.join(FORMATS)}"))
+
+
+def jsonable(value):
+
+    """
+    Converts numpy scalars to JSON-serialisable values, with NaN as null.
+    """
+
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+def result_fields(laws, quantiles=None, covariance=False, transform=False):
+
+    """
+    Returns the names of the result columns evaluate() can give stars of any of `laws`.
+    """
+
+    names = []
+    for law in laws:
+        names += [name for name in coefficient_names(law, transform) if name not in names]
+
+    fields = ['band', 'law']
+    fields += [name + suffix for name in names for suffix in ['', '_std'] + ['_q{:g}'.format(q) for q in quantiles or []]]
+    if covariance:
+        for law in laws:
+            coefs = coefficient_names(law, transform)
+            fields += [a + '_' + b + '_cov' for i, a in enumerate(coefs) for b in coefs[i + 1:]]
+
+    return list(dict.fromkeys(fields + ['n_eff']))
+
+
+class RecordWriter:
+
+    """
+    Writes dicts as CSV or JSON lines. The CSV header is the fields of the first
+    record followed by `fields` (e.g. result_fields()); a later record with a
+    value for a field outside the header raises a ValueError rather than losing it.
+    """
+
+    def __init__(self, f, fmt='csv', fields=None):
+
+        if fmt not in FORMATS:
+            raise(ValueError(f"format must be one of: {' '.join(FORMATS)}"))
+        self.f = f
+        self.fmt = fmt
+        self.fields = list(fields or [])
+        self.writer = None
+
+    def write(self, records):
+
+        for record in records:
+            record = {key: jsonable(value) for key, value in record.items()}
+            if self.fmt == 'jsonl':
+                self.f.write(json.dumps(record) + '\n')
+                continue
+            if self.writer is None:
+                fieldnames = list(dict.fromkeys(list(record) + self.fields))
+                self.writer = csv.DictWriter(self.f, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+                self.writer.writeheader()
+            # fields without a value, e.g. the covariances between coefficients of different laws, can be left out
+            missing = [key for key, value in record.items() if key not in self.writer.fieldnames and value is not None]
+            if missing:
+                raise(ValueError(f"{' '.join(map(str, missing))} not in the CSV header, which was fixed by the first star; "
+                                 "write JSON lines, or give every star the same columns"))
+            self.writer.writerow({key: '' if value is None else value for key, value in record.items()})
+        self.f.flush()
+
+
+def evaluate(records, band=None, law=None, **kwargs):
+
+    """
+    Estimates limb darkening for a list of star records (dicts) with claret_batch.
+
+    band, law : used for records without a band or law of their own (law defaults to quadratic)
+    kwargs : passed to claret_batch, e.g. n, kind, transform, quantiles, covariance, seed
+
+    Returns one dict per record: its input fields followed by the results.
+    """
+
+    table = {}
+    for name in PARAMETERS:
+        try:
+            table[name] = np.array([float(r[name]) for r in records])
+        except KeyError:
+            raise(ValueError(f"star has no {name}"))
+        except (TypeError, ValueError):
+            raise(ValueError(f"{name} must be a number"))
+
+    bands = [r.get('band') or band for r in records]
+    if None in bands:
+        raise(ValueError("star has no band; give one per star or a default band"))
+    table['band'] = bands
+    table['law'] = [r.get('law') or law or 'quadratic' for r in records]
+
+    out = claret_batch(None, table, law=None, **kwargs)
+
+    return [dict(record, **dict(zip(out.dtype.names, row))) for record, row in zip(records, out.tolist())]
+
+
+def _chunks(iterable, size):
+
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(records, writer, chunk=1024, seed=None, **kwargs):
+
+    """
+    Evaluates records in blocks of `chunk` stars and writes each block as soon as it is done.
+    With a seed, every block draws from its own stream spawned from it.
+    """
+
+    seeds = np.random.SeedSequence(seed) if seed is not None else None
+    for block in _chunks(records, chunk):
+        s = seeds.spawn(1)[0] if seeds is not None else None
+        writer.write(evaluate(block, seed=s, **kwargs))
+
+
+def add_options(parser):
+
+    """
+    Adds the options shared by the batch and serve commands.
+    """
+
+    parser.add_argument('--band', help='bandpass for stars without a band column', type=str, default=None)
+    parser.add_argument('--law', help='limb-darkening law for stars without a law column', type=str, default=None)
+    parser.add_argument('--kind', help='interpolation method: linear, nearest or regular', type=str, default='nearest')
+    parser.add_argument('--xi', help='microturbulence of the grid (km/s)', type=float, default=None)
+    parser.add_argument('--method', help='fitting method of the grid: L (least squares) or F (flux conservation)', type=str, default=None)
+    parser.add_argument('--model', help='model atmospheres of the grid: ATLAS or PHOENIX', type=str, default=None)
+    parser.add_argument('--source', help='registered grid source, or directory of an ingested one, to use instead of the packaged Claret tables', type=str, default=None)
+    parser.add_argument('--dtype', help='float64, or float32 to store and interpolate the coefficients in single precision (halves the memory of regular engines; nearest ones shrink by ~20%%, linear ones by ~1%%)', type=str, default='float64')
+    parser.add_argument('-n', '--nsamples', help='number of Monte Carlo samples per star', type=int, default=int(1e4))
+    parser.add_argument('--sampler', help='random, or sobol, halton or lhs for quasi-Monte Carlo sampling', type=str, default='random')
+    parser.add_argument('--propagation', help='mc (Monte Carlo), unscented or linear', type=str, default='mc')
+    parser.add_argument('--domain', help='samples outside the grid: ignore, truncate, clamp or raise', type=str, default='ignore')
+    parser.add_argument('--blend', help='width (K) of the zone above 3500 K over which TESS samples blend the PHOENIX-COND and ATLAS grids', type=float, default=0.0)
+    parser.add_argument('--quantiles', help='comma-separated quantiles to report, e.g. 0.16,0.84', type=str, default=None)
+    parser.add_argument('--cov', help='report the covariance of each pair of coefficients', action='store_true')
+    parser.add_argument('-t', '--transform', help='transform quadratic u-space to q-space', action='store_true')
+
+
+def options(args):
+
+    """
+    Returns the evaluate() keyword arguments for parsed add_options() arguments.
+    """
+
+    quantiles = None if not args.quantiles else [float(q) for q in args.quantiles.split(',')]
+
+    return dict(band=args.band, law=args.law, kind=args.kind, xi=args.xi, method=args.method, model=args.model, source=args.source, dtype=args.dtype,
+                n=args.nsamples, sampler=args.sampler, propagation=args.propagation, domain=args.domain, blend=args.blend, quantiles=quantiles,
+                covariance=args.cov, transform=args.transform)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='limbdark batch', description="limb darkening for many stars from a CSV or JSON-lines table")
+    parser.add_argument('input', help='CSV or JSON-lines file of stars, or - for stdin', nargs='?', default='-')
+    parser.add_argument('-o', '--output', help='output file (default stdout)', type=str, default=None)
+    parser.add_argument('--input-format', help='csv or jsonl (default from the file extension or contents)', choices=FORMATS, default=None)
+    parser.add_argument('--output-format', help='csv or jsonl (default from the file extension, else the input format)', choices=FORMATS, default=None)
+    parser.add_argument('--chunk', help='number of stars evaluated and written at a time', type=int, default=1024)
+    parser.add_argument('--seed', help='random seed for reproducible results', type=int, default=None)
+    parser.add_argument('-j', '--workers', help='number of processes to evaluate stars in', type=int, default=1)
+    add_options(parser)
+    args = parser.parse_args(argv)
+
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='')
+    fout = sys.stdout if args.output is None else open(args.output, 'w', newline='')
+    try:
+        lines = (line for line in fin if line.strip())
+        in_fmt = args.input_format or guess_format(args.input)
+        if in_fmt is None:
+            in_fmt, lines = sniff(lines)
+        out_fmt = args.output_format or guess_format(args.output) or in_fmt
+        records = read_records(lines, in_fmt)
+        first = next(records, None)
+        records = [] if first is None else itertools.chain([first], records)
+
+        # a CSV header has to hold the results of every law the stars may have
+        laws = LAWS if first is not None and first.get('law') else [args.law or 'quadratic']
+        kwargs = options(args)
+        fields = result_fields(laws, kwargs['quantiles'], args.cov, args.transform)
+        run(records, RecordWriter(fout, out_fmt, fields=fields), chunk=args.chunk, seed=args.seed, workers=args.workers, **kwargs)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+Benchmarks for grid loading, interpolator construction, evaluation and
+end-to-end claret() calls. Results are stored as JSON and can be compared
+against a saved baseline to catch performance regressions:
+
+    limbdark bench -o new.json --baseline old.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+from . import __version__
+from . import util
+from .cache import clear_cache
+from .claret import claret, claret_batch
+
+
+def timeit(func, repeat=3):
+
+    """
+    Returns the best wall-clock time of `repeat` calls of func, in seconds.
+    """
+
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def bench_load(bands, laws, repeat=3):
+
+    """
+    Times compiling a packaged table into a fresh cache directory (cold) and memory-mapping it (warm).
+    """
+
+    results = {}
+    for law in laws:
+        for band in bands:
+
+            fp, by_band = util.get_source(band, law)
+            key = band if by_band else None
+
+            def cold():
+                tmp = tempfile.mkdtemp()
+                os.environ['LIMBDARK_CACHE_DIR'] = tmp
+                try:
+                    util.load_table(fp, key)
+                finally:
+                    shutil.rmtree(tmp, ignore_errors=True)
+
+            previous = os.environ.get('LIMBDARK_CACHE_DIR')
+            try:
+                results['load.cold[{}/{}]'.format(band, law)] = dict(time=timeit(cold, repeat=1))
+            finally:
+                if previous is None:
+                    os.environ.pop('LIMBDARK_CACHE_DIR', None)
+                else:
+                    os.environ['LIMBDARK_CACHE_DIR'] = previous
+
+            util.load_table(fp, key)
+            results['load.warm[{}/{}]'.format(band, law)] = dict(time=timeit(lambda: util.load_table(fp, key), repeat))
+
+    return results
+
+
+def bench_build(bands, laws, kinds, repeat=3):
+
+    results = {}
+    for law in laws:
+        for band in bands:
+            util.load_grid(band, law)
+            for kind in kinds:
+                build = lambda: util.get_interpolator(band, kind=kind, law=law, cache=False)
+                results['build[{}/{}/{}]'.format(band, law, kind)] = dict(time=timeit(build, repeat))
+
+    return results
+
+
+def bench_eval(kinds, ns, band='T', law='quadratic', repeat=3):
+
+    """
+    Times one vectorised evaluation of n random points near the Solar grid region.
+    """
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for kind in kinds:
+        engine = util.get_interpolator(band, kind=kind, law=law)
+        for n in ns[kind] if isinstance(ns, dict) else ns:
+            x = rng.normal([5500, 4.4, 0.0], [300, 0.1, 0.2], size=(n, 3))
+            t = timeit(lambda: engine(x[:, 0], x[:, 1], x[:, 2]), repeat)
+            results['eval[{}/n={}]'.format(kind, n)] = dict(time=t, rate=n / t)
+
+    return results
+
+
+def bench_claret(kinds, n, repeat=3):
+
+    results = {}
+    for kind in kinds:
+        call = lambda: claret('Kp', 4970, 120, 4.25, 0.03, 0.0, 0.2, n=n, kind=kind, seed=0)
+        call()
+        results['claret[{}/n={}]'.format(kind, n)] = dict(time=timeit(call, repeat))
+
+    return results
+
+
+def bench_batch(nstars, n, kind='regular', repeat=1):
+
+    rng = np.random.default_rng(0)
+    stars = dict(
+        teff=rng.uniform(4000, 7000, nstars), uteff=np.full(nstars, 100.0),
+        logg=rng.uniform(4.0, 4.8, nstars), ulogg=np.full(nstars, 0.1),
+        feh=rng.uniform(-0.5, 0.3, nstars), ufeh=np.full(nstars, 0.1),
+    )
+    call = lambda: claret_batch('T', stars, n=n, kind=kind, seed=0, chunksize=2**20)
+    call()
+    t = timeit(call, repeat)
+
+    return {'batch[{}/stars={}/n={}]'.format(kind, nstars, n): dict(time=t, rate=nstars / t)}
+
+
+def run(quick=False, repeat=3):
+
+    """
+    Runs the benchmark suite, returning a JSON-serialisable dict.
+    quick : fewer bands, laws and sample sizes, for a run of a few tens of seconds
+    """
+
+    if quick:
+        bands, laws = ['T', 'Kp'], ['quadratic']
+        ns = dict(nearest=[10**3, 10**5], regular=[10**3, 10**5], linear=[10**2])
+        nclaret, nstars = 10**4, 100
+    else:
+        bands, laws = ['T', 'Kp', 'V'], ['linear', 'quadratic', 'nonlinear']
+        ns = dict(nearest=[10**3, 10**4, 10**5, 10**6], regular=[10**3, 10**4, 10**5, 10**6], linear=[10**2, 10**3])
+        nclaret, nstars = 10**5, 1000
+
+    clear_cache()
+    results = {}
+    results.update(bench_load(bands, laws, repeat))
+    results.update(bench_build(bands, laws, util.KINDS, repeat))
+    results.update(bench_eval(util.KINDS, ns, repeat=repeat))
+    results.update(bench_claret(['nearest', 'regular'], nclaret, repeat))
+    results.update(bench_batch(nstars, 1000))
+
+    return dict(
+        version=__version__,
+        python=platform.python_version(),
+        numpy=np.__version__,
+        machine=platform.machine(),
+        timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'),
+        results=results,
+    )
+
+
+def compare(current, baseline, threshold=0.25):
+
+    """
+    Returns (name, baseline time, current time) for every benchmark that got
+    slower than the baseline by more than `threshold` (a fraction).
+    """
+
+    regressions = []
+    for name, result in current['results'].items():
+        if name in baseline['results']:
+            old, new = baseline['results'][name]['time'], result['time']
+            if new > old * (1 + threshold):
+                regressions.append((name, old, new))
+
+    return regressions
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='limbdark bench', description="time grid loading, interpolation and claret()")
+    parser.add_argument('-o', '--output', help='write results to this JSON file', type=str, default=None)
+    parser.add_argument('--baseline', help='JSON results to compare against', type=str, default=None)
+    parser.add_argument('--threshold', help='fractional slowdown reported as a regression', type=float, default=0.25)
+    parser.add_argument('--repeat', help='number of repetitions per benchmark (best is kept)', type=int, default=3)
+    parser.add_argument('--quick', help='run a reduced suite', action='store_true')
+    args = parser.parse_args(argv)
+
+    current = run(quick=args.quick, repeat=args.repeat)
+
+    for name, result in current['results'].items():
+        line = "{0:<40s} {1:10.4f} s".format(name, result['time'])
+        if 'rate' in result:
+            line += "  {0:12.4g} /s".format(result['rate'])
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, threshold=args.threshold)
+        for name, old, new in regressions:
+            print("REGRESSION {0}: {1:.4f} s -> {2:.4f} s ({3:+.0%})".format(name, old, new, new / old - 1))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+import threading
+from collections import OrderedDict
+from .diagnostics import current
+
+
+class InterpolatorCache:
+
+    """
+    Bounded least-recently-used cache of built interpolator engines.
+
+    maxsize : maximum number of engines to keep (optional, default is 32)
+    maxbytes : maximum total memory held by the cached engines, in bytes (optional, default is no limit)
+    """
+
+    def __init__(self, maxsize=32, maxbytes=None):
+
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @property
+    def nbytes(self):
+        return sum(getattr(engine, 'nbytes', 0) for engine in self._data.values())
+
+    def get(self, key, build):
+
+        """
+        Returns the engine stored under `key`, calling `build()` to create it on a miss.
+        """
+
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                current().count('cache_hits')
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            current().count('cache_misses')
+
+        engine = build()
+
+        with self._lock:
+            self._data[key] = engine
+            self._data.move_to_end(key)
+            self._evict()
+
+        return engine
+
+    def _evict(self):
+
+        while len(self._data) > max(self.maxsize, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+        if self.maxbytes is not None:
+            while len(self._data) > 1 and self.nbytes > self.maxbytes:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize=None, maxbytes=None):
+
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if maxbytes is not None:
+                self.maxbytes = maxbytes
+            self._evict()
+
+    def info(self):
+
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._data),
+                maxsize=self.maxsize,
+                nbytes=self.nbytes,
+                maxbytes=self.maxbytes,
+                keys=list(self._data),
+            )
+
+    def clear(self):
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+interpolator_cache = InterpolatorCache()
+
+
+def cache_info():
+
+    """
+    Returns hit/miss counts, size and memory held by the process-wide interpolator cache.
+    """
+
+    return interpolator_cache.info()
+
+
+def clear_cache():
+
+    """
+    Drops every engine from the process-wide interpolator cache and resets its counters.
+    """
+
+    interpolator_cache.clear()
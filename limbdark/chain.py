@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Limb darkening from posterior chains of stellar parameters, e.g. MCMC
+samples of (teff, logg, feh), instead of independent Gaussians. Every row of
+the chain is evaluated as is, so correlations between the parameters carry
+over to the coefficients without resampling.
+
+Chains can be arrays, .npy files (memory-mapped) or datasets of HDF5 files
+(read with h5py, which is then needed). They are read and evaluated in
+chunks, so memory stays proportional to the chunk size, not the chain length.
+"""
+
+import os
+import contextlib
+import numpy as np
+
+from .util import get_interpolator, resolve_selection, resolve_cool, resolve_dtype
+from .stats import RunningStats
+from .parallel import DEFAULT_CHUNKSIZE
+from .domain import clamp, inside, describe, warn_dropped, DOMAINS, DOMAIN_TOLERANCE
+from .diagnostics import recording, report, requested
+from .claret import coefficient_names, _coefficients, _mc_error
+
+PARAMETERS = ('teff', 'logg', 'feh')
+
+HDF5_EXTENSIONS = ('.h5', '.hdf5', '.hdf')
+
+
+def open_chain(chain, dataset=None):
+
+    """
+    Returns an array-like of chain rows that is read lazily: a memory-mapped
+    array for a .npy file, an h5py Dataset for an HDF5 file, else `chain` itself.
+    The HDF5 file stays open; close it with `rows.file.close()` when done.
+
+    chain : path to a .npy or HDF5 file, or an array (plain or structured)
+    dataset : name of the dataset in an HDF5 file (optional, default is its only dataset)
+    """
+
+    if not isinstance(chain, (str, os.PathLike)):
+        return chain
+
+    path = os.fspath(chain)
+    if os.path.splitext(path)[1].lower() not in HDF5_EXTENSIONS:
+        return np.load(path, mmap_mode='r')
+
+    try:
+        import h5py
+    except ImportError:
+        raise(ImportError("reading HDF5 chains needs h5py (pip install h5py), or save the chain as .npy"))
+
+    f = h5py.File(path, 'r')
+    if dataset is None:
+        names = [name for name in f if isinstance(f[name], h5py.Dataset)]
+        if len(names) != 1:
+            f.close()
+            raise(ValueError(f"{path} holds datasets {names}; pick one with dataset"))
+        dataset = names[0]
+
+    return f[dataset]
+
+
+@contextlib.contextmanager
+def _opened(chain, dataset=None):
+
+    """
+    Opens a chain with open_chain(), and closes the HDF5 file it opened, if any, on exit.
+    """
+
+    rows = open_chain(chain, dataset=dataset)
+    try:
+        yield rows
+    finally:
+        if isinstance(chain, (str, os.PathLike)) and hasattr(getattr(rows, 'file', None), 'close'):
+            rows.file.close()
+
+
+def _columns(rows, columns):
+
+    """
+    Returns the (m, 3) float (teff, logg, feh) samples of a chunk of chain rows:
+    fields of a structured array by name, or columns of a 2-D array by index.
+    """
+
+    names = getattr(rows.dtype, 'names', None)
+    if names:
+        columns = PARAMETERS if columns is None else columns
+        missing = [c for c in columns if c not in names]
+        if missing:
+            raise(ValueError(f"chain has no {' '.join(map(str, missing))} field; it has: {' '.join(names)}"))
+        return np.column_stack([np.asarray(rows[c], dtype=float) for c in columns])
+
+    rows = np.asarray(rows, dtype=float)
+    if rows.ndim != 2:
+        raise(ValueError("chain must be a structured array or a 2-D array of rows"))
+    columns = range(3) if columns is None else columns
+    try:
+        return rows[:, [int(c) for c in columns]]
+    except (ValueError, IndexError):
+        raise(ValueError(f"columns of a 2-D chain must be 3 indices below {rows.shape[1]}"))
+
+
+def claret_chain(band, chain, law='quadratic', kind='nearest', transform=False, xi=None, method=None, model=None, columns=None, dataset=None, thin=1, burn=0, chunksize=None, full_output=False, domain='ignore', diagnostics=None, cool='auto', blend=0.0, source=None, dtype='float64'):
+
+    """
+    Estimates limb darkening from a posterior chain of stellar parameters,
+    evaluating every (thinned) row rather than Gaussian samples, see claret().
+
+    band : photometric band. must be one of: B C H I J K Kp T R S1 S2 S3 S4 U V b g* i* r* u u* v y z*
+    chain : rows of (teff, logg, feh): a path to a .npy file (memory-mapped) or an HDF5 file, or an
+            array, either structured with teff, logg and feh fields or 2-D with one row per sample
+    columns : the three fields (structured) or column indices (2-D) holding teff, logg and feh
+              (optional, default is teff logg feh, or 0 1 2)
+    dataset : dataset of an HDF5 file (optional, default is its only dataset)
+    thin : use every thin-th row (optional, default is 1)
+    burn : number of leading rows to skip (optional, default is 0)
+    chunksize : number of rows read and evaluated at a time (optional, default is 65536)
+    domain : ignore (drop rows outside the grid), clamp (move them onto the nearest face of the grid's
+             bounding box) or raise (a ValueError if more than 0.1% of the rows are outside the box)
+             (optional, default is ignore)
+    law, kind, transform, xi, method, model, full_output, diagnostics, cool, blend, source, dtype : see claret()
+
+    Returns [mean_1, std_1, mean_2, std_2, ...] for the coefficients of the law,
+    or with full_output an LDResult, whose cov is the covariance between coefficients.
+    Its info holds n_chain, the number of rows read, n_eff, the number used (inside the grid),
+    and mcerr and mcerr_std, Monte Carlo errors estimated from the scatter between chunks
+    (batch means), which allows for autocorrelation in the chain as long as chunks are
+    much longer than its autocorrelation length; a chain read in one chunk is assumed uncorrelated.
+    """
+
+    if domain not in DOMAINS or domain == 'truncate':
+        raise(ValueError("domain must be one of: ignore clamp raise"))
+
+    if int(thin) < 1 or int(burn) < 0:
+        raise(ValueError("thin must be at least 1 and burn at least 0"))
+
+    cool = resolve_cool(band, cool, source)
+    grid = dict(band=band, law=law, kind=kind, cool=cool, **resolve_selection(band, cool=cool, xi=xi, method=method, model=model, source=source))
+    if cool == 'auto':
+        grid['blend'] = float(blend)
+    if resolve_dtype(dtype) != 'float64':
+        grid['dtype'] = resolve_dtype(dtype)
+
+    names = coefficient_names(law, transform)
+    thin, burn = int(thin), int(burn)
+    step = int(chunksize or DEFAULT_CHUNKSIZE) * thin
+    record = requested(diagnostics)
+
+    with _opened(chain, dataset) as rows, recording(record) as d, d.stage('total'):
+
+        n_chain = len(range(burn, len(rows), thin))
+        engine = get_interpolator(**grid)
+        stats = RunningStats(engine.ncoef)
+        blocks, outside = [], 0
+
+        for start in range(burn, len(rows), step):
+            with d.stage('read'):
+                samples = _columns(rows[start:start + step:thin], columns)
+            if domain != 'ignore':
+                outside += int(np.sum(~inside(samples, engine.boxes)))
+                if domain == 'raise' and outside > DOMAIN_TOLERANCE * n_chain:
+                    raise(ValueError(f"more than {DOMAIN_TOLERANCE:.2%} of the chain lies outside the grid "
+                                     f"({describe(engine.boxes)})"))
+                if domain == 'clamp':
+                    samples = clamp(samples, engine.boxes)
+            with d.stage('evaluate'):
+                u = _coefficients(engine, samples, law, transform, count=True)
+            with d.stage('reduce'):
+                block = RunningStats(engine.ncoef).update(u)
+                stats.combine(block)
+                blocks.append(block)
+
+    if domain == 'ignore':
+        warn_dropped(n_chain, stats.n)
+
+    info = dict(n_chain=n_chain, n_eff=stats.n, propagation='chain', domain=domain)
+    if domain != 'ignore':
+        info['p_inside'] = 1 - outside / n_chain if n_chain else np.nan
+    mcerr, mcerr_std = _mc_error(stats, blocks, 'chain')
+    result = stats.result(names, mcerr=mcerr, mcerr_std=mcerr_std, **info)
+
+    if d:
+        result.info['diagnostics'] = report(d, diagnostics, band=band, law=law, kind=kind)
+
+    if full_output:
+        return result
+    elif law == 'linear':
+        return tuple(result.flat())
+
+    return result.flat()
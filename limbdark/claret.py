@@ -1,11 +1,19 @@
 #!/usr/bin/env python
+import warnings
 import numpy as np
+from functools import partial
 
-from .util import u_to_q
-from .interpolator import LDInterpolator
+from .util import u_to_q, get_interpolator, resolve_selection, resolve_cool, resolve_dtype, data_digest, COEFFICIENTS
+from .stats import RunningStats, LDResult
+from .propagation import unscented, linearized, PROPAGATIONS
+from .parallel import run, spawn, DEFAULT_CHUNKSIZE
+from .sampling import standard_normal, uniform, SAMPLERS, QMC_REPLICATES
+from .domain import check, clamp, truncate, warn_dropped, DOMAINS
+from .store import get_store, make_key
+from .diagnostics import current, recording, report, requested
 
 
-def claret(band, teff, uteff, logg, ulogg, feh, ufeh, n=int(1e5), law='quadratic', kind='nearest', transform=False):
+def claret(band, teff, uteff, logg, ulogg, feh, ufeh, n=int(1e5), law='quadratic', kind='nearest', transform=False, xi=None, method=None, model=None, chunksize=None, full_output=False, seed=None, workers=1, sampler='random', propagation='mc', domain='ignore', store=None, diagnostics=None, cool='auto', blend=0.0, source=None, dtype='float64'):
 
     """
     Estimates limb darkening from stellar parameters and their 
@@ -22,42 +30,460 @@ def claret(band, teff, uteff, logg, ulogg, feh, ufeh, n=int(1e5), law='quadratic
     ufeh : uncertainty in metallicity [dex]
     n : Number of onte Carlo samples (optional, default is 10000)
     law : limb darkening law (optional, default is quadratic) must be one of: linear quadratic squareroot logarithmic nonlinear
+    kind : interpolation method (optional, default is nearest) must be one of: linear nearest regular
+    xi : microturbulence of the grid [km/s] (optional, default is 2)
+    method : fitting method of the grid, L (least squares) or F (flux conservation) (optional, default is L)
+    model : model atmospheres of the grid, ATLAS or PHOENIX (optional, default is ATLAS)
     transform : transform quadratic limb darkening parameters to q-space (optional, default is False), see https://arxiv.org/abs/1308.0009
+    chunksize : draw and evaluate samples in blocks of this size, so memory stays bounded for very large n (optional, default is all n at once)
+    full_output : return an LDResult with the covariance between coefficients instead of a list (optional, default is False)
+    seed : int, SeedSequence or Generator for reproducible sampling; each block of samples gets its own stream spawned from it (optional, default uses numpy's global random state)
+    workers : number of processes to evaluate blocks of samples in (optional, default is 1)
+    sampler : random, or sobol, halton or lhs for quasi-Monte Carlo samples, which converge faster than 1/sqrt(n) (optional, default is random)
+    propagation : mc (Monte Carlo), or unscented (7 sigma points) or linear (finite-difference Jacobian) for
+                  deterministic propagation, which is much cheaper when the uncertainties are small compared
+                  with the grid spacing; n, chunksize, seed, workers and sampler are then ignored (optional, default is mc)
+    domain : what to do with samples outside the grid, which the interpolators return as NaN (see limbdark.domain):
+             ignore (drop them), truncate (sample the normal distribution truncated to the grid's bounding box),
+             clamp (move them onto the nearest face of the box) or raise (a ValueError if more than 0.1% of the
+             input distribution is outside the box); truncate is for mc propagation only. With cool='auto', each
+             sample is held to the box of the grid its teff routes it to (optional, default is ignore)
+    store : True, a path or a store.ResultStore to keep results in a persistent on-disk store and return
+            them directly on repeated calls; only reproducible results are stored, i.e. with an int seed
+            or deterministic propagation (optional, default is not to store results)
+    diagnostics : True, or a callback taking a dict, to record the time spent in each stage, the number
+                  of samples, the number and fraction of them outside the grid (NaN, and left out of the
+                  statistics), and interpolator cache hits; they are passed to the callback, added to the
+                  LDResult's info as `diagnostics` and logged at DEBUG level to limbdark.diagnostics, which
+                  also enables them (optional, default is off)
+    cool : T band only: auto evaluates every sample on the PHOENIX-COND grid (Solar metallicity) if its own
+           teff is below 3500 K and on the ATLAS grid otherwise, True uses PHOENIX-COND and False ATLAS for
+           all samples; xi, method and model select the ATLAS grid (optional, default is auto)
+    blend : width [K] of a zone above 3500 K over which cool='auto' blends the coefficients of both grids
+            linearly, to smooth the jump between them (optional, default is 0, a sharp switch)
+    source : name of a registered grid source to use instead of the packaged Claret tables, e.g. one
+             converted with `limbdark ingest` (see limbdark.registry); cool is then ignored (optional)
+    dtype : float64, or float32 to store the grid's coefficients and interpolate them in single precision,
+            which halves the memory of kind='regular' engines; nearest and linear engines also hold the grid's
+            nodes (and linear ones its triangulation) in float64, so they shrink by ~20% and ~1% only.
+            Interpolated coefficients then differ from
+            float64 by less than 5e-7 times the largest magnitude of the coefficient, far below the 1e-4
+            rounding of the tables (optional, default is float64)
 
-    All bands come from Claret+2011, except for T (TESS), which comes from Claret 2017.
+    With a seed or several workers, samples are drawn in blocks of chunksize
+    (default 65536) with independent random streams, so the result depends on
+    the seed and chunksize but not on the number of workers.
+
+    Returns [mean_1, std_1, mean_2, std_2, ...] for the coefficients of the law.
+    With full_output, the LDResult also holds n_eff, the number of samples used (inside the grid),
+    and p_inside, the probability of the inputs inside the grid's bounding box (unless domain is ignore).
+    With full_output, the LDResult also holds mcerr and mcerr_std, the estimated
+    Monte Carlo errors of the means and stds, to help choose the smallest adequate n.
+    The LDResult's cov is the full covariance between coefficients for every propagation.
+
+    All bands come from Claret+2011, except for T (TESS), which comes from Claret 2017,
+    with ATLAS models from 3500 K and PHOENIX-COND models below.
 
     Uses tables downloaded from:
     http://vizier.u-strasbg.fr/viz-bin/VizieR?-source=J%2FA%2BA%2F529%2FA75
     http://vizier.u-strasbg.fr/viz-bin/VizieR?-source=J%2FA%2BA%2F600%2FA30
     """
 
-    if band == 'T' and teff < 3500:
-        print("Teff < 3500: assuming Solar metallicity and using PHOENIX-COND models instead of the usual ATLAS models")
-        cool = True
+    cool = resolve_cool(band, cool, source)
+    grid = dict(band=band, law=law, kind=kind, cool=cool, **resolve_selection(band, cool=cool, xi=xi, method=method, model=model, source=source))
+    if cool == 'auto':
+        grid['blend'] = float(blend)
+    if resolve_dtype(dtype) != 'float64':
+        grid['dtype'] = resolve_dtype(dtype)
+    mu = np.array([teff, logg, feh], dtype=float)
+    sigma = np.array([uteff, ulogg, ufeh], dtype=float)
+
+    names = coefficient_names(law, transform)
+
+    record = requested(diagnostics)
+
+    if domain not in DOMAINS:
+        raise(ValueError(f"domain must be one of: {' '.join(DOMAINS)}"))
+
+    if propagation == 'mc':
+        compute = partial(_monte_carlo, grid, mu, sigma, names, transform, n, chunksize, sampler, seed, workers, domain, record)
+        inputs = dict(n=int(n), chunksize=chunksize, sampler=sampler, seed=int(seed) if isinstance(seed, (int, np.integer)) else None)
+    elif propagation in PROPAGATIONS:
+        compute = partial(_deterministic, grid, mu, sigma, names, transform, propagation, domain)
+        inputs = dict()
     else:
-        cool = False
+        raise(ValueError(f"propagation must be one of: {' '.join(PROPAGATIONS)}"))
 
-    s_teff = teff + np.random.randn(n) * uteff
-    s_logg = logg + np.random.randn(n) * ulogg
-    s_feh = feh + np.random.randn(n) * ufeh
+    with recording(record) as d, d.stage('total'):
+        if store is None or store is False:
+            result = compute()
+        elif propagation == 'mc' and not isinstance(seed, (int, np.integer)):
+            warnings.warn("only results with an int seed or deterministic propagation are stored")
+            result = compute()
+        else:
+            key = make_key(grid=grid, mu=mu.tolist(), sigma=sigma.tolist(), transform=bool(transform),
+                           propagation=propagation, domain=domain, data=data_digest(band, law, cool, source), **inputs)
+            result = get_store(store).memoize(key, compute)
 
-    interp = LDInterpolator(band, law=law, kind=kind, cool=cool)
+    if d:
+        result.info['diagnostics'] = report(d, diagnostics, band=band, law=law, kind=kind)
 
-    if law == 'linear':
+    if full_output:
+        return result
+    elif law == 'linear':
+        return tuple(result.flat())
 
-        u = interp(s_teff, s_logg, s_feh)[0]
-        return np.nanmean(u), np.nanstd(u)
+    return result.flat()
 
-    elif law == 'quadratic' or law == 'squareroot' or law == 'logarithmic':
 
-        u1, u2 = interp(s_teff, s_logg, s_feh)
-        if law == 'quadratic' and transform:
-            q1, q2 = u_to_q(u1, u2)
-            return [val for u in [q1, q2] for val in [np.nanmean(u), np.nanstd(u)]]
-        else:
-            return [val for u in [u1, u2] for val in [np.nanmean(u), np.nanstd(u)]]
+def _monte_carlo(grid, mu, sigma, names, transform, n, chunksize, sampler, seed, workers, domain='ignore', record=False):
+
+    info = dict(domain=domain)
+    if domain != 'ignore':
+        engine = get_interpolator(**grid)
+        info['p_inside'] = float(check(domain, mu, sigma, engine.boxes))
+
+    plan = _plan(n, chunksize, sampler, seed, workers)
+    tasks = [(grid, mu, sigma, transform, sampler, size, s, offset, domain, record) for _, size, s, offset in plan]
+
+    replicates = {}
+    for (r, _, _, _), (block, diagnostics) in zip(plan, run(_mc_block, tasks, workers)):
+        replicates.setdefault(r, RunningStats(len(names))).combine(block)
+        current().merge(diagnostics)
+
+    stats = RunningStats(len(names))
+    for block in replicates.values():
+        stats.combine(block)
+
+    if domain == 'ignore':
+        warn_dropped(int(n), stats.n)
+
+    mcerr, mcerr_std = _mc_error(stats, list(replicates.values()), sampler)
+    return stats.result(names, mcerr=mcerr, mcerr_std=mcerr_std, sampler=sampler, propagation='mc', n_eff=stats.n, **info)
+
+
+def _deterministic(grid, mu, sigma, names, transform, propagation, domain='ignore'):
+
+    """
+    Propagates the Gaussian uncertainties with sigma points (unscented) or a
+    finite-difference Jacobian (linear): 7 interpolator evaluations in total.
+    With domain='clamp', points outside the grid are moved onto its bounding box.
+    """
+
+    if grid['kind'] == 'nearest':
+        warnings.warn("kind='nearest' is piecewise constant, so {} propagation gives zero uncertainties "
+                      "unless the points straddle a cell boundary; use kind='linear' or 'regular'".format(propagation))
+
+    if domain == 'truncate':
+        raise(ValueError("domain='truncate' needs propagation='mc'; use clamp or raise"))
+
+    engine = get_interpolator(**grid)
+    f = _deterministic_function(engine, grid['law'], transform, domain)
+    info = dict(domain=domain)
+    if domain != 'ignore':
+        info['p_inside'] = float(check(domain, mu, sigma, engine.boxes))
+
+    propagate = unscented if propagation == 'unscented' else linearized
+    with current().stage('evaluate'):
+        mean, cov = propagate(f, mu, sigma)
+
+    return LDResult(names, mean, cov, 2 * len(mu) + 1, propagation=propagation, **info)
+
+
+def _deterministic_function(engine, law, transform, domain):
+
+    """
+    Returns the function of (..., 3) points that deterministic propagation evaluates.
+    """
+
+    f = partial(_coefficients, engine, law=law, transform=transform, count=True)
+    if domain != 'clamp':
+        return f
+
+    return lambda points: f(clamp(points, engine.boxes))
+
+
+def _blocks(n, chunksize=None):
+
+    """
+    Splits n samples into blocks of at most chunksize.
+    """
+
+    n = int(n)
+    chunksize = n if not chunksize else int(chunksize)
+    for start in range(0, n, chunksize):
+        yield min(chunksize, n - start)
+
+
+def _plan(n, chunksize, sampler, seed, workers):
+
+    """
+    Splits n samples into blocks, returning (replicate, size, seed, offset) for each.
+
+    Pseudo-random blocks each get their own stream when seeded or run in parallel,
+    and otherwise use numpy's global random state. Latin hypercube blocks are
+    independent stratified designs, at least QMC_REPLICATES of them. Sobol' and
+    Halton points come from QMC_REPLICATES independently scrambled sequences,
+    each split into consecutive blocks.
+    """
+
+    n = int(n)
+
+    if sampler == 'random':
+        if seed is not None or workers > 1:
+            chunksize = chunksize or DEFAULT_CHUNKSIZE
+        sizes = list(_blocks(n, chunksize))
+        seeds = [None] * len(sizes) if seed is None and workers <= 1 else spawn(seed, len(sizes))
+        return [(0, size, s, 0) for size, s in zip(sizes, seeds)]
+
+    if sampler not in SAMPLERS:
+        raise(ValueError(f"sampler must be one of: {' '.join(SAMPLERS)}"))
+
+    if sampler == 'lhs':
+        chunksize = min(chunksize or n, -(-n // QMC_REPLICATES))
+        sizes = list(_blocks(n, chunksize))
+        return [(i, size, s, 0) for i, (size, s) in enumerate(zip(sizes, spawn(seed, len(sizes))))]
+
+    plan = []
+    for r, s in enumerate(spawn(seed, QMC_REPLICATES)):
+        offset = 0
+        for size in _blocks(n // QMC_REPLICATES + (r < n % QMC_REPLICATES), chunksize):
+            plan.append((r, size, s, offset))
+            offset += size
+
+    return plan
+
+
+def _mc_error(stats, replicates, sampler):
+
+    """
+    Estimates the Monte Carlo error of the mean and std of each coefficient: from
+    the sample variance for pseudo-random sampling, and from the scatter between
+    independent replicates for quasi-random sampling.
+    """
+
+    if sampler == 'random' or len(replicates) < 2:
+        n = max(stats.n, 1)
+        return stats.std / np.sqrt(n), stats.std / np.sqrt(2 * max(n - 1, 1))
+
+    means = np.array([r.mean for r in replicates if r.n])
+    stds = np.array([r.std for r in replicates if r.n])
+    R = len(means)
+
+    return means.std(axis=0, ddof=1) / np.sqrt(R), stds.std(axis=0, ddof=1) / np.sqrt(R)
+
+
+def _coefficients(engine, samples, law, transform=False, count=False):
+
+    """
+    Evaluates the engine on (..., 3) samples of (teff, logg, feh), returning (..., k) coefficients.
+    count : record the number of samples, and of NaN samples outside the grid, in the active diagnostics
+    """
+
+    u = engine(samples[..., 0], samples[..., 1], samples[..., 2])
+
+    if law == 'quadratic' and transform:
+        u = np.stack(u_to_q(u[..., 0], u[..., 1]), axis=-1)
+
+    d = current()
+    if count and d:
+        d.count('samples', u[..., 0].size)
+        d.count('nan', np.isnan(u).any(axis=-1).sum())
+
+    return u
+
+
+def _mc_block(task):
+
+    """
+    Draws one block of samples and returns their RunningStats, and the block's
+    diagnostics if it records them; runs in worker processes.
+    """
+
+    grid, mu, sigma, transform, sampler, size, seed, offset, domain, record = task
+
+    with recording(record) as d:
+        engine = get_interpolator(**grid)
+        with d.stage('sample'):
+            if domain == 'truncate':
+                samples = truncate(uniform(sampler, seed, size, offset=offset), mu, sigma, engine.boxes)
+            else:
+                samples = mu + standard_normal(sampler, seed, size, offset=offset) * sigma
+            if domain == 'clamp':
+                samples = clamp(samples, engine.boxes)
+        with d.stage('evaluate'):
+            u = _coefficients(engine, samples, grid['law'], transform, count=True)
+        with d.stage('reduce'):
+            stats = RunningStats(engine.ncoef).update(u)
+
+    return stats, d.to_dict()
+
+
+def _batch_block(task):
+
+    """
+    Draws (n_stars, n) samples for one chunk of stars and returns their mean,
+    std, quantiles, covariance (None unless requested) and number of samples used.
+    """
+
+    grid, mu, sigma, n, transform, quantiles, covariance, sampler, propagation, domain, seed = task
+    engine = get_interpolator(**grid)
+
+    if propagation != 'mc':
+        from scipy.special import ndtri
+        f = _deterministic_function(engine, grid['law'], transform, domain)
+        mean, cov = (unscented if propagation == 'unscented' else linearized)(f, mu, sigma)
+        std = np.sqrt(np.diagonal(cov, axis1=-2, axis2=-1))
+        qs = mean + std * ndtri(np.asarray(quantiles, dtype=float))[:, None, None]
+        return mean, std, qs, cov if covariance else None, np.full(len(mu), 2 * mu.shape[-1] + 1)
+
+    # pseudo-random samples are drawn per star, quasi-random points are shared by the chunk
+    shape = (len(mu), n, 3) if sampler == 'random' else (1, n, 3)
+    if domain == 'truncate':
+        samples = truncate(uniform(sampler, seed, shape[0] * n).reshape(shape), mu[:, None, :], sigma[:, None, :], engine.boxes)
+    else:
+        samples = mu[:, None, :] + standard_normal(sampler, seed, shape[0] * n).reshape(shape) * sigma[:, None, :]
+    if domain == 'clamp':
+        samples = clamp(samples, engine.boxes)
+    u = _coefficients(engine, samples, grid['law'], transform)
+
+    mean, std = np.nanmean(u, axis=1, dtype=float), np.nanstd(u, axis=1, dtype=float)
+    qs = np.nanquantile(u, quantiles, axis=1) if quantiles else np.empty((0,) + mean.shape)
+
+    # samples outside the grid are NaN in every coefficient
+    valid = np.isfinite(u).all(axis=-1)
+
+    cov = None
+    if covariance:
+        d = np.where(valid[..., None], u - mean[:, None, :], 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.einsum('mni,mnj->mij', d, d) / valid.sum(axis=1)[:, None, None]
+
+    return mean, std, qs, cov, valid.sum(axis=1)
+
+
+def _column(table, name):
+
+    try:
+        return np.asarray(table[name])
+    except (KeyError, ValueError, IndexError):
+        raise(ValueError(f"table has no {name} column"))
+
+
+def coefficient_names(law, transform=False):
+
+    if law == 'quadratic' and transform:
+        return ['q1', 'q2']
+
+    return COEFFICIENTS[law]
+
+
+def claret_batch(band, table, n=int(1e4), law='quadratic', kind='nearest', transform=False, quantiles=None, covariance=False, xi=None, method=None, model=None, chunksize=None, seed=None, workers=1, sampler='random', propagation='mc', domain='ignore', cool='auto', blend=0.0, source=None, dtype='float64'):
+
+    """
+    Estimates limb darkening for many stars at once, see claret().
+    Stars are grouped by band, law and grid, and every group is evaluated
+    with a single interpolator call on an (n_stars, n) array of samples.
+
+    band : photometric band, or None to read it from a band column of `table`
+    table : DataFrame, dict of arrays or structured array with columns teff uteff logg ulogg feh ufeh (and optionally band and law)
+    n : Number of Monte Carlo samples per star (optional, default is 10000)
+    law : limb darkening law, or None to read it from a law column of `table` (optional, default is quadratic)
+    quantiles : sequence of quantiles in [0, 1] to report per coefficient (optional)
+    covariance : also report the covariance of each pair of coefficients (optional, default is False)
+    chunksize : evaluate at most this many samples (stars x n) at a time (optional, default is all at once)
+    seed : int, SeedSequence or Generator for reproducible sampling; each chunk of stars gets its own stream spawned from it (optional)
+    workers : number of processes to evaluate chunks of stars in (optional, default is 1)
+    sampler : random, sobol, halton or lhs; quasi-random points are shared by the stars of a chunk (optional, default is random)
+    propagation : mc, unscented or linear, see claret(); quantiles then assume Gaussian coefficients (optional, default is mc)
+    domain : ignore, truncate, clamp or raise, see claret(); raise checks every star (optional, default is ignore)
+    cool, blend : choice of the ATLAS or PHOENIX-COND grids of the T band, see claret() (optional, default is auto)
+    source : name of a registered grid source, see claret() (optional)
+    dtype : float64 or float32, the precision of the interpolation, see claret() (optional, default is float64)
+
+    Returns a structured array, or a DataFrame if `table` is a DataFrame, with one row per star
+    and columns band, law, <coef>, <coef>_std and <coef>_q<quantile> for each coefficient,
+    and <coef1>_<coef2>_cov for each pair of coefficients with covariance, and n_eff,
+    the number of samples used for each star.
+    """
+
+    stars = {name: _column(table, name).astype(float) for name in 'teff uteff logg ulogg feh ufeh'.split()}
+    nstars = len(stars['teff'])
+
+    bands = np.asarray(_column(table, 'band') if band is None else np.full(nstars, band), dtype=str)
+    laws = np.asarray(_column(table, 'law') if law is None else np.full(nstars, law), dtype=str)
+    cools = [resolve_cool(band_, cool, source) for band_ in bands]
+    quantiles = [] if quantiles is None else list(quantiles)
+
+    names = []
+    for law_ in dict.fromkeys(laws):
+        names += [name for name in coefficient_names(law_, transform) if name not in names]
+
+    fields = [(name + suffix, float) for name in names for suffix in ['', '_std'] + ['_q{:g}'.format(q) for q in quantiles]]
+    if covariance:
+        fields += [(a + '_' + b + '_cov', float) for i, a in enumerate(names) for b in names[i + 1:]]
+    columns = [('band', 'U{}'.format(max(map(len, bands), default=1))), ('law', 'U11')] + fields + [('n_eff', int)]
+    out = np.zeros(nstars, dtype=columns)
+    out['band'], out['law'] = bands, laws
+    for name, _ in fields:
+        out[name] = np.nan
+
+    groups = {}
+    for i, key in enumerate(zip(bands, laws, cools)):
+        groups.setdefault(key, []).append(i)
+
+    mu = np.column_stack([stars[key] for key in ['teff', 'logg', 'feh']])
+    sigma = np.column_stack([stars['u' + key] for key in ['teff', 'logg', 'feh']])
+    if chunksize is None and (seed is not None or workers > 1):
+        chunksize = DEFAULT_CHUNKSIZE
+    step = max(1, int(chunksize) // int(n)) if chunksize else nstars
+
+    keys, tasks = [], []
+    for (band_, law_, cool_), group in groups.items():
+
+        selection = resolve_selection(band_, cool=cool_, xi=xi, method=method, model=model, source=source)
+        grid = dict(band=band_, law=law_, kind=kind, cool=cool_, **selection)
+        if cool_ == 'auto':
+            grid['blend'] = float(blend)
+        if resolve_dtype(dtype) != 'float64':
+            grid['dtype'] = resolve_dtype(dtype)
+
+        if domain != 'ignore':
+            engine = get_interpolator(**grid)
+            check(domain, mu[group], sigma[group], engine.boxes)
+
+        for start in range(0, len(group), step):
+            idx = np.array(group[start:start + step])
+            keys.append((law_, idx))
+            tasks.append((grid, mu[idx], sigma[idx], n, transform, quantiles, covariance, sampler, propagation, domain))
+
+    if propagation not in PROPAGATIONS:
+        raise(ValueError(f"propagation must be one of: {' '.join(PROPAGATIONS)}"))
+
+    if domain not in DOMAINS:
+        raise(ValueError(f"domain must be one of: {' '.join(DOMAINS)}"))
+
+    if domain == 'truncate' and propagation != 'mc':
+        raise(ValueError("domain='truncate' needs propagation='mc'; use clamp or raise"))
+
+    seeds = [None] * len(tasks) if seed is None and workers <= 1 and sampler == 'random' else spawn(seed, len(tasks))
+    blocks = run(_batch_block, [task + (s,) for task, s in zip(tasks, seeds)], workers)
+
+    for (law_, idx), (mean, std, qs, cov, n_eff) in zip(keys, blocks):
+        out['n_eff'][idx] = n_eff
+        coefs = coefficient_names(law_, transform)
+        for j, name in enumerate(coefs):
+            out[name][idx] = mean[:, j]
+            out[name + '_std'][idx] = std[:, j]
+            for q, values in zip(quantiles, qs):
+                out[name + '_q{:g}'.format(q)][idx] = values[:, j]
+        if covariance:
+            for i, a in enumerate(coefs):
+                for j, b in enumerate(coefs[i + 1:], i + 1):
+                    out[a + '_' + b + '_cov'][idx] = cov[:, i, j]
 
-    elif law == 'nonlinear':
+    if hasattr(table, 'iloc'):
+        import pandas as pd
+        return pd.DataFrame(out, index=table.index)
 
-        u1, u2, u3, u4 = interp(s_teff, s_logg, s_feh)
-        return [val for u in [u1, u2, u3, u4] for val in [np.nanmean(u), np.nanstd(u)]]
\ No newline at end of file
+    return out
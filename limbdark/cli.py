@@ -1,32 +1,79 @@
 #!/usr/bin/env python
 
+import sys
+import importlib
 import numpy as np
 import argparse
 from .claret import claret
+from .chain import claret_chain
 
+# subcommands, each a module with a main(argv) function
+COMMANDS = dict(
+    bench='limbdark.bench',
+    batch='limbdark.batch',
+    serve='limbdark.serve',
+    ingest='limbdark.ingest',
+)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        return importlib.import_module(COMMANDS[argv[0]]).main(argv[1:])
 
-def main():
     parser = argparse.ArgumentParser(description="retrieve limb-darkening coefficients for Kepler")
     parser.add_argument('--teff', help='effective temperature of the star -- Teff (Kelvin): mu,sigma', type=str)
     parser.add_argument('--logg', help='surface gravity of the star -- logg (cgs): mu,sigma', type=str, default=None)
     parser.add_argument('--feh', help='metallicity of the star -- [Fe/H] (dex): mu,sigma', type=str, default=None)
     parser.add_argument('--band', help='bandpass name', type=str, default='Kp')
     parser.add_argument('--law', help='limb-darkening law', type=str, default='quadratic')
+    parser.add_argument('--kind', help='interpolation method: linear, nearest or regular', type=str, default='nearest')
+    parser.add_argument('--xi', help='microturbulence of the grid (km/s)', type=float, default=None)
+    parser.add_argument('--method', help='fitting method of the grid: L (least squares) or F (flux conservation)', type=str, default=None)
+    parser.add_argument('--model', help='model atmospheres of the grid: ATLAS or PHOENIX', type=str, default=None)
+    parser.add_argument('--source', help='registered grid source, or directory of an ingested one, to use instead of the packaged Claret tables (see limbdark ingest)', type=str, default=None)
+    parser.add_argument('--dtype', help='float64, or float32 to store and interpolate the coefficients in single precision (halves the memory of regular engines; nearest ones shrink by ~20%%, linear ones by ~1%%)', type=str, default='float64')
     parser.add_argument('-n', '--nsamples', help='limb-darkening law', type=int, default=int(1e4))
+    parser.add_argument('--chunksize', help='evaluate samples in blocks of this size to bound memory', type=int, default=None)
+    parser.add_argument('-j', '--workers', help='number of processes to evaluate samples in', type=int, default=1)
+    parser.add_argument('--seed', help='random seed for reproducible results', type=int, default=None)
+    parser.add_argument('--sampler', help='random, or sobol, halton or lhs for quasi-Monte Carlo sampling', type=str, default='random')
+    parser.add_argument('--propagation', help='mc (Monte Carlo), unscented or linear', type=str, default='mc')
+    parser.add_argument('--domain', help='samples outside the grid: ignore, truncate, clamp or raise', type=str, default='ignore')
+    parser.add_argument('--blend', help='width (K) of the zone above 3500 K over which TESS samples blend the PHOENIX-COND and ATLAS grids', type=float, default=0.0)
+    parser.add_argument('--store', help='reuse results stored on disk by earlier calls (needs --seed for mc)', action='store_true')
+    parser.add_argument('--chain', help='.npy or HDF5 posterior chain of (teff, logg, feh) to use instead of --teff, --logg and --feh', type=str, default=None)
+    parser.add_argument('--dataset', help='dataset of an HDF5 chain', type=str, default=None)
+    parser.add_argument('--columns', help='comma-separated fields or column indices of teff, logg and feh in the chain', type=str, default=None)
+    parser.add_argument('--thin', help='use every thin-th row of the chain', type=int, default=1)
+    parser.add_argument('--burn', help='number of leading rows of the chain to skip', type=int, default=0)
     parser.add_argument('-t', '--transform', help='transform quadratic u-space to q-space', dest='transform', action='store_true')
     parser.set_defaults(transform=False)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     band = args.band
     nsamples = args.nsamples
     law = args.law
     transform = args.transform
 
-    teff, uteff = map(float, args.teff.split(','))
-    logg, ulogg = map(float, args.logg.split(','))
-    feh, ufeh = map(float, args.feh.split(','))
+    try:
+        if args.chain is not None:
+            columns = None if args.columns is None else [int(c) if c.isdigit() else c for c in args.columns.split(',')]
+            ld = claret_chain(band, args.chain, law=law, kind=args.kind, transform=transform, xi=args.xi, method=args.method,
+                              model=args.model, columns=columns, dataset=args.dataset, thin=args.thin, burn=args.burn,
+                              chunksize=args.chunksize, domain=args.domain, blend=args.blend, source=args.source, dtype=args.dtype)
+        else:
+            teff, uteff = map(float, args.teff.split(','))
+            logg, ulogg = map(float, args.logg.split(','))
+            feh, ufeh = map(float, args.feh.split(','))
 
-    ld = claret(band, teff, uteff, logg, ulogg, feh, ufeh, n=nsamples, law=law, transform=transform)
+            ld = claret(band, teff, uteff, logg, ulogg, feh, ufeh, n=nsamples, law=law, kind=args.kind, transform=transform,
+                        xi=args.xi, method=args.method, model=args.model, chunksize=args.chunksize,
+                        seed=args.seed, workers=args.workers, sampler=args.sampler,
+                        propagation=args.propagation, domain=args.domain, blend=args.blend, store=args.store or None,
+                        source=args.source, dtype=args.dtype)
+    except ValueError as e:
+        parser.error(str(e))
 
     if law == 'linear':
         u, u_sig = ld
@@ -48,4 +95,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Opt-in instrumentation: wall-clock time per stage (grid compilation and
+loading, grid selection, interpolator construction, sampling, evaluation,
+reduction), sample counts, the number of samples that fell outside the grid
+and came back NaN, and interpolator cache hits.
+
+Code records into the active recorder, returned by current(). When nothing is
+recording that is a shared null recorder whose methods do nothing, so the
+instrumentation costs a function call per stage.
+"""
+
+import time
+import logging
+import contextlib
+import contextvars
+
+logger = logging.getLogger('limbdark.diagnostics')
+
+
+class Diagnostics:
+
+    """
+    Accumulates stage timings (seconds) and counts.
+    """
+
+    def __init__(self):
+
+        self.timings = {}
+        self.counts = {}
+
+    def __bool__(self):
+        return True
+
+    @contextlib.contextmanager
+    def stage(self, name):
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, k=1):
+        self.counts[name] = self.counts.get(name, 0) + int(k)
+
+    def merge(self, other):
+
+        """
+        Adds the timings and counts of another Diagnostics or of its to_dict().
+        """
+
+        if other is None:
+            return self
+        if isinstance(other, Diagnostics):
+            other = other.to_dict()
+
+        for name, t in other['timings'].items():
+            self.timings[name] = self.timings.get(name, 0.0) + t
+        for name, k in other.items():
+            if name not in ('timings', 'nan_fraction'):
+                self.count(name, k)
+
+        return self
+
+    def to_dict(self):
+
+        """
+        Returns dict(timings={stage: seconds}, <count>=..., nan_fraction=...), the
+        fraction of evaluated samples that were NaN (outside the grid).
+        """
+
+        out = dict(timings=dict(self.timings), **self.counts)
+        if self.counts.get('samples'):
+            out['nan_fraction'] = self.counts.get('nan', 0) / self.counts['samples']
+
+        return out
+
+
+class NullDiagnostics:
+
+    """
+    Records nothing; active whenever diagnostics are disabled.
+    """
+
+    _stage = contextlib.nullcontext()
+
+    def __bool__(self):
+        return False
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, k=1):
+        pass
+
+    def merge(self, other):
+        return self
+
+    def to_dict(self):
+        return None
+
+
+NULL = NullDiagnostics()
+
+_current = contextvars.ContextVar('limbdark_diagnostics', default=NULL)
+
+
+def current():
+
+    """
+    Returns the active recorder: a Diagnostics inside recording(True), else a NullDiagnostics.
+    """
+
+    return _current.get()
+
+
+@contextlib.contextmanager
+def _recording():
+
+    diagnostics = Diagnostics()
+    token = _current.set(diagnostics)
+    try:
+        yield diagnostics
+    finally:
+        _current.reset(token)
+
+
+_not_recording = contextlib.nullcontext(NULL)
+
+
+def recording(enabled=True):
+
+    """
+    Makes a new Diagnostics the active recorder for the duration of the block,
+    and yields it. If not enabled, yields the null recorder and leaves the
+    active recorder alone.
+    """
+
+    return _recording() if enabled else _not_recording
+
+
+def requested(option):
+
+    """
+    Whether a `diagnostics` argument (True, or a callback) or a DEBUG level
+    on the limbdark.diagnostics logger asks for diagnostics.
+    """
+
+    return bool(option) or logger.isEnabledFor(logging.DEBUG)
+
+
+def report(diagnostics, option, **context):
+
+    """
+    Logs the diagnostics at DEBUG level and passes them to the callback, if option is one.
+    """
+
+    if not diagnostics:
+        return None
+
+    out = diagnostics.to_dict()
+    logger.debug('%s %s', ' '.join('{}={}'.format(k, v) for k, v in context.items()), out)
+    if callable(option):
+        option(out)
+
+    return out
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+What to do with the part of a star's Gaussian (teff, logg, feh) distribution
+that lies outside the grid, where the interpolators return NaN:
+
+    ignore : draw as usual and drop NaN samples from the statistics
+    truncate : draw from the normal distribution truncated to the grid's bounding box
+    clamp : move samples outside the bounding box onto its nearest face
+    raise : raise a ValueError if more than DOMAIN_TOLERANCE of the distribution is outside
+
+The domain is the bounding box of the selected grid's nodes, or for the TESS
+band with cool='auto' the box of the grid each teff is routed to, given as a
+list of boxes (see engines.Engine.boxes). Samples inside the domain but in a
+gap of a non-rectangular grid still come back NaN and are dropped, and the
+number of samples actually used is reported as n_eff.
+"""
+
+import warnings
+import numpy as np
+
+DOMAINS = "ignore truncate clamp raise".split()
+
+# largest probability outside the grid that domain='raise' accepts
+DOMAIN_TOLERANCE = 1e-3
+
+# fraction of dropped samples above which domain='ignore' warns
+DROP_WARNING = 0.01
+
+
+def standardized_bounds(mu, sigma, lower, upper):
+
+    """
+    Returns the grid bounds in units of sigma from mu, (lower - mu) / sigma and
+    (upper - mu) / sigma, broadcast over leading axes. Axes with zero sigma are
+    left unbounded: they are either inside the grid, or entirely outside it.
+    """
+
+    mu, sigma = np.asarray(mu, dtype=float), np.asarray(sigma, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(sigma > 0, (lower - mu) / sigma, -np.inf)
+        b = np.where(sigma > 0, (upper - mu) / sigma, np.inf)
+
+    return a, b
+
+
+def probability_inside(mu, sigma, lower, upper):
+
+    """
+    Probability that independent Gaussian (mu, sigma) inputs fall inside the
+    box [lower, upper], over the trailing axis.
+    """
+
+    from scipy.special import ndtr
+
+    a, b = standardized_bounds(mu, sigma, lower, upper)
+    mu = np.asarray(mu, dtype=float)
+    p = np.where(np.asarray(sigma) > 0, ndtr(b) - ndtr(a), (mu >= lower) & (mu <= upper))
+
+    return np.prod(p, axis=-1)
+
+
+def describe(boxes):
+
+    """
+    Describes a list of boxes for error messages.
+    """
+
+    return ' or '.join(f"teff, logg, feh from {lower.tolist()} to {upper.tolist()}" for lower, upper in boxes)
+
+
+def check(domain, mu, sigma, boxes):
+
+    """
+    Validates the domain policy and applies its precheck to the inputs,
+    returning their probability inside the grid's domain, a list of
+    (lower, upper) boxes that overlap at most on their faces.
+    """
+
+    if domain not in DOMAINS:
+        raise(ValueError(f"domain must be one of: {' '.join(DOMAINS)}"))
+
+    p = sum(probability_inside(mu, sigma, lower, upper) for lower, upper in boxes)
+
+    if domain == 'raise' and np.any(1 - p > DOMAIN_TOLERANCE):
+        outside = float(np.max(1 - p))
+        raise(ValueError(f"{outside:.2%} of the input distribution lies outside the grid ({describe(boxes)})"))
+
+    if domain == 'truncate' and np.any(p <= 0):
+        raise(ValueError("the input distribution lies entirely outside the grid, so it cannot be truncated to it"))
+
+    return p
+
+
+def truncate(u, mu, sigma, boxes):
+
+    """
+    Maps (..., 3) uniform variates to samples of the normal distribution of
+    (mu, sigma) truncated to a list of boxes that are disjoint in teff,
+    broadcasting mu and sigma. The teff of each sample picks its box, in
+    proportion to the probability inside each, and the other parameters are
+    truncated to that box.
+    """
+
+    from .sampling import truncated_normal
+
+    mu, sigma = np.asarray(mu, dtype=float), np.asarray(sigma, dtype=float)
+    if len(boxes) == 1:
+        a, b = standardized_bounds(mu, sigma, *boxes[0])
+        return mu + truncated_normal(u, a, b) * sigma
+
+    bounds = [standardized_bounds(mu, sigma, lower, upper) for lower, upper in boxes]
+    p = np.array([probability_inside(mu, sigma, lower, upper) for lower, upper in boxes])
+    ends = np.cumsum(p, axis=0)
+    starts = ends - p
+
+    # the box of each sample, from where its teff variate falls in the cumulative probability
+    v = u[..., 0] * ends[-1]
+    k = sum((v >= end).astype(int) for end in ends[:-1])
+    start, width = np.choose(k, list(starts)), np.choose(k, list(p))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v = np.clip((v - start) / width, 0, 1)
+
+    z = [truncated_normal(v if j == 0 else u[..., j], np.choose(k, [a[..., j] for a, _ in bounds]),
+                          np.choose(k, [b[..., j] for _, b in bounds])) for j in range(u.shape[-1])]
+
+    return mu + np.stack(z, axis=-1) * sigma
+
+
+def inside(samples, boxes):
+
+    """
+    Returns whether each of (..., 3) samples is inside one of the boxes.
+    """
+
+    samples = np.asarray(samples)
+    return np.any([np.all((samples >= lower) & (samples <= upper), axis=-1) for lower, upper in boxes], axis=0)
+
+
+def clamp(samples, boxes):
+
+    """
+    Moves (..., 3) samples outside the domain onto the nearest face of the box
+    nearest to them in teff.
+    """
+
+    samples = np.asarray(samples, dtype=float)
+    if len(boxes) == 1:
+        return np.clip(samples, *boxes[0])
+
+    teff = samples[..., 0]
+    distance = [np.maximum(np.maximum(lower[0] - teff, teff - upper[0]), 0) for lower, upper in boxes]
+    k = np.argmin(distance, axis=0)[..., None]
+
+    return np.clip(samples, np.choose(k, [lower for lower, _ in boxes]), np.choose(k, [upper for _, upper in boxes]))
+
+
+def warn_dropped(n, n_eff):
+
+    """
+    Warns, for domain='ignore', when many samples fell outside the grid and were dropped.
+    """
+
+    dropped = 1 - n_eff / n if n else 0
+    if dropped > DROP_WARNING:
+        warnings.warn("{:.1%} of the samples fell outside the grid and were dropped, which can bias the result; "
+                      "use domain='truncate', 'clamp' or 'raise' to control this".format(dropped))
@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+import numpy as np
+
+
+def rectilinear(points):
+
+    """
+    Maps scattered points onto the rectilinear grid spanned by their unique
+    coordinates along each axis. Returns the axes, the grid shape, the flat
+    grid index of every point and the strides of the flattened grid.
+    """
+
+    grid, inverse = [], []
+    for j in range(points.shape[1]):
+        axis, inv = np.unique(points[:, j], return_inverse=True)
+        grid.append(axis)
+        inverse.append(inv.ravel())
+
+    shape = tuple(len(axis) for axis in grid)
+    flat = np.ravel_multi_index(inverse, shape)
+    strides = np.array([int(np.prod(shape[j + 1:])) for j in range(len(shape))])
+
+    return grid, shape, flat, strides
+
+
+def intersect_boxes(*families):
+
+    """
+    Returns the intersections of one box of every family, where each family is
+    a list of (lower, upper) boxes, leaving out those that are empty or of zero
+    width in teff (where boxes of a family meet). Families of boxes disjoint in
+    teff give a family of boxes disjoint in teff.
+    """
+
+    boxes = families[0]
+    for family in families[1:]:
+        boxes = [(np.maximum(a, c), np.minimum(b, d)) for a, b in boxes for c, d in family]
+        boxes = [(a, b) for a, b in boxes if a[0] < b[0] and np.all(a[1:] <= b[1:])]
+
+    return boxes
+
+
+def envelope(boxes):
+
+    """
+    Returns the (lower, upper) bounding box of a non-empty list of boxes.
+    """
+
+    return np.min([a for a, _ in boxes], axis=0), np.max([b for _, b in boxes], axis=0)
+
+
+class Engine:
+
+    """
+    Vector-valued interpolator over scattered (teff, logg, feh) grid points.
+
+    The expensive work is split in two steps: `locate` finds, for each query
+    point, the grid vertices it depends on and their weights, and `apply`
+    combines those vertices' coefficient values. Calling the engine does both
+    and returns all coefficients at once, with a trailing axis of length k.
+
+    points : (N, 3) array of grid coordinates (teff, logg, feh)
+    values : (N, k) array of limb darkening coefficients at the grid points
+    dtype : float64, or float32 to store the values and combine them in single
+            precision; points are always located in double precision (optional, default is float64)
+    """
+
+    def __init__(self, points, values, dtype=float):
+
+        points = np.ascontiguousarray(points, dtype=float)
+        self.dtype = np.dtype(dtype)
+        values = np.asarray(values, dtype=self.dtype)
+        if values.ndim == 1:
+            values = values[:, None]
+
+        self.values = np.ascontiguousarray(values)
+        self.ndim = points.shape[1]
+
+        # rescale to unit range, as LinearNDInterpolator(rescale=True) does,
+        # and drop axes with a single grid value (e.g. Solar-metallicity-only
+        # grids), which would otherwise make the triangulation degenerate
+        self.offset = points.mean(axis=0)
+        scale = np.ptp(points, axis=0)
+        self.axes = np.flatnonzero(scale > 0)
+        self.scale = scale[self.axes]
+        self.points = np.ascontiguousarray((points[:, self.axes] - self.offset[self.axes]) / self.scale)
+
+        # bounding box of the grid, unbounded along the dropped axes, which do not affect the result
+        self.lower = np.where(scale > 0, points.min(axis=0), -np.inf)
+        self.upper = np.where(scale > 0, points.max(axis=0), np.inf)
+
+    @property
+    def ncoef(self):
+        return self.values.shape[1]
+
+    @property
+    def boxes(self):
+
+        """
+        The domain of the engine as a list of (lower, upper) boxes, disjoint in
+        teff but for shared faces; its bounding box for a single grid.
+        """
+
+        return [(self.lower, self.upper)]
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.values.nbytes
+
+    def _rescale(self, xi):
+        return (xi[:, self.axes] - self.offset[self.axes]) / self.scale
+
+    def layout(self, values):
+
+        """
+        Arranges an (N, k) table of values at the engine's grid points, in the
+        order it was built with, as apply() expects them.
+        """
+
+        values = np.asarray(values, dtype=self.dtype)
+        return np.ascontiguousarray(values[:, None] if values.ndim == 1 else values)
+
+    def locate(self, xi):
+
+        """
+        xi : (m, 3) array of query points
+        returns (indices, weights), both of shape (m, v); rows outside the grid have NaN weights
+        """
+
+        raise NotImplementedError
+
+    def apply(self, indices, weights, values=None):
+
+        """
+        Combines the coefficient values at `indices` with `weights`, returning an (m, k) array.
+        values : (N, k) array to use instead of the engine's own values (optional)
+        """
+
+        values = self.values if values is None else values
+        return np.einsum('mv,mvk->mk', weights.astype(values.dtype, copy=False), values[indices])
+
+    def __call__(self, teff, logg, feh):
+
+        teff, logg, feh = np.broadcast_arrays(teff, logg, feh)
+        shape = teff.shape
+        xi = np.stack([teff.ravel(), logg.ravel(), feh.ravel()], axis=-1).astype(float)
+        out = self.apply(*self.locate(xi))
+        return out.reshape(shape + (self.ncoef,))
+
+
+class LinearEngine(Engine):
+
+    """
+    Piecewise linear (barycentric) interpolation on a single Delaunay triangulation.
+    """
+
+    def __init__(self, points, values, dtype=float):
+
+        from scipy.spatial import Delaunay
+
+        super().__init__(points, values, dtype=dtype)
+        self.tri = Delaunay(self.points)
+        # the triangulation keeps its own copy of the rescaled points; hold only that one
+        self.points = self.tri.points
+
+    @property
+    def nbytes(self):
+
+        # the arrays qhull and find_simplex keep besides the points;
+        # vertex_to_simplex only once something has asked for it
+        tri = self.tri
+        arrays = [tri.simplices, tri.neighbors, tri.equations, tri.transform, tri.coplanar,
+                  getattr(tri, '_vertex_to_simplex', None)]
+        return super().nbytes + sum(a.nbytes for a in arrays if a is not None)
+
+    def locate(self, xi):
+
+        x = self._rescale(xi)
+        d = x.shape[1]
+        simplex = self.tri.find_simplex(x)
+        outside = simplex < 0
+
+        T = self.tri.transform[simplex]
+        b = np.einsum('mij,mj->mi', T[:, :d, :], x - T[:, d, :])
+        weights = np.concatenate([b, 1 - b.sum(axis=1, keepdims=True)], axis=1)
+        weights[outside] = np.nan
+        indices = self.tri.simplices[simplex]
+
+        return indices, weights
+
+
+class NearestEngine(Engine):
+
+    """
+    Nearest grid point lookup (in rescaled coordinates).
+
+    The distance is separable across axes, so wherever the node nearest along
+    every axis exists in the table it is the nearest point overall; those
+    queries are a searchsorted per axis. Queries whose per-axis nearest node is
+    a hole in the grid fall back to a k-d tree, built on first use.
+    """
+
+    def __init__(self, points, values, dtype=float):
+
+        super().__init__(points, values, dtype=dtype)
+
+        points = np.ascontiguousarray(points, dtype=float)
+        self.grid, self.shape, flat, self.strides = rectilinear(points)
+        self.midpoints = [(axis[1:] + axis[:-1]) / 2 for axis in self.grid]
+
+        # row of the first point at every grid node, -1 for holes
+        self.nodes = np.full(int(np.prod(self.shape)), -1, dtype=np.intp)
+        self.nodes[flat[::-1]] = np.arange(len(flat))[::-1]
+        self._tree = None
+
+    @property
+    def tree(self):
+
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(self.points)
+
+        return self._tree
+
+    @property
+    def nbytes(self):
+        return super().nbytes + self.nodes.nbytes
+
+    def locate(self, xi):
+
+        finite = np.isfinite(xi[:, self.axes]).all(axis=1)
+        flat = np.zeros(xi.shape[0], dtype=np.intp)
+        for j in self.axes:
+            flat += np.searchsorted(self.midpoints[j], xi[:, j]) * self.strides[j]
+
+        indices = self.nodes[flat][:, None]
+        weights = np.ones(indices.shape)
+
+        holes = finite & (indices[:, 0] < 0)
+        if np.any(holes):
+            indices[holes, 0] = self.tree.query(self._rescale(xi[holes]))[1]
+
+        indices[~finite] = 0
+        weights[~finite] = np.nan
+
+        return indices, weights
+
+
+class RegularEngine(Engine):
+
+    """
+    Trilinear interpolation on the rectilinear grid spanned by the unique
+    (teff, logg, feh) values of the table. Missing grid nodes are NaN holes in
+    a dense cube, so any query whose cell touches a hole returns NaN. Where
+    several rows share a node, the first one is used.
+    """
+
+    def __init__(self, points, values, dtype=float):
+
+        super().__init__(points, values, dtype=dtype)
+
+        # queries are located on self.grid, so the scattered points are not kept
+        points = np.ascontiguousarray(points, dtype=float)
+        self.points = None
+        self.grid, self.shape, flat, self.strides = rectilinear(points)
+        _, self.first = np.unique(flat, return_index=True)
+        self.cells = flat[self.first]
+
+        self.values = self.layout(self.values)
+        self.mask = ~np.isfinite(self.values).all(axis=1).reshape(self.shape)
+
+        # the 2**d cell corners, and their offsets in the flattened cube
+        corners = np.array(np.meshgrid(*[[0, 1] if n > 1 else [0] for n in self.shape], indexing='ij'))
+        self.corners = corners.reshape(self.ndim, -1).T
+        self.offsets = self.corners @ self.strides
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + sum(axis.nbytes for axis in self.grid)
+
+    def layout(self, values):
+
+        values = super().layout(values)
+        cube = np.full((int(np.prod(self.shape)), values.shape[1]), np.nan, dtype=self.dtype)
+        cube[self.cells] = values[self.first]
+
+        return cube
+
+    def locate(self, xi):
+
+        m = xi.shape[0]
+        base = np.zeros(m, dtype=np.intp)
+        frac = np.zeros((self.ndim, m))
+        outside = np.zeros(m, dtype=bool)
+
+        for j in self.axes:
+            axis = self.grid[j]
+            x = xi[:, j]
+            i = np.searchsorted(axis, x, side='right') - 1
+            np.clip(i, 0, len(axis) - 2, out=i)
+            base += i * self.strides[j]
+            frac[j] = (x - axis[i]) / (axis[i + 1] - axis[i])
+            outside |= ~((x >= axis[0]) & (x <= axis[-1]))
+
+        indices = np.empty((m, len(self.corners)), dtype=np.intp)
+        weights = np.ones((m, len(self.corners)))
+        for c, corner in enumerate(self.corners):
+            indices[:, c] = base + self.offsets[c]
+            for j in self.axes:
+                weights[:, c] *= frac[j] if corner[j] else 1 - frac[j]
+        weights[outside] = np.nan
+
+        return indices, weights
+
+    def apply(self, indices, weights, values=None):
+
+        # holes only poison the result through corners with non-zero weight
+        values = self.values if values is None else values
+        holes = ~np.isfinite(values).all(axis=1)
+        filled = np.where(holes[:, None], 0, values)
+
+        out = np.zeros((indices.shape[0], values.shape[1]), dtype=values.dtype)
+        bad = np.zeros(indices.shape[0], dtype=bool)
+        for c in range(indices.shape[1]):
+            idx, w = indices[:, c], weights[:, c].astype(values.dtype, copy=False)
+            out += w[:, None] * filled[idx]
+            bad |= holes[idx] & (w != 0)
+        out[bad] = np.nan
+
+        return out
+
+
+class SplitEngine:
+
+    """
+    Routes every query point to one of two engines by its own teff: `cool`
+    below `boundary` and `hot` above it. Over [boundary, boundary + blend] the
+    coefficients of both engines are blended linearly, from cool to hot.
+    Each point is evaluated on a single engine, except inside the blend zone.
+
+    cool, hot : engines with the same number of coefficients
+    boundary : teff of the switch [K]
+    blend : width of the blend zone [K] (optional, default is 0, a sharp switch)
+    """
+
+    def __init__(self, cool, hot, boundary, blend=0.0):
+
+        if cool.ncoef != hot.ncoef:
+            raise(ValueError("the engines must have the same number of coefficients"))
+
+        self.cool = cool
+        self.hot = hot
+        self.boundary = float(boundary)
+        self.blend = float(blend)
+
+        # each point is inside the box of the engine it is routed to, or of both in the blend zone;
+        # the grids differ in more than teff (PHOENIX-COND has no feh axis and reaches higher logg)
+        def slab(lower, upper):
+            return [(np.array([lower] + [-np.inf] * (len(hot.lower) - 1)), np.array([upper] + [np.inf] * (len(hot.upper) - 1)))]
+
+        self.boxes = intersect_boxes(cool.boxes, slab(-np.inf, self.boundary))
+        if self.blend > 0:
+            self.boxes += intersect_boxes(cool.boxes, hot.boxes, slab(self.boundary, self.boundary + self.blend))
+        self.boxes += intersect_boxes(hot.boxes, slab(self.boundary + self.blend, np.inf))
+
+        # bounding box of the union of both grids
+        self.lower, self.upper = envelope(self.boxes)
+
+    @property
+    def ncoef(self):
+        return self.hot.ncoef
+
+    @property
+    def dtype(self):
+        return np.result_type(self.cool.dtype, self.hot.dtype)
+
+    @property
+    def nbytes(self):
+        return self.cool.nbytes + self.hot.nbytes
+
+    def weight(self, teff):
+
+        """
+        Returns the weight of the hot engine at each teff (NaN for NaN teff).
+        """
+
+        teff = np.asarray(teff, dtype=float)
+        if self.blend > 0:
+            w = np.clip((teff - self.boundary) / self.blend, 0, 1)
+        else:
+            w = (teff >= self.boundary).astype(float)
+
+        return np.where(np.isnan(teff), np.nan, w)
+
+    def __call__(self, teff, logg, feh):
+
+        teff, logg, feh = np.broadcast_arrays(teff, logg, feh)
+        shape = teff.shape
+        teff, logg, feh = teff.ravel(), logg.ravel(), feh.ravel()
+
+        w = self.weight(teff)
+        out = np.zeros((len(w), self.ncoef), dtype=self.dtype)
+
+        i = np.flatnonzero(w < 1)
+        if len(i):
+            out[i] += (1 - w[i])[:, None] * self.cool(teff[i], logg[i], feh[i])
+        i = np.flatnonzero(w > 0)
+        if len(i):
+            out[i] += w[i][:, None] * self.hot(teff[i], logg[i], feh[i])
+        out[np.isnan(w)] = np.nan
+
+        return out.reshape(shape + (self.ncoef,))
+
+
+class SharedEngine:
+
+    """
+    Evaluates several coefficient tables at once, e.g. several bands and laws.
+    Tables on the same grid points share an engine: each query point is
+    located once, and its vertices and weights are applied to every table.
+    Calling it returns the coefficients of all tables side by side, along a
+    trailing axis, in the order of their positions.
+
+    groups : list of (engine, [(position, values), ...]), where values is an
+             (N, k) table in the engine's layout (see Engine.layout), or None
+             for the engine's own values. Engines without locate (SplitEngine)
+             take a single table, their own.
+    """
+
+    def __init__(self, groups):
+
+        self.groups = [(engine, list(tables)) for engine, tables in groups]
+
+        # coefficients per table, by position
+        sizes = {}
+        for engine, tables in self.groups:
+            for position, values in tables:
+                sizes[position] = engine.ncoef if values is None else values.shape[1]
+        self.sizes = [sizes[i] for i in range(len(sizes))]
+
+        # the part of the domain inside every grid
+        self.boxes = intersect_boxes(*[engine.boxes for engine, _ in self.groups])
+        if self.boxes:
+            self.lower, self.upper = envelope(self.boxes)
+        else:
+            self.lower = np.max([engine.lower for engine, _ in self.groups], axis=0)
+            self.upper = np.min([engine.upper for engine, _ in self.groups], axis=0)
+
+    @property
+    def ncoef(self):
+        return sum(self.sizes)
+
+    @property
+    def nbytes(self):
+        return sum(engine.nbytes + sum(values.nbytes for _, values in tables if values is not None)
+                   for engine, tables in self.groups)
+
+    def slices(self):
+
+        """
+        Returns the slice of the trailing axis holding each table's coefficients.
+        """
+
+        ends = np.cumsum([0] + self.sizes)
+        return [slice(a, b) for a, b in zip(ends[:-1], ends[1:])]
+
+    def __call__(self, teff, logg, feh):
+
+        teff, logg, feh = np.broadcast_arrays(teff, logg, feh)
+        shape = teff.shape
+        xi = np.stack([teff.ravel(), logg.ravel(), feh.ravel()], axis=-1).astype(float)
+
+        out = [None] * len(self.sizes)
+        for engine, tables in self.groups:
+            if not hasattr(engine, 'locate'):
+                (position, _), = tables
+                out[position] = engine(xi[:, 0], xi[:, 1], xi[:, 2])
+                continue
+            indices, weights = engine.locate(xi)
+            for position, values in tables:
+                out[position] = engine.apply(indices, weights, values=values)
+
+        return np.concatenate(out, axis=-1).reshape(shape + (self.ncoef,))
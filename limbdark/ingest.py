@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+Converts a coefficient table (CSV, optionally gzipped, or a VizieR
+tab-separated download) into a grid source that limbdark can interpolate:
+
+    limbdark ingest table3.tsv --name claret2021 --law quadratic --reference "Claret 2021"
+    limbdark ingest synth.csv --name mysynth --law nonlinear --band CHEOPS --columns teff=T,feh=MH
+    limbdark --source claret2021 --band CHEOPS --teff 5500,100 --logg 4.4,0.1 --feh 0,0.1
+
+Every law is ingested separately, into the same source. Tables are stored
+in grids_dir()/<name> (see limbdark.registry), as one .npy file per law and
+band, memory-mapped when loaded, with a meta.json describing them.
+"""
+
+import os
+import csv
+import gzip
+import json
+import time
+import hashlib
+import urllib.parse
+import argparse
+import numpy as np
+
+from . import registry
+from .cache import clear_cache
+from .util import COEFFICIENTS, LAWS, GRID_FORMAT, MODELS, _save, _table_name
+
+FORMATS = "csv vizier".split()
+
+# accepted spellings of each column, matched case-insensitively
+ALIASES = dict(
+    teff=['teff', 't_eff', 'temperature'],
+    logg=['logg', 'log(g)', 'log_g'],
+    feh=['feh', '[fe/h]', 'z', '[m/h]', 'mh', 'metallicity'],
+    xi=['xi', 'vturb', 'vtur', 'microturbulence'],
+    band=['band', 'filt', 'filter', 'passband'],
+    method=['method', 'met'],
+    model=['model', 'mod'],
+)
+
+# the coefficient columns of Claret's tables on VizieR
+COEFFICIENT_ALIASES = dict(
+    linear=[['u', 'a', 'ua']],
+    quadratic=[['u1', 'a', 'aq'], ['u2', 'b', 'bq']],
+    squareroot=[['u1', 'c', 'cs'], ['u2', 'd', 'ds']],
+    logarithmic=[['u1', 'e', 'el'], ['u2', 'f', 'fl']],
+    nonlinear=[['u1', 'a1', 'a1la'], ['u2', 'a2', 'a2la'], ['u3', 'a3', 'a3la'], ['u4', 'a4', 'a4la']],
+)
+
+
+def _open(path):
+    return gzip.open(path, 'rt') if path.endswith('.gz') else open(path, newline='')
+
+
+def _array(header, rows):
+
+    """
+    Builds a structured array from rows of strings: float columns where every
+    value is numeric (blanks are NaN), and fixed-width strings otherwise.
+    """
+
+    columns = list(zip(*rows)) if rows else [()] * len(header)
+    fields = []
+    for name, values in zip(header, columns):
+        try:
+            fields.append((name, np.array([float(v) if v.strip() else np.nan for v in values])))
+        except ValueError:
+            fields.append((name, np.array([v.strip() for v in values])))
+
+    out = np.zeros(len(rows), dtype=[(name, column.dtype) for name, column in fields])
+    for name, column in fields:
+        out[name] = column
+
+    return out
+
+
+def read_csv(path):
+
+    """
+    Reads a (gzipped) CSV table with a header row.
+    """
+
+    with _open(path) as f:
+        rows = [row for row in csv.reader(f) if row]
+
+    return _array([name.strip() for name in rows[0]], rows[1:])
+
+
+def read_vizier(path):
+
+    """
+    Reads a VizieR tab-separated (or semicolon- or |-separated) download: comment
+    lines starting with #, a header row, optionally a units row and a row of
+    dashes, then the data.
+    """
+
+    with _open(path) as f:
+        lines = [line.rstrip('\r\n') for line in f if line.strip() and not line.startswith('#')]
+
+    delimiter = next((d for d in '\t;|' if d in lines[0]), '\t')
+    rows = [[value.strip() for value in line.split(delimiter)] for line in lines]
+    header, rows = rows[0], rows[1:]
+
+    # the units row and the row of dashes below the header
+    for i, row in enumerate(rows[:2]):
+        if all(set(value) <= set('-') for value in row):
+            rows = rows[i + 1:]
+            break
+
+    return _array(header, rows)
+
+
+def read_table(path, fmt=None):
+
+    """
+    Reads a table to ingest, in fmt csv or vizier (optional, default guesses .tsv and .tab as vizier).
+    """
+
+    if fmt is None:
+        fmt = 'vizier' if path.replace('.gz', '').endswith(('.tsv', '.tab')) else 'csv'
+
+    if fmt not in FORMATS:
+        raise(ValueError(f"format must be one of: {' '.join(FORMATS)}"))
+
+    return read_csv(path) if fmt == 'csv' else read_vizier(path)
+
+
+def _find(names, wanted, aliases):
+
+    lower = {name.lower(): name for name in names}
+    for alias in [wanted] + aliases:
+        if alias.lower() in lower:
+            return lower[alias.lower()]
+
+    return None
+
+
+def standardize(table, law, band=None, columns=None):
+
+    """
+    Returns the table with the columns limbdark expects: teff, logg, feh, the
+    coefficients of the law (e.g. u1 u2), and band, xi, method and model if present.
+
+    columns : dict of limbdark column -> column of the table, for names ALIASES does not cover (optional)
+    band : band of every row, for tables without a band column (optional)
+    """
+
+    if law not in LAWS:
+        raise(ValueError(f"law must be one of: {' '.join(LAWS)}"))
+
+    columns = dict(columns or {})
+    names = table.dtype.names
+    wanted = [(name, ALIASES[name], name in ('teff', 'logg', 'feh')) for name in ['teff', 'logg', 'feh', 'xi', 'method', 'model']]
+    wanted += [(name, aliases, True) for name, aliases in zip(COEFFICIENTS[law], COEFFICIENT_ALIASES[law])]
+    if band is None:
+        wanted.append(('band', ALIASES['band'], True))
+
+    out = {}
+    for name, aliases, required in wanted:
+        column = columns.get(name) or _find(names, name, aliases)
+        if column is None or column not in names:
+            if required:
+                raise(ValueError(f"no {name} column in the table (columns: {' '.join(names)}); map one with columns"))
+            continue
+        out[name] = np.asarray(table[column])
+
+    for name in ['teff', 'logg', 'feh', 'xi'] + COEFFICIENTS[law]:
+        if name in out and out[name].dtype.kind not in 'fiu':
+            raise(ValueError(f"column {name} is not numeric"))
+
+    if 'model' in out:
+        out['model'] = np.array([MODELS.get(model, model) for model in out['model']])
+    out['band'] = np.full(len(table), band) if band is not None else out['band'].astype(str)
+
+    dtype = [(name, float if out[name].dtype.kind in 'fiu' else out[name].dtype) for name in out]
+    result = np.zeros(len(table), dtype=dtype)
+    for name in out:
+        result[name] = out[name]
+
+    return result
+
+
+def ingest(path, name, law, band=None, columns=None, fmt=None, directory=None, reference=None, description=None):
+
+    """
+    Converts a coefficient table into (part of) the grid source `name` and registers it.
+    Tables for other laws already ingested under the same name are kept.
+
+    path : CSV (or .csv.gz) or VizieR file
+    name : name of the grid source
+    law : limb darkening law of the table's coefficients
+    band : band of every row, for tables without a band column (optional)
+    columns : dict of limbdark column -> column of the table (optional, see standardize)
+    fmt : csv or vizier (optional, see read_table)
+    directory : directory of the grid sources (optional, default is registry.grids_dir())
+    reference, description : metadata stored with the source (optional)
+
+    Returns the registry.IngestedSource.
+    """
+
+    if name in registry.BUILTIN or not name or os.sep in name or name.startswith('.'):
+        raise(ValueError(f"{name!r} cannot be used as the name of a grid source"))
+
+    table = standardize(read_table(path, fmt), law, band=band, columns=columns)
+    if len(table) == 0:
+        raise(ValueError(f"{path} holds no rows"))
+
+    root = os.path.join(directory or registry.grids_dir(), name)
+    os.makedirs(os.path.join(root, law), exist_ok=True)
+
+    meta_path = os.path.join(root, registry.META)
+    meta = dict(name=name, tables={}, inputs={})
+    if os.path.isfile(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    tables = {}
+    for band_ in np.unique(table['band']):
+        rows = table[table['band'] == band_]
+        rows = rows[[field for field in rows.dtype.names if field != 'band']]
+        # meta.json maps each band to its file, so the name only has to be a safe one, e.g. for SDSS/u
+        fn = urllib.parse.quote(_table_name(str(band_)), safe='') + '.npy'
+        _save(os.path.join(root, law, fn), np.ascontiguousarray(rows))
+        tables[str(band_)] = dict(file=fn, rows=len(rows), **{key: [float(rows[key].min()), float(rows[key].max())]
+                                                            for key in ['teff', 'logg', 'feh']})
+
+    # drop the files of bands no longer in the law's table
+    for band_, entry in meta['tables'].get(law, {}).items():
+        if band_ not in tables:
+            try:
+                os.remove(os.path.join(root, law, entry['file']))
+            except OSError:
+                pass
+
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+
+    first = table[0]
+    meta.update(format=GRID_FORMAT, name=name, created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    meta.setdefault('selection', dict(
+        xi=float(first['xi']) if 'xi' in table.dtype.names else 2.0,
+        method=str(first['method']) if 'method' in table.dtype.names else 'L',
+        model=str(first['model']) if 'model' in table.dtype.names else 'ATLAS',
+    ))
+    meta['tables'][law] = tables
+    meta['inputs'][law] = dict(file=os.path.basename(path), sha1=digest)
+    if reference is not None:
+        meta['reference'] = reference
+    if description is not None:
+        meta['description'] = description
+
+    tmp = meta_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, meta_path)
+
+    # engines of an earlier version of this source are stale; registering it again
+    # also restarts the worker processes, which know it as it was
+    clear_cache()
+
+    return registry.register(root, replace=True)
+
+
+def _columns(spec):
+
+    """
+    Parses 'teff=T,feh=MH' into {'teff': 'T', 'feh': 'MH'}.
+    """
+
+    if not spec:
+        return None
+
+    try:
+        return dict(item.split('=', 1) for item in spec.split(','))
+    except ValueError:
+        raise(ValueError("columns must look like teff=T,feh=MH"))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='limbdark ingest', description="convert a coefficient table into a grid source for limbdark")
+    parser.add_argument('input', help='CSV (or .csv.gz) or VizieR table', nargs='?', default=None)
+    parser.add_argument('--name', help='name of the grid source', type=str, default=None)
+    parser.add_argument('--law', help='limb-darkening law of the coefficients', type=str, default='quadratic')
+    parser.add_argument('--band', help='band of every row, for tables without a band column', type=str, default=None)
+    parser.add_argument('--columns', help='limbdark=table column names, e.g. teff=T,feh=MH,u1=a,u2=b', type=str, default=None)
+    parser.add_argument('--format', help='csv or vizier (default guesses from the extension)', type=str, default=None)
+    parser.add_argument('--output', help='directory to store the source in (default LIMBDARK_GRIDS_DIR or ~/.local/share/limbdark/grids); '
+                                         'sources stored elsewhere are used by path, e.g. --source DIR/NAME', type=str, default=None)
+    parser.add_argument('--reference', help='reference stored with the source', type=str, default=None)
+    parser.add_argument('--description', help='description stored with the source', type=str, default=None)
+    parser.add_argument('--list', help='list the registered grid sources and exit', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in registry.sources():
+            source = registry.lookup(name)
+            print('{}: {} bands, laws {} {}'.format(name, len(source.bands), ' '.join(source.laws), source.info.get('reference', '')).rstrip())
+        return 0
+
+    if args.input is None or args.name is None:
+        parser.error('input and --name are needed')
+
+    try:
+        source = ingest(args.input, args.name, args.law, band=args.band, columns=_columns(args.columns), fmt=args.format,
+                        directory=args.output, reference=args.reference, description=args.description)
+    except ValueError as e:
+        parser.error(str(e))
+    tables = source.tables[args.law]
+    print('{}: {} {} table(s) for bands {}, {} rows'.format(source.name, len(tables), args.law, ' '.join(tables),
+                                                          sum(entry['rows'] for entry in tables.values())))
+    if args.output is not None:
+        # not in grids_dir(), so it is found by path rather than by name
+        print('use it with --source {}'.format(os.path.join(args.output, source.name)))
+
+    return 0
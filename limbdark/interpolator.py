@@ -1,23 +1,42 @@
 #!/usr/bin/env python
 import numpy as np
 
-from .util import get_interpolators
+from .util import get_interpolator, resolve_selection
 
 
 class LDInterpolator:
 
-    def __init__(self, band, law='quadratic', kind='linear', cool=False):
+    def __init__(self, band, law='quadratic', kind='linear', cool=False, xi=None, method=None, model=None, cache=True, blend=0.0, source=None, dtype='float64'):
 
         """
         band : photometric band. must be one of: B C H I J K Kp T R S1 S2 S3 S4 U V b g* i* r* u u* v y z*
         law : must be one of: linear quadratic squareroot logarithmic nonlinear
-        cool : use True if band=='T' and Teff < 3500 (assumes Solar metallicity and using PHOENIX-COND models instead of the usual ATLAS models)
+        cool : use True if band=='T' and Teff < 3500 (assumes Solar metallicity and using PHOENIX-COND models instead of the usual ATLAS models),
+               or 'auto' to pick the grid by the teff of each point (optional, default is False)
+        xi : microturbulence of the grid [km/s] (optional, default is 2)
+        method : fitting method of the grid, L (least squares) or F (flux conservation) (optional, default is L)
+        model : model atmospheres of the grid, ATLAS or PHOENIX (optional, default is ATLAS, or PHOENIX if cool)
+        cache : reuse a previously built engine from the process-wide cache (optional, default is True)
+        blend : width [K] of the zone above 3500 K over which cool='auto' blends both grids (optional, default is 0)
+        source : name of a registered grid source to use instead of the packaged tables (optional, see limbdark.registry)
+        dtype : float64, or float32 to store and return the coefficients in single precision, which halves the
+                memory of regular engines only (see get_interpolator) (optional, default is float64)
         """
 
         self.band = band
         self.law = law
-        self.interpolators = get_interpolators(band, kind=kind, law=law, cool=cool)
+        self.kind = kind
+        self.selection = resolve_selection(band, cool=cool, xi=xi, method=method, model=model, source=source)
+        self.engine = get_interpolator(band, kind=kind, law=law, cool=cool, cache=cache, blend=blend, dtype=dtype, **self.selection)
+
+    def evaluate(self, teff, logg, feh):
+
+        """
+        Returns all coefficients as one array, with a trailing axis of length k.
+        """
+
+        return self.engine(teff, logg, feh)
 
     def __call__(self, teff, logg, feh):
-        
-        return [interp(teff, logg, feh) for interp in self.interpolators]
\ No newline at end of file
+
+        return list(np.moveaxis(self.evaluate(teff, logg, feh), -1, 0))
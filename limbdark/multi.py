@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Limb darkening in several bands and laws from one set of samples, e.g. for
+multi-instrument transit fits. The samples are drawn once and located once
+on every distinct grid (the Claret+2011 bands all share the same nodes), and
+the vertices and weights found are applied to each band and law's table, so
+the result includes the covariances between bands.
+"""
+
+import numpy as np
+from functools import partial
+
+from .util import u_to_q, get_shared_interpolator, COEFFICIENTS
+from .stats import RunningStats, LDResult
+from .propagation import unscented, linearized, PROPAGATIONS
+from .parallel import run
+from .sampling import standard_normal, uniform
+from .domain import check, clamp, truncate, warn_dropped, DOMAINS
+from .diagnostics import current, recording, report, requested
+from .claret import coefficient_names, _plan, _mc_error
+
+
+def _pairs(bands, laws):
+
+    bands = [bands] if isinstance(bands, str) else list(bands)
+    laws = [laws] if isinstance(laws, str) else list(laws)
+    if not bands or not laws:
+        raise(ValueError("bands and laws must not be empty"))
+
+    return [(band, law) for band in dict.fromkeys(bands) for law in dict.fromkeys(laws)], len(set(laws)) > 1
+
+
+def _evaluate(engine, samples, laws, transform=False, count=False):
+
+    """
+    Evaluates the shared engine on (..., 3) samples, returning the (..., K)
+    coefficients of every table, with quadratic ones in q-space if transform.
+    """
+
+    u = engine(samples[..., 0], samples[..., 1], samples[..., 2])
+
+    if transform:
+        for law, s in zip(laws, engine.slices()):
+            if law == 'quadratic':
+                u[..., s] = np.stack(u_to_q(u[..., s.start], u[..., s.start + 1]), axis=-1)
+
+    d = current()
+    if count and d:
+        d.count('samples', u[..., 0].size)
+        d.count('nan', np.isnan(u).any(axis=-1).sum())
+
+    return u
+
+
+def _multi_block(task):
+
+    """
+    Draws one block of samples and returns their RunningStats over the
+    coefficients of every table, and the block's diagnostics if it records them.
+    """
+
+    grids, kind, mu, sigma, transform, sampler, size, seed, offset, domain, record = task
+
+    with recording(record) as d:
+        engine = get_shared_interpolator(grids, kind=kind)
+        with d.stage('sample'):
+            if domain == 'truncate':
+                samples = truncate(uniform(sampler, seed, size, offset=offset), mu, sigma, engine.boxes)
+            else:
+                samples = mu + standard_normal(sampler, seed, size, offset=offset) * sigma
+            if domain == 'clamp':
+                samples = clamp(samples, engine.boxes)
+        with d.stage('evaluate'):
+            u = _evaluate(engine, samples, [grid['law'] for grid in grids], transform, count=True)
+        with d.stage('reduce'):
+            stats = RunningStats(engine.ncoef).update(u)
+
+    return stats, d.to_dict()
+
+
+def claret_multi(bands, teff, uteff, logg, ulogg, feh, ufeh, laws='quadratic', n=int(1e5), kind='nearest', transform=False, xi=None, method=None, model=None, chunksize=None, full_output=False, seed=None, workers=1, sampler='random', propagation='mc', domain='ignore', diagnostics=None, cool='auto', blend=0.0, source=None, dtype='float64'):
+
+    """
+    Estimates limb darkening in several bands and laws at once from the same
+    samples of the stellar parameters, see claret(). Each sample is located
+    once per distinct grid, and the weights found are applied to every band
+    and law sharing it, rather than repeating the whole calculation per band.
+
+    bands : photometric band, or a list of them, e.g. ['Kp', 'T', 'V', 'z*']
+    laws : limb darkening law, or a list of them; each band is evaluated with every law (optional, default is quadratic)
+    domain : ignore, truncate, clamp or raise, see claret(); the box used is the part of the
+             bounding boxes of the grids common to all bands (optional, default is ignore)
+    teff, uteff, logg, ulogg, feh, ufeh, n, kind, transform, xi, method, model, chunksize, seed,
+    workers, sampler, propagation, diagnostics, cool, blend, source, dtype : see claret()
+
+    Returns a dict with the claret() output, [mean_1, std_1, mean_2, std_2, ...], of every band
+    (or every (band, law) with several laws). With full_output, returns a single LDResult for all of
+    them instead, with coefficients named <band>_<coef> (or <band>_<law>_<coef> with several laws),
+    whose cov holds the covariances between the coefficients of different bands and laws.
+    A sample outside any of the grids is dropped from all of them, so that the
+    covariances are based on the same samples.
+    """
+
+    pairs, by_law = _pairs(bands, laws)
+    grids = [dict(band=band, law=law, cool=cool, xi=xi, method=method, model=model, blend=float(blend), source=source, dtype=dtype) for band, law in pairs]
+
+    labels, names = [], []
+    for band, law in pairs:
+        label = (band, law) if by_law else band
+        labels.append(label)
+        names += ['_'.join([band, law, name] if by_law else [band, name]) for name in coefficient_names(law, transform)]
+
+    mu = np.array([teff, logg, feh], dtype=float)
+    sigma = np.array([uteff, ulogg, ufeh], dtype=float)
+    record = requested(diagnostics)
+
+    if domain not in DOMAINS:
+        raise(ValueError(f"domain must be one of: {' '.join(DOMAINS)}"))
+
+    if propagation not in PROPAGATIONS:
+        raise(ValueError(f"propagation must be one of: {' '.join(PROPAGATIONS)}"))
+
+    if domain == 'truncate' and propagation != 'mc':
+        raise(ValueError("domain='truncate' needs propagation='mc'; use clamp or raise"))
+
+    with recording(record) as d, d.stage('total'):
+
+        # workers look the engine up themselves, so Monte Carlo without a domain check needs none here
+        engine = get_shared_interpolator(grids, kind=kind) if domain != 'ignore' or propagation != 'mc' else None
+        info = dict(domain=domain)
+        if domain != 'ignore':
+            info['p_inside'] = float(check(domain, mu, sigma, engine.boxes))
+
+        if propagation == 'mc':
+            plan = _plan(n, chunksize, sampler, seed, workers)
+            tasks = [(grids, kind, mu, sigma, transform, sampler, size, s, offset, domain, record) for _, size, s, offset in plan]
+
+            replicates = {}
+            for (r, _, _, _), (block, block_diagnostics) in zip(plan, run(_multi_block, tasks, workers)):
+                replicates.setdefault(r, RunningStats(len(names))).combine(block)
+                current().merge(block_diagnostics)
+
+            stats = RunningStats(len(names))
+            for block in replicates.values():
+                stats.combine(block)
+
+            if domain == 'ignore':
+                warn_dropped(int(n), stats.n)
+
+            mcerr, mcerr_std = _mc_error(stats, list(replicates.values()), sampler)
+            result = stats.result(names, mcerr=mcerr, mcerr_std=mcerr_std, sampler=sampler, propagation='mc', n_eff=stats.n, **info)
+
+        else:
+            evaluate = partial(_evaluate, engine, laws=[grid['law'] for grid in grids], transform=transform, count=True)
+            f = evaluate if domain != 'clamp' else lambda points: evaluate(clamp(points, engine.boxes))
+            propagate = unscented if propagation == 'unscented' else linearized
+            with d.stage('evaluate'):
+                mean, cov = propagate(f, mu, sigma)
+            result = LDResult(names, mean, cov, 2 * len(mu) + 1, propagation=propagation, **info)
+
+    if d:
+        result.info['diagnostics'] = report(d, diagnostics, bands=' '.join(band for band, _ in pairs), kind=kind)
+
+    if full_output:
+        return result
+
+    out, flat = {}, result.flat()
+    for label, (band, law) in zip(labels, pairs):
+        k = 2 * len(COEFFICIENTS[law])
+        out[label], flat = (tuple(flat[:k]) if law == 'linear' else flat[:k]), flat[k:]
+
+    return out
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+import atexit
+import numpy as np
+
+DEFAULT_CHUNKSIZE = 2**16
+
+_executor = None
+_executor_workers = 0
+
+
+def get_executor(workers):
+
+    """
+    Returns a process pool with `workers` processes, reused across calls so
+    that each worker keeps its interpolator cache warm. Workers load the grids
+    from the memory-mapped binary cache (see util.load_table) rather than
+    receiving them from the parent process. Workers start with the grid sources
+    registered in the parent (registering another one shuts the pool down).
+    """
+
+    global _executor, _executor_workers
+
+    if _executor is None or _executor_workers != workers:
+        from concurrent.futures import ProcessPoolExecutor
+        from .registry import _registered, _install
+        shutdown()
+        _executor = ProcessPoolExecutor(max_workers=workers, initializer=_install, initargs=(_registered(),))
+        _executor_workers = workers
+
+    return _executor
+
+
+def shutdown():
+
+    global _executor, _executor_workers
+
+    if _executor is not None:
+        _executor.shutdown()
+    _executor = None
+    _executor_workers = 0
+
+
+atexit.register(shutdown)
+
+
+def run(func, tasks, workers=1):
+
+    """
+    Applies func to every task, in order, in this process or across a pool of `workers` processes.
+    """
+
+    if workers is None or workers <= 1 or len(tasks) <= 1:
+        return [func(task) for task in tasks]
+
+    return list(get_executor(workers).map(func, tasks))
+
+
+def spawn(seed, n):
+
+    """
+    Returns n independent child seeds of `seed` (an int, SeedSequence or
+    Generator), one per block of work, so results do not depend on how blocks
+    are distributed over workers.
+    """
+
+    if isinstance(seed, np.random.Generator):
+        seed = np.random.SeedSequence(seed.integers(0, 2**63, size=4))
+    elif not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    return seed.spawn(n)
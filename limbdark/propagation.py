@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+import numpy as np
+
+PROPAGATIONS = "mc unscented linear".split()
+
+
+def sigma_points(mu, sigma, alpha=1.0, beta=2.0, kappa=0.0):
+
+    """
+    Sigma points and weights of the scaled unscented transform for independent
+    Gaussian inputs: the mean plus +/- one scaled step along each axis, i.e.
+    2d + 1 = 7 points for (teff, logg, feh).
+
+    mu, sigma : (..., d) arrays of means and standard deviations
+    returns points (..., 2d + 1, d), mean weights (2d + 1,) and covariance weights (2d + 1,)
+    """
+
+    mu = np.asarray(mu, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    d = mu.shape[-1]
+    lam = alpha**2 * (d + kappa) - d
+
+    steps = np.sqrt(d + lam) * np.eye(d) * sigma[..., None, :]
+    points = np.concatenate([mu[..., None, :], mu[..., None, :] + steps, mu[..., None, :] - steps], axis=-2)
+
+    wm = np.full(2 * d + 1, 1 / (2 * (d + lam)))
+    wc = wm.copy()
+    wm[0] = lam / (d + lam)
+    wc[0] = lam / (d + lam) + 1 - alpha**2 + beta
+
+    return points, wm, wc
+
+
+def unscented(f, mu, sigma):
+
+    """
+    Propagates independent Gaussian inputs through f with the unscented transform.
+
+    f : callable mapping (..., d) input points to (..., k) outputs
+    returns mean (..., k) and covariance (..., k, k)
+    """
+
+    points, wm, wc = sigma_points(mu, sigma)
+    y = f(points)
+    mean = np.einsum('p,...pk->...k', wm, y)
+    d = y - mean[..., None, :]
+    cov = np.einsum('p,...pi,...pj->...ij', wc, d, d)
+
+    return mean, cov
+
+
+def linearized(f, mu, sigma, step=1.0):
+
+    """
+    Propagates independent Gaussian inputs through the first-order (delta method)
+    expansion of f, with the Jacobian from central finite differences of
+    step * sigma along each axis. The default secant over +/- one sigma follows
+    the average slope of piecewise linear interpolants rather than the slope of
+    whichever facet the mean falls in.
+
+    returns mean (..., k) and covariance (..., k, k)
+    """
+
+    mu = np.asarray(mu, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    d = mu.shape[-1]
+
+    h = step * sigma
+    offsets = np.eye(d) * h[..., None, :]
+    points = np.concatenate([mu[..., None, :], mu[..., None, :] + offsets, mu[..., None, :] - offsets], axis=-2)
+    y = f(points)
+
+    mean = y[..., 0, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        jac = (y[..., 1:d + 1, :] - y[..., d + 1:, :]) / (2 * h[..., :, None])
+    jac = np.where((h > 0)[..., :, None], jac, 0)
+
+    # cov = J diag(sigma^2) J^T, with J stored as (..., d, k)
+    cov = np.einsum('...ai,...a,...aj->...ij', jac, sigma**2, jac)
+
+    return mean, cov
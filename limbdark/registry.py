@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+"""
+Registry of grid sources: the sets of coefficient tables limbdark can
+interpolate. The packaged Claret+2011 and Claret 2017 tables are registered
+as built-in sources; further sources are tables converted with
+`limbdark ingest` (see limbdark.ingest), or any GridSource passed to register().
+
+Ingested sources live in grids_dir(), one directory per source holding a
+meta.json and one .npy file per law and band. They are looked up by name
+the first time they are used, so registering more of them costs nothing
+until then.
+"""
+
+import os
+import json
+import threading
+
+from . import parallel
+from .util import BANDS, LAWS, GRID_FORMAT, files
+
+META = 'meta.json'
+
+
+def grids_dir():
+
+    """
+    Directory holding ingested grid sources. Set LIMBDARK_GRIDS_DIR to override it.
+    """
+
+    path = os.environ.get('LIMBDARK_GRIDS_DIR')
+    if path is None:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+        path = os.path.join(base, 'limbdark', 'grids')
+    return path
+
+
+class GridSource:
+
+    """
+    A set of coefficient tables, one per law, each covering one or more bands.
+
+    name : name the source is registered under
+    bands : bands covered by every table
+    laws : laws with a table
+    selection : the (xi, method, model) grid used when none is requested
+    info : metadata, e.g. reference and description (optional)
+    """
+
+    def __init__(self, name, bands, laws, selection=None, **info):
+
+        self.name = name
+        self.bands = list(bands)
+        self.laws = list(laws)
+        self.selection = dict(xi=2.0, method='L', model='ATLAS') if selection is None else dict(selection)
+        self.info = info
+
+    def check(self, band, law):
+
+        if band not in self.bands:
+            raise(ValueError(f"band must be one of: {' '.join(self.bands)}" + self._of()))
+
+        if law not in self.laws:
+            raise(ValueError(f"law must be one of: {' '.join(self.laws)}" + self._of()))
+
+    def _of(self):
+        return f" (grid source {self.name})"
+
+    def table(self, band, law):
+
+        """
+        Returns the file holding (band, law), and whether it mixes several bands
+        (csv.gz tables, compiled by util.load_table) or not (.npy files, memory-mapped).
+        """
+
+        raise NotImplementedError
+
+    def __repr__(self):
+        return '{}({!r}, bands={}, laws={})'.format(type(self).__name__, self.name, len(self.bands), len(self.laws))
+
+
+class PackagedSource(GridSource):
+
+    """
+    Tables shipped in limbdark.data as csv.gz files.
+
+    tables : law -> file name
+    by_band : whether each table mixes several bands, told apart by a band column
+    """
+
+    def __init__(self, name, bands, tables, by_band, selection=None, **info):
+
+        super().__init__(name, bands, list(tables), selection=selection, **info)
+        self.tables = dict(tables)
+        self.by_band = by_band
+
+    def table(self, band, law):
+
+        self.check(band, law)
+        return files('limbdark.data') / self.tables[law], self.by_band
+
+
+class IngestedSource(GridSource):
+
+    """
+    Tables converted by `limbdark ingest`: a directory with a meta.json and
+    <law>/<band>.npy files, memory-mapped when loaded.
+    """
+
+    def __init__(self, directory):
+
+        with open(os.path.join(directory, META)) as f:
+            meta = json.load(f)
+
+        if meta.get('format') != GRID_FORMAT:
+            raise(ValueError(f"{directory} was ingested in grid format {meta.get('format')}; "
+                             f"ingest it again for format {GRID_FORMAT}"))
+
+        laws = meta['tables']
+        # bands present for every law
+        bands = [band for band in next(iter(laws.values())) if all(band in tables for tables in laws.values())]
+        info = {key: value for key, value in meta.items() if key not in ('name', 'selection', 'tables', 'format')}
+
+        super().__init__(meta['name'], bands, list(laws), selection=meta.get('selection'), **info)
+        self.directory = directory
+        self.tables = laws
+
+    def check(self, band, law):
+
+        if law not in self.tables:
+            raise(ValueError(f"law must be one of: {' '.join(self.tables)}" + self._of()))
+
+        if band not in self.tables[law]:
+            raise(ValueError(f"band must be one of: {' '.join(self.tables[law])}" + self._of()))
+
+    def table(self, band, law):
+
+        self.check(band, law)
+        return os.path.join(self.directory, law, self.tables[law][band]['file']), False
+
+
+def _builtins():
+
+    laws_2017 = dict(cool=[13, 15, 17, 19, 21], hot=[24, 25, 26, 27, 28])
+    reference = 'Claret 2017, A&A 600, A30'
+
+    return [
+        PackagedSource('claret2011', [band for band in BANDS if band != 'T'],
+                       {law: 'claret+2011_{}.csv.gz'.format(law) for law in LAWS}, by_band=True,
+                       reference='Claret & Bloemen 2011, A&A 529, A75'),
+        PackagedSource('claret2017', ['T'],
+                       {law: 'claret_2017_table{}.csv.gz'.format(k) for law, k in zip(LAWS, laws_2017['hot'])},
+                       by_band=False, reference=reference, description='TESS, ATLAS models'),
+        PackagedSource('claret2017-cool', ['T'],
+                       {law: 'claret_2017_table{}.csv.gz'.format(k) for law, k in zip(LAWS, laws_2017['cool'])},
+                       by_band=False, selection=dict(xi=2.0, method='q', model='PHOENIX'), reference=reference,
+                       description='TESS, PHOENIX-COND models, Solar metallicity'),
+    ]
+
+
+_sources = {source.name: source for source in _builtins()}
+BUILTIN = tuple(_sources)
+_lock = threading.Lock()
+
+
+def register(source, replace=False):
+
+    """
+    Registers a GridSource, or the ingested source in a directory, under its name,
+    and returns it.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        source = IngestedSource(os.fspath(source))
+
+    with _lock:
+        if source.name in _sources and not replace:
+            raise(ValueError(f"a grid source named {source.name} is already registered"))
+        _sources[source.name] = source
+
+    # workers already running do not know it, or know an earlier version of it
+    parallel.shutdown()
+
+    return source
+
+
+def _registered():
+
+    """
+    Returns the sources registered in this process other than the built-in ones,
+    for worker processes to register (see parallel.get_executor).
+    """
+
+    with _lock:
+        return {name: source for name, source in _sources.items() if name not in BUILTIN}
+
+
+def _install(sources):
+
+    with _lock:
+        _sources.update(sources)
+
+
+def lookup(name):
+
+    """
+    Returns the grid source registered under `name`, looking for an ingested
+    source of that name in grids_dir() on first use. A name with a path
+    separator, e.g. ./grids/claret2021, is the directory of an ingested source
+    (see `limbdark ingest --output`), registered under that path.
+    """
+
+    name = os.fspath(name)
+    try:
+        return _sources[name]
+    except KeyError:
+        pass
+
+    # source names cannot hold a path separator (see ingest), so paths and names cannot be confused
+    is_path = os.sep in name or (os.altsep is not None and os.altsep in name)
+    directory = name if is_path else os.path.join(grids_dir(), name)
+    if not os.path.isfile(os.path.join(directory, META)):
+        if is_path:
+            raise(ValueError(f"{name} is not the directory of an ingested grid source (no {META})"))
+        raise(ValueError(f"no grid source named {name}; registered: {' '.join(sources())}"))
+
+    with _lock:
+        if name not in _sources:
+            _sources[name] = IngestedSource(directory)
+
+    return _sources[name]
+
+
+def sources():
+
+    """
+    Returns the names of the registered grid sources and of those ingested in grids_dir().
+    """
+
+    names = list(_sources)
+    try:
+        names += sorted(name for name in os.listdir(grids_dir())
+                        if name not in _sources and os.path.isfile(os.path.join(grids_dir(), name, META)))
+    except OSError:
+        pass
+
+    return names
+
+
+def default_source(band, cool=False):
+
+    """
+    Name of the built-in source holding `band`: Claret 2017 for T (PHOENIX-COND if cool), else Claret+2011.
+    """
+
+    if band == 'T':
+        return 'claret2017-cool' if cool else 'claret2017'
+
+    return 'claret2011'
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+import warnings
+import numpy as np
+
+SAMPLERS = "random sobol halton lhs".split()
+
+# independent randomizations of a quasi-Monte Carlo sequence, used to estimate its error
+QMC_REPLICATES = 8
+
+
+def _qmc_engine(sampler, seed, d):
+
+    from scipy.stats import qmc
+
+    cls = dict(sobol=qmc.Sobol, halton=qmc.Halton, lhs=qmc.LatinHypercube)[sampler]
+    rng = np.random.default_rng(seed)
+    try:
+        return cls(d, rng=rng)
+    except TypeError:
+        # scipy < 1.15
+        return cls(d, seed=rng)
+
+
+def uniform(sampler, seed, size, d=3, offset=0):
+
+    """
+    Draws (size, d) variates uniform on (0, 1), see standard_normal.
+    """
+
+    if sampler == 'random':
+        rng = np.random if seed is None else np.random.default_rng(seed)
+        u = rng.random((size, d))
+    elif sampler in SAMPLERS:
+        engine = _qmc_engine(sampler, seed, d)
+        with warnings.catch_warnings():
+            # Sobol' balance warnings for sizes/offsets that are not powers of 2
+            warnings.simplefilter('ignore', UserWarning)
+            if offset:
+                engine.fast_forward(offset)
+            u = engine.random(size)
+    else:
+        raise(ValueError(f"sampler must be one of: {' '.join(SAMPLERS)}"))
+
+    eps = np.finfo(float).eps
+    return np.clip(u, eps, 1 - eps)
+
+
+def truncated_normal(u, a, b):
+
+    """
+    Maps uniform variates u through the inverse CDF of the standard normal
+    distribution truncated to [a, b], broadcasting u, a and b. Intervals in the
+    upper tail are mapped through their mirror image in the lower tail, where
+    the normal CDF keeps its precision.
+    """
+
+    from scipy.special import ndtr, ndtri
+
+    flip = a > 0
+    lo, hi = np.where(flip, -b, a), np.where(flip, -a, b)
+    plo, phi = ndtr(lo), ndtr(hi)
+    z = np.clip(ndtri(plo + u * (phi - plo)), lo, hi)
+
+    return np.where(flip, -z, z)
+
+
+def standard_normal(sampler, seed, size, d=3, offset=0, lower=None, upper=None):
+
+    """
+    Draws (size, d) standard normal variates.
+
+    sampler : random (pseudo-random), or sobol, halton or lhs (scrambled
+              quasi-random points mapped through the normal inverse CDF)
+    seed : seed, SeedSequence or Generator; None uses numpy's global random state (random only)
+    offset : index of the first point in the quasi-random sequence, so that
+             consecutive blocks drawn with the same seed continue one sequence
+             (sobol and halton only; lhs blocks are stratified independently)
+    lower, upper : (d,) bounds to truncate the distribution to, in standard units (optional)
+    """
+
+    if lower is not None or upper is not None:
+        a = np.full(d, -np.inf) if lower is None else lower
+        b = np.full(d, np.inf) if upper is None else upper
+        return truncated_normal(uniform(sampler, seed, size, d, offset), a, b)
+
+    if sampler == 'random':
+        rng = np.random if seed is None else np.random.default_rng(seed)
+        return rng.standard_normal((size, d))
+
+    from scipy.special import ndtri
+
+    return ndtri(uniform(sampler, seed, size, d, offset))
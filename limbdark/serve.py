@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+A long-running limb darkening service that keeps built interpolators in
+memory, so that repeated queries skip grid loading and triangulation. It
+answers JSON-lines requests on stdin/stdout, or on a local Unix socket:
+
+    limbdark serve --band T --warm T/quadratic
+    limbdark serve --socket /tmp/limbdark.sock
+
+Each request is one JSON object per line: a star (teff uteff logg ulogg feh
+ufeh, optionally band, law and an id), or {"stars": [...]} for several, with
+optional per-request overrides of the server options (n, kind, law, band,
+transform, quantiles, covariance, seed, sampler, propagation, domain, blend,
+xi, method, model, source, dtype). Each gets one JSON line back: the star's fields and results,
+{"results": [...]} for several stars, or {"error": "..."} (with the id of the
+request, if any). {"op": "info"} returns interpolator cache statistics.
+"""
+
+import os
+import sys
+import stat
+import json
+import argparse
+
+from . import batch, registry
+from .cache import cache_info
+from .util import get_interpolator, resolve_selection, resolve_cool
+
+# request fields that override the server's options rather than describe a star
+OPTIONS = "n kind transform quantiles covariance seed sampler propagation domain blend xi method model source dtype".split()
+
+
+def handle(request, defaults):
+
+    """
+    Answers one decoded request (a dict) with a JSON-serialisable dict.
+    defaults : evaluate() keyword arguments, overridden by the request's OPTIONS
+    """
+
+    if not isinstance(request, dict):
+        return dict(error="request must be a JSON object")
+
+    try:
+        op = request.get('op', 'claret')
+        if op == 'info':
+            return dict(cache=cache_info())
+        if op != 'claret':
+            raise(ValueError(f"unknown op: {op}"))
+
+        options = dict(defaults)
+        options.update({key: request[key] for key in OPTIONS if key in request})
+
+        if 'stars' in request:
+            stars = request['stars']
+            if not isinstance(stars, list) or not all(isinstance(star, dict) for star in stars):
+                raise(ValueError("stars must be a list of objects"))
+            for key in ['band', 'law']:
+                options[key] = request.get(key, options[key])
+            results = batch.evaluate(stars, **options) if stars else []
+            return dict(results=[{k: batch.jsonable(v) for k, v in r.items()} for r in results])
+
+        star = {key: value for key, value in request.items() if key not in OPTIONS and key != 'op'}
+        result, = batch.evaluate([star], **options)
+        return {key: batch.jsonable(value) for key, value in result.items()}
+
+    except (ValueError, TypeError, KeyError) as e:
+        response = dict(error=str(e))
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+
+def respond(line, defaults):
+
+    """
+    Answers one request line with one response line (without the newline).
+    """
+
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return json.dumps(dict(error=f"invalid JSON: {e}"))
+
+    return json.dumps(handle(request, defaults))
+
+
+def serve_stream(fin, fout, defaults):
+
+    """
+    Answers requests line by line until fin is exhausted.
+    """
+
+    for line in fin:
+        if line.strip():
+            fout.write(respond(line, defaults) + '\n')
+            fout.flush()
+
+
+def serve_socket(path, defaults):
+
+    """
+    Answers requests from any number of clients on a Unix socket at path, until interrupted.
+    """
+
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write((respond(line.decode(), defaults) + '\n').encode())
+                    self.wfile.flush()
+
+    # a socket left behind by a server that did not shut down cleanly
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.remove(path)
+
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def warm(specs, defaults):
+
+    """
+    Builds the interpolators for BAND or BAND/LAW specs ahead of the first request.
+    """
+
+    for spec in specs:
+        band, _, law = spec.partition('/')
+        law = law or defaults['law'] or 'quadratic'
+        selection = resolve_selection(band, xi=defaults['xi'], method=defaults['method'], model=defaults['model'], source=defaults['source'])
+        get_interpolator(band, kind=defaults['kind'], law=law, cool=resolve_cool(band, source=defaults['source']),
+                         blend=defaults['blend'], dtype=defaults['dtype'], **selection)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='limbdark serve', description="answer JSON-lines limb darkening requests with interpolators kept in memory")
+    parser.add_argument('--socket', help='listen on a Unix socket at this path instead of stdin/stdout', type=str, default=None)
+    parser.add_argument('--warm', help='build the interpolator for BAND or BAND/LAW at startup (repeatable)', action='append', default=[])
+    batch.add_options(parser)
+    args = parser.parse_args(argv)
+
+    defaults = batch.options(args)
+    try:
+        if args.source is not None:
+            registry.lookup(args.source)
+        warm(args.warm, defaults)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.socket:
+        serve_socket(args.socket, defaults)
+    else:
+        serve_stream(sys.stdin, sys.stdout, defaults)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
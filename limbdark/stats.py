@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+import numpy as np
+
+
+class RunningStats:
+
+    """
+    Streaming mean, variance and covariance of k coefficients.
+
+    Blocks of samples are folded in with the parallel (Chan et al.) form of
+    Welford's algorithm, so memory stays proportional to one block while the
+    result matches a single pass over all samples. Rows with any non-finite
+    coefficient (e.g. samples outside the grid) are skipped.
+
+    k : number of coefficients
+    """
+
+    def __init__(self, k):
+
+        self.k = k
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+
+    def update(self, x):
+
+        """
+        x : (m, k) array of coefficient samples
+        """
+
+        x = np.asarray(x, dtype=float).reshape(-1, self.k)
+        x = x[np.isfinite(x).all(axis=1)]
+        if len(x) == 0:
+            return self
+
+        other = RunningStats(self.k)
+        other.n = len(x)
+        other.mean = x.mean(axis=0)
+        d = x - other.mean
+        other.comoment = d.T @ d
+
+        return self.combine(other)
+
+    def combine(self, other):
+
+        """
+        Folds another RunningStats (e.g. from a different block or process) into this one.
+        """
+
+        if other.n == 0:
+            return self
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * self.n * other.n / n
+        self.mean = self.mean + delta * other.n / n
+        self.n = n
+
+        return self
+
+    @property
+    def cov(self):
+        if self.n == 0:
+            return np.full((self.k, self.k), np.nan)
+        return self.comoment / self.n
+
+    @property
+    def var(self):
+        return np.diag(self.cov).copy()
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def result(self, names, **info):
+
+        mean = self.mean if self.n else np.full(self.k, np.nan)
+        return LDResult(names, mean, self.cov, self.n, **info)
+
+
+class LDResult:
+
+    """
+    Summary of the limb darkening coefficients of one star.
+
+    names : coefficient names, e.g. ['u1', 'u2']
+    mean : (k,) array of means
+    cov : (k, k) covariance matrix between coefficients
+    n : number of samples the summary is based on
+    info : any additional diagnostics, available as attributes
+    """
+
+    def __init__(self, names, mean, cov, n, **info):
+
+        self.names = list(names)
+        self.mean = np.asarray(mean)
+        self.cov = np.asarray(cov)
+        self.n = n
+        self.info = info
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['info'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    @property
+    def std(self):
+        return np.sqrt(np.diag(self.cov))
+
+    @property
+    def corr(self):
+        return self.cov / np.outer(self.std, self.std)
+
+    def flat(self):
+
+        """
+        Returns [mean_1, std_1, mean_2, std_2, ...], the layout returned by claret().
+        """
+
+        return [val for i in range(len(self.names)) for val in [self.mean[i], self.std[i]]]
+
+    def to_dict(self):
+
+        out = {}
+        for i, name in enumerate(self.names):
+            out[name] = float(self.mean[i])
+            out[name + '_std'] = float(self.std[i])
+
+        return out
+
+    def __repr__(self):
+        values = ', '.join('{}={:.4f} +/- {:.4f}'.format(name, m, s) for name, m, s in zip(self.names, self.mean, self.std))
+        return 'LDResult({}, n={})'.format(values, self.n)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+from . import __version__
+from .stats import LDResult
+from .diagnostics import current
+
+DEFAULT_MAXBYTES = 2**28
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    atime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_atime ON results (atime);
+"""
+
+
+def make_key(**inputs):
+
+    """
+    Returns a digest of the inputs of a computation together with the package
+    version, so results from another version are never returned.
+    """
+
+    token = json.dumps(dict(inputs, version=__version__), sort_keys=True, default=repr)
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _dumps(result):
+
+    info = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in result.info.items()}
+    return json.dumps(dict(names=result.names, mean=result.mean.tolist(), cov=result.cov.tolist(), n=result.n, info=info))
+
+
+def _loads(value):
+
+    d = json.loads(value)
+    info = {key: np.array(value) if isinstance(value, list) else value for key, value in d['info'].items()}
+    return LDResult(d['names'], np.array(d['mean']), np.array(d['cov']), d['n'], **info)
+
+
+def default_path():
+
+    """
+    Returns results.sqlite in the grid cache directory, see util.cache_dir.
+    """
+
+    from .util import cache_dir
+
+    directory = cache_dir()
+    if not directory:
+        raise(ValueError("the cache directory is disabled (LIMBDARK_CACHE_DIR is empty); give a path"))
+
+    return os.path.join(directory, 'results.sqlite')
+
+
+class ResultStore:
+
+    """
+    Persistent store of LDResults in an SQLite database, shared by every
+    process that uses the same file. Writes from several processes are
+    serialised by SQLite (in write-ahead-log mode, so readers are not blocked),
+    and the least recently used results are evicted beyond maxbytes.
+
+    path : database file (optional, default is results.sqlite in the grid cache directory, see util.cache_dir)
+    maxbytes : maximum total size of the stored results, in bytes (optional, default is 256 MiB)
+    timeout : seconds to wait for another process's write to finish (optional, default is 30)
+    """
+
+    def __init__(self, path=None, maxbytes=DEFAULT_MAXBYTES, timeout=30.0):
+
+        self.path = default_path() if path is None else path
+        self.maxbytes = maxbytes
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def _connect(self):
+
+        # one connection per thread and process: sqlite connections must not cross forks
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+
+        return conn
+
+    def get(self, key):
+
+        """
+        Returns the LDResult stored under key, or None.
+        """
+
+        conn = self._connect()
+        row = conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            current().count('store_misses')
+            return None
+
+        self.hits += 1
+        current().count('store_hits')
+        try:
+            conn.execute('UPDATE results SET atime = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.OperationalError:
+            # another process holds the write lock; recency is only a hint
+            pass
+
+        return _loads(row[0])
+
+    def put(self, key, result):
+
+        """
+        Stores an LDResult under key, then evicts the least recently used results beyond maxbytes.
+        """
+
+        value = _dumps(result)
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, value, len(value), time.time()))
+            if self.maxbytes is not None:
+                self._evict(conn)
+
+    def _evict(self, conn):
+
+        total, = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()
+        if total <= self.maxbytes:
+            return
+
+        excess = total - self.maxbytes
+        for key, size in conn.execute('SELECT key, size FROM results ORDER BY atime').fetchall():
+            if excess <= 0:
+                break
+            conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            excess -= size
+
+    def memoize(self, key, compute):
+
+        """
+        Returns the result stored under key, calling compute() and storing its result on a miss.
+        """
+
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+
+        return result
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    @property
+    def nbytes(self):
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def clear(self):
+
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM results')
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+
+        """
+        Returns the store's statistics as a dict.
+        """
+
+        return dict(path=self.path, hits=self.hits, misses=self.misses, size=len(self),
+                    nbytes=self.nbytes, maxbytes=self.maxbytes)
+
+
+_stores = {}
+
+
+def get_store(store=True):
+
+    """
+    Returns the ResultStore for claret()'s `store` argument: the store itself,
+    a store at that path for a str, or the default store for True. Stores
+    opened by path are reused, keeping their connections open.
+    """
+
+    if isinstance(store, ResultStore):
+        return store
+
+    path = os.fspath(store) if isinstance(store, (str, os.PathLike)) else default_path()
+    if path not in _stores:
+        _stores[path] = ResultStore(path)
+
+    return _stores[path]
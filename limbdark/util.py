@@ -1,6 +1,15 @@
 import os
-import pandas as pd
-from scipy.interpolate import NearestNDInterpolator, LinearNDInterpolator, RegularGridInterpolator
+import csv
+import gzip
+import glob
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from functools import partial
+from .engines import LinearEngine, NearestEngine, RegularEngine, SplitEngine, SharedEngine
+from .cache import interpolator_cache
+from .diagnostics import current
 try:
     from importlib.resources import files
 except ImportError:
@@ -9,6 +18,8 @@ except ImportError:
 
 BANDS = "B C H I J K Kp T R S1 S2 S3 S4 U V b g* i* r* u u* v y z*".split()
 LAWS = "linear quadratic squareroot logarithmic nonlinear".split()
+KINDS = "linear nearest regular".split()
+DTYPES = "float64 float32".split()
 
 
 def u_to_q(u1, u2):
@@ -24,31 +35,35 @@ def u_to_q(u1, u2):
     return [q1, q2]
 
 
-def get_df(band, law, cool=False):
+GRID_FORMAT = 1
 
-    if band == "T":
 
-        if cool:
-            tablenums = dict(linear=13, quadratic=15, squareroot=17, logarithmic=19, nonlinear=21)
-        else:
-            tablenums = dict(linear=24, quadratic=25, squareroot=26, logarithmic=27, nonlinear=28)
+def cache_dir():
 
-        fn = 'claret_2017_table{}.csv.gz'.format(tablenums[law])
-        fp = files('limbdark.data') / fn
-        df = pd.read_csv(fp)
+    """
+    Directory holding the compiled binary grids. Set LIMBDARK_CACHE_DIR to
+    override it, or to an empty string to disable the on-disk cache.
+    """
 
-    elif band in BANDS:
+    path = os.environ.get('LIMBDARK_CACHE_DIR')
+    if path is None:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(base, 'limbdark')
+    return path
 
-        fn = 'claret+2011_{}.csv.gz'.format(law)
-        fp = files('limbdark.data') / fn
-        df = pd.read_csv(fp)
-        idx = df.band == band
-        df = df[idx]
 
-    return df
+def check_table(band, law, source=None):
 
+    """
+    Raises a ValueError unless the grid source (see limbdark.registry) has a table for (band, law).
+    source : name of a registered grid source (optional, default is the packaged Claret tables)
+    """
 
-def get_interpolators(band, kind='linear', law='quadratic', cool=False, verbose=False):
+    # the registry imports this module, so it is imported here rather than at the top
+    from .registry import lookup
+
+    if source is not None:
+        return lookup(source).check(band, law)
 
     if band not in BANDS:
         raise(ValueError(f"band must be one of: {' '.join(BANDS)}"))
@@ -56,33 +71,549 @@ def get_interpolators(band, kind='linear', law='quadratic', cool=False, verbose=
     if law not in LAWS:
         raise(ValueError(f"law must be one of: {' '.join(LAWS)}"))
 
-    df = get_df(band, law, cool=cool)
-
-    points = df['teff logg feh'.split()].values
-
-    if kind == 'linear':
-        interpolator = LinearNDInterpolator
-        kwargs = dict(rescale=True)
-    elif kind == 'nearest':
-        interpolator = NearestNDInterpolator
-        kwargs = dict(rescale=True)
-    elif kind == 'regular':
-        interpolator = RegularGridInterpolator
-        kwargs = {}
-        raise NotImplementedError
-
-    if law == 'linear':
-        keys = 'u'
-        values = df[keys].values
-        interp = interpolator(points, values, **kwargs)
-        return [interp]
-
-    elif law == 'quadratic' or law == 'squareroot' or law == 'logarithmic':
-        keys = 'u1 u2'.split()
-        values = df[keys].values
-        return [interpolator(points, values.T[i], **kwargs) for i in range(2)]
-
-    elif law == 'nonlinear':
-        keys = 'u1 u2 u3 u4'.split()
-        values = df[keys].values
-        return [interpolator(points, values.T[i], **kwargs) for i in range(4)]
+
+def get_source(band, law, cool=False, source=None):
+
+    """
+    Returns the file holding (band, law), and whether that table mixes several bands.
+    source : name of a registered grid source (optional, default is the packaged Claret
+             tables: Claret 2017 for T, PHOENIX-COND if cool, and Claret+2011 for the other bands)
+    """
+
+    from .registry import lookup, default_source
+
+    check_table(band, law, source)
+    return lookup(default_source(band, cool) if source is None else source).table(band, law)
+
+
+_digests = {}
+
+
+def _source_digest(fp):
+
+    """
+    Returns a digest of the contents of a table file, so that copies of the same
+    data (e.g. in several installs sharing cache_dir()) get the same digest.
+    Each version of a file, by size and modification time, is hashed once per process.
+    """
+
+    try:
+        st = os.stat(fp)
+        version = (str(fp), st.st_size, st.st_mtime_ns)
+    except TypeError:
+        # a resource inside an archive, which cannot change while the process runs
+        version = (str(fp),)
+
+    if version not in _digests:
+        with fp.open('rb') if hasattr(fp, 'read_bytes') else open(fp, 'rb') as f:
+            token = '{}:{}'.format(GRID_FORMAT, hashlib.sha1(f.read()).hexdigest())
+        _digests[version] = hashlib.sha1(token.encode()).hexdigest()[:16]
+
+    return _digests[version]
+
+
+def data_digest(band, law, cool=False, source=None):
+
+    """
+    Returns a digest identifying the contents of the table holding (band, law),
+    or of both TESS tables for cool='auto'.
+    """
+
+    if cool == 'auto':
+        return '-'.join(data_digest(band, law, c, source) for c in ([True, False] if band == 'T' and source is None else [False]))
+
+    return _source_digest(get_source(band, law, cool, source)[0])
+
+
+def _table_name(band):
+    return 'all' if band is None else band.replace('*', '_star')
+
+
+def _read_csv(fp):
+
+    """
+    Parses a gzipped csv table into a structured array, with float columns for
+    numeric fields and fixed-width strings for text fields. The file is
+    decompressed once, and parsed by numpy in a single pass.
+    """
+
+    with gzip.open(fp, 'rt') as f:
+        text = f.read()
+
+    lines = text.splitlines()
+    header, first = csv.reader(lines[:2])
+
+    def numeric(value):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+
+    # no field is longer than its line; ASCII text parses faster as bytes
+    width = '{}{}'.format('S' if text.isascii() else 'U', max(map(len, lines)))
+    dtype = [(name, float if numeric(value) else width) for name, value in zip(header, first)]
+    table = np.loadtxt(lines, delimiter=',', quotechar='"', skiprows=1, dtype=dtype, ndmin=1)
+
+    columns = {name: table[name] if kind == float else _text(table[name]) for name, kind in dtype}
+    out = np.empty(len(table), dtype=[(name, column.dtype) for name, column in columns.items()])
+    for name, column in columns.items():
+        out[name] = column
+
+    return out
+
+
+def _text(column):
+
+    """
+    Returns a column of fixed-width strings as unicode, shrunk to its longest value.
+    """
+
+    if column.dtype.kind == 'U':
+        return column.astype('U{}'.format(max(1, np.char.str_len(column).max(initial=0))))
+
+    # ASCII bytes map one to one onto code points, which is much faster than numpy's cast
+    chars = np.ascontiguousarray(column).view(np.uint8).reshape(len(column), -1)
+    used = np.flatnonzero(chars.any(axis=0))
+    chars = chars[:, :max(1, used[-1] + 1 if len(used) else 1)]
+    return np.ascontiguousarray(chars.astype(np.uint32)).view('U{}'.format(chars.shape[1])).ravel()
+
+
+def _save(path, array):
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _compile(fp, directory, by_band):
+
+    """
+    Parses a packaged csv.gz table and writes one .npy file per band (or one for the whole table).
+    Returns the parsed tables keyed by file name, and whether they could be written.
+    """
+
+    table = _read_csv(fp)
+
+    if by_band:
+        tables = {_table_name(band): table[table['band'] == band] for band in np.unique(table['band'])}
+    else:
+        tables = {_table_name(None): table}
+
+    written = False
+    if directory is not None:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for name, table in tables.items():
+                _save(os.path.join(directory, name + '.npy'), table)
+            written = True
+        except OSError:
+            pass
+
+        # drop grids compiled in older formats; other versions of the table may
+        # belong to other installs sharing the cache, which could be memory-mapping them
+        stem = directory.rsplit('-v', 1)[0]
+        for stale in glob.glob(glob.escape(stem) + '-v*-*'):
+            version = stale[len(stem) + 2:].split('-', 1)[0]
+            if version.isdigit() and int(version) < GRID_FORMAT:
+                shutil.rmtree(stale, ignore_errors=True)
+
+    return tables, written
+
+
+# tables parsed in this process that could not be written to cache_dir()
+_parsed = {}
+
+
+def load_table(fp, band=None):
+
+    """
+    Loads a packaged csv.gz table (restricted to `band` if given) as a structured array.
+    The first load compiles it to .npy files in cache_dir(), which later loads
+    memory-map. Compiled files are keyed on the contents of the source file and
+    the GRID_FORMAT, so they are regenerated whenever the packaged data changes,
+    and installs of the same data share them. Without a writable cache, tables
+    are parsed once per process and kept in memory.
+    """
+
+    name = _table_name(band)
+    root = cache_dir()
+    directory = None
+
+    if root:
+        stem = os.path.basename(str(fp)).split('.')[0]
+        directory = os.path.join(root, 'grids', '{}-v{}-{}'.format(stem, GRID_FORMAT, _source_digest(fp)))
+        try:
+            with current().stage('load'):
+                return np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+
+    key = (_source_digest(fp), band is not None, directory)
+    tables = _parsed.get(key)
+    if tables is None:
+        with current().stage('compile'):
+            tables, written = _compile(fp, directory, by_band=band is not None)
+        if not written:
+            _parsed[key] = tables
+    if name not in tables:
+        raise(ValueError(f"no rows for band {band} in {os.path.basename(str(fp))}"))
+
+    return tables[name]
+
+
+def load_grid(band, law, cool=False, source=None):
+
+    """
+    Returns the coefficient table for (band, law) as a structured (memory-mapped) array.
+    """
+
+    fp, by_band = get_source(band, law, cool=cool, source=source)
+    if str(fp).endswith('.npy'):
+        with current().stage('load'):
+            return np.load(fp, mmap_mode='r')
+
+    return load_table(fp, band if by_band else None)
+
+
+MODELS = dict(A='ATLAS', PC='PHOENIX')
+
+# lowest teff of the ATLAS grid of the T band, below which its PHOENIX-COND grid is used
+COOL_TEFF = 3500.0
+
+
+def default_selection(band, cool=False, source=None):
+
+    """
+    The (xi, method, model) grid used when none is requested: microturbulence 2 km/s,
+    least-squares fits and ATLAS models, or the PHOENIX-COND grid for cool TESS stars.
+    With cool='auto' this is the selection of the ATLAS grid. Grid sources
+    other than the packaged tables set their own default.
+    """
+
+    if source is not None:
+        from .registry import lookup
+        return dict(lookup(source).selection)
+
+    if band == 'T' and cool and cool != 'auto':
+        return dict(xi=2.0, method='q', model='PHOENIX')
+
+    return dict(xi=2.0, method='L', model='ATLAS')
+
+
+def resolve_selection(band, cool=False, xi=None, method=None, model=None, source=None):
+
+    """
+    Returns the grid selection (xi, method, model), falling back to default_selection(),
+    and the grid source if one is given.
+    """
+
+    selection = default_selection(band, cool=cool, source=source)
+    if xi is not None:
+        selection['xi'] = float(xi)
+    if method is not None:
+        selection['method'] = method
+    if model is not None:
+        selection['model'] = MODELS.get(model, model)
+    if source is not None:
+        selection['source'] = source
+
+    return selection
+
+
+def resolve_cool(band, cool='auto', source=None):
+
+    """
+    Returns the effective cool option: only the packaged T band has a PHOENIX-COND
+    grid, so for other bands and grid sources it is False.
+    """
+
+    if band != 'T' or source is not None:
+        return False
+
+    return cool if cool == 'auto' else bool(cool)
+
+
+def _labels(grid, names, default, aliases={}):
+
+    for name in names:
+        if name in grid.dtype.names:
+            labels, inverse = np.unique(np.asarray(grid[name]), return_inverse=True)
+            return np.array([aliases.get(label, label) for label in labels])[inverse.ravel()]
+
+    return np.full(len(grid), default)
+
+
+def select_rows(grid, xi=2.0, method='L', model='ATLAS'):
+
+    """
+    Returns the rows of a table holding one microturbulence (xi), fitting method (L or F, q for
+    PHOENIX-COND) and model atmosphere (ATLAS or PHOENIX), with each (teff, logg, feh) node
+    appearing once, sorted by teff, logg then feh. Tables without a method column hold
+    least-squares (L) fits. Only the label and coordinate columns are read.
+    """
+
+    columns = dict(
+        xi=_labels(grid, ['xi'], 2.0),
+        method=_labels(grid, ['method'], 'L'),
+        model=_labels(grid, ['model', 'mod'], 'ATLAS', MODELS),
+    )
+    wanted = dict(xi=xi, method=method, model=model)
+
+    idx = np.ones(len(grid), dtype=bool)
+    for name, column in columns.items():
+        match = column == wanted[name]
+        if not np.any(match & idx):
+            available = ' '.join(map(str, np.unique(column[idx])))
+            raise(ValueError(f"no grid with {name}={wanted[name]}, available: {available}"))
+        idx &= match
+
+    rows = np.flatnonzero(idx)
+    nodes = np.column_stack([np.asarray(grid[key])[rows] for key in ['teff', 'logg', 'feh']])
+    order = np.lexsort(nodes.T[::-1])
+    rows, nodes = rows[order], nodes[order]
+
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = np.any(nodes[1:] != nodes[:-1], axis=1)
+
+    return rows[first]
+
+
+def select_grid(grid, xi=2.0, method='L', model='ATLAS'):
+
+    """
+    Restricts a table to one (xi, method, model) grid, see select_rows().
+    """
+
+    return np.asarray(grid[select_rows(grid, xi=xi, method=method, model=model)])
+
+
+def _single_grid(band, cool, source):
+
+    cool = resolve_cool(band, cool, source)
+    if cool == 'auto':
+        raise(ValueError("cool='auto' picks a grid per point; pass cool=True or cool=False for one grid"))
+
+    return cool
+
+
+def get_grid(band, law, cool=False, xi=None, method=None, model=None, source=None):
+
+    """
+    Returns the deduplicated coefficient table for (band, law) and one (xi, method, model)
+    selection; unspecified values fall back to default_selection().
+    cool : for the T band, True for the PHOENIX-COND grid or False for the ATLAS grid
+    """
+
+    cool = _single_grid(band, cool, source)
+    selection = resolve_selection(band, cool=cool, xi=xi, method=method, model=model, source=source)
+    selection.pop('source', None)
+    return select_grid(load_grid(band, law, cool=cool, source=source), **selection)
+
+
+def compact_grid(band, law, cool=False, xi=None, method=None, model=None, source=None, dtype='float32'):
+
+    """
+    Returns the grid of get_grid() reduced to what the interpolators use: an (N, 3)
+    array of (teff, logg, feh) nodes and an (N, k) array of the law's coefficients,
+    both contiguous and of `dtype` (optional, default is float32). The other
+    columns of the table are never copied out of the memory-mapped file.
+    Engines are built from the same arrays, in float64 for the nodes.
+    """
+
+    cool = _single_grid(band, cool, source)
+    selection = resolve_selection(band, cool=cool, xi=xi, method=method, model=model, source=source)
+    return _table(band, law, cool, selection, dtype=resolve_dtype(dtype))
+
+
+def get_df(band, law, cool=False, source=None):
+
+    import pandas as pd
+
+    return pd.DataFrame(load_grid(band, law, cool=cool, source=source))
+
+
+COEFFICIENTS = dict(
+    linear=['u'],
+    quadratic=['u1', 'u2'],
+    squareroot=['u1', 'u2'],
+    logarithmic=['u1', 'u2'],
+    nonlinear=['u1', 'u2', 'u3', 'u4'],
+)
+
+
+def resolve_dtype(dtype):
+
+    """
+    Returns the name of an evaluation dtype, float64 or float32.
+    """
+
+    name = np.dtype(dtype).name
+    if name not in DTYPES:
+        raise(ValueError(f"dtype must be one of: {' '.join(DTYPES)}"))
+
+    return name
+
+
+def get_interpolator(band, kind='linear', law='quadratic', cool=False, xi=None, method=None, model=None, cache=True, blend=0.0, source=None, dtype='float64'):
+
+    """
+    Builds a single vector-valued interpolator engine for all coefficients of `law`.
+    Calling it returns an array with a trailing axis of length len(COEFFICIENTS[law]).
+    xi, method and model select one grid of the table (see get_grid).
+    Engines are kept in the process-wide LRU cache unless cache=False.
+
+    cool : for the T band, True for the PHOENIX-COND grid, False for the ATLAS
+           grid, or 'auto' for an engines.SplitEngine that evaluates each point
+           on PHOENIX-COND below COOL_TEFF and on ATLAS above it, blending them
+           over [COOL_TEFF, COOL_TEFF + blend] (xi, method and model then select
+           the ATLAS grid). Other bands have a single grid, so 'auto' is False.
+    source : name of a registered grid source (see limbdark.registry) to use
+             instead of the packaged tables (optional); cool is then ignored
+    dtype : float64, or float32 to store the engine's coefficient values and evaluate
+            them in single precision (optional, default is float64). Only the values
+            shrink: this halves a regular engine, but nearest engines keep their nodes
+            and k-d tree, and linear engines their triangulation, in float64, so they
+            shrink by ~20% and ~1% (Kp, nonlinear: linear 8.43 to 8.31 MB)
+    """
+
+    cool = resolve_cool(band, cool, source)
+    check_table(band, law, source)
+    dtype = resolve_dtype(dtype)
+
+    if kind not in KINDS:
+        raise(ValueError(f"kind must be one of: {' '.join(KINDS)}"))
+
+    selection = resolve_selection(band, cool=cool, xi=xi, method=method, model=model, source=source)
+    if cool == 'auto':
+        build = partial(_build_split, band, kind, law, selection, float(blend), dtype)
+        key = (band, law, kind, cool, float(blend), selection['xi'], selection['method'], selection['model'])
+    else:
+        build = partial(_build_interpolator, band, kind, law, cool, selection, dtype)
+        key = (band, law, kind, cool, selection['xi'], selection['method'], selection['model'])
+        if source is not None:
+            # an ingested source can be ingested again, here or in another process, while its engines are cached
+            key += (source, data_digest(band, law, cool, source))
+    if dtype != 'float64':
+        key += (dtype,)
+
+    if not cache:
+        return build()
+
+    return interpolator_cache.get(key, build)
+
+
+def _build_split(band, kind, law, selection, blend, dtype='float64'):
+
+    engines = [_build_interpolator(band, kind, law, cool, selection_, dtype)
+               for cool, selection_ in [(True, default_selection(band, cool=True)), (False, selection)]]
+
+    return SplitEngine(*engines, boundary=COOL_TEFF, blend=blend)
+
+
+def _table(band, law, cool, selection, dtype='float64'):
+
+    """
+    Returns the (N, 3) points and (N, k) coefficient values of one grid, copying
+    only those columns of the selected rows out of the table.
+    """
+
+    table = load_grid(band, law, cool=cool, source=selection.get('source'))
+
+    with current().stage('select'):
+        rows = select_rows(table, xi=selection['xi'], method=selection['method'], model=selection['model'])
+        points = np.empty((len(rows), 3), dtype=dtype)
+        values = np.empty((len(rows), len(COEFFICIENTS[law])), dtype=dtype)
+        for j, key in enumerate(['teff', 'logg', 'feh']):
+            points[:, j] = table[key][rows]
+        for j, key in enumerate(COEFFICIENTS[law]):
+            values[:, j] = table[key][rows]
+
+    return points, values
+
+
+def _build_interpolator(band, kind, law, cool, selection, dtype='float64'):
+
+    # nodes are located in double precision, so only the values take dtype
+    points, values = _table(band, law, cool, selection)
+
+    engine = dict(linear=LinearEngine, nearest=NearestEngine, regular=RegularEngine)[kind]
+    with current().stage('build'):
+        return engine(points, values.astype(dtype, copy=False), dtype=dtype)
+
+
+def get_shared_interpolator(grids, kind='linear', cache=True):
+
+    """
+    Builds one engines.SharedEngine for several (band, law) grids, e.g. all the
+    bands of a multi-instrument fit. Grids with identical nodes, such as the
+    bands of a Claret+2011 table, share a single engine, so every query point is
+    located once for all of them. Calling it returns the coefficients of every
+    grid side by side, in order, along a trailing axis.
+
+    grids : sequence of dicts of get_interpolator() arguments: band and law,
+            and optionally cool, xi, method, model, blend, source and dtype
+    """
+
+    if kind not in KINDS:
+        raise(ValueError(f"kind must be one of: {' '.join(KINDS)}"))
+
+    specs = []
+    for grid in grids:
+        band, law, source = grid['band'], grid['law'], grid.get('source')
+        cool = resolve_cool(band, grid.get('cool', False), source)
+        check_table(band, law, source)
+        selection = resolve_selection(band, cool=cool, xi=grid.get('xi'), method=grid.get('method'), model=grid.get('model'), source=source)
+        blend = float(grid.get('blend', 0.0)) if cool == 'auto' else 0.0
+        specs.append((band, law, cool, blend, selection['xi'], selection['method'], selection['model'], source,
+                      resolve_dtype(grid.get('dtype', 'float64'))))
+
+    build = partial(_build_shared, kind, specs)
+    if not cache:
+        return build()
+
+    digests = tuple(data_digest(band, law, cool, source) for band, law, cool, *_, source, _ in specs if source is not None)
+    return interpolator_cache.get(('shared', kind) + tuple(specs) + digests, build)
+
+
+def _build_shared(kind, specs):
+
+    # groups of [engine, [(position, values)]], one per distinct set of nodes
+    groups, nodes = [], {}
+    for i, (band, law, cool, blend, xi, method, model, source, dtype) in enumerate(specs):
+        selection = dict(xi=xi, method=method, model=model, source=source)
+        if cool == 'auto':
+            groups.append([_build_split(band, kind, law, selection, blend, dtype), [(i, None)]])
+            continue
+        points, values = _table(band, law, cool, selection)
+        values = values.astype(dtype, copy=False)
+        key = hashlib.sha1(np.ascontiguousarray(points).tobytes() + dtype.encode()).hexdigest()
+        if key in nodes:
+            group = nodes[key]
+            group[1].append((i, group[0].layout(values)))
+            continue
+        engine = dict(linear=LinearEngine, nearest=NearestEngine, regular=RegularEngine)[kind]
+        with current().stage('build'):
+            nodes[key] = [engine(points, values, dtype=dtype), [(i, None)]]
+        groups.append(nodes[key])
+
+    return SharedEngine(groups)
+
+
+def _component(engine, i, teff, logg, feh):
+    return engine(teff, logg, feh)[..., i]
+
+
+def get_interpolators(band, kind='linear', law='quadratic', cool=False, verbose=False, **selection):
+
+    """
+    Returns one callable per coefficient, all sharing a single engine (see get_interpolator).
+    """
+
+    engine = get_interpolator(band, kind=kind, law=law, cool=cool, **selection)
+    return [partial(_component, engine, i) for i in range(engine.ncoef)]
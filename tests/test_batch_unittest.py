@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Unit tests for the batch and serve commands.
+"""
+
+import io
+import os
+import csv
+import json
+import tempfile
+import unittest
+import numpy as np
+from limbdark import batch, serve
+
+STAR = dict(teff=5500, uteff=100, logg=4.4, ulogg=0.1, feh=0.0, ufeh=0.1)
+
+CSV = """id,teff,uteff,logg,ulogg,feh,ufeh,band
+a,5500,100,4.4,0.1,0,0.1,T
+
+b,6000,100,4.3,0.1,0.1,0.1,Kp
+"""
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_read_csv(self):
+        records = list(batch.read_records(io.StringIO(CSV)))
+        self.assertEqual([r['id'] for r in records], ['a', 'b'])
+
+    def test_read_jsonl(self):
+        f = io.StringIO(json.dumps(dict(STAR, id=1)) + '\n\n' + json.dumps(dict(STAR, id=2)) + '\n')
+        records = list(batch.read_records(f))
+        self.assertEqual([r['id'] for r in records], [1, 2])
+
+    def test_evaluate(self):
+        records = list(batch.read_records(io.StringIO(CSV)))
+        out = batch.evaluate(records, n=1000, covariance=True, seed=0)
+        self.assertEqual([r['id'] for r in out], ['a', 'b'])
+        self.assertEqual([r['band'] for r in out], ['T', 'Kp'])
+        for name in ['u1', 'u1_std', 'u2', 'u2_std', 'u1_u2_cov']:
+            self.assertTrue(np.isfinite(out[0][name]))
+
+    def test_evaluate_default_band(self):
+        with self.assertRaises(ValueError):
+            batch.evaluate([STAR], n=10)
+        out, = batch.evaluate([STAR], band='V', law='linear', n=10)
+        self.assertEqual(out['band'], 'V')
+        self.assertIn('u_std', out)
+
+    def test_run_chunks(self):
+        records = [dict(STAR, id=i) for i in range(5)]
+        f = io.StringIO()
+        batch.run(records, batch.RecordWriter(f, 'jsonl'), chunk=2, seed=1, band='T', n=500)
+        lines = [json.loads(line) for line in f.getvalue().splitlines()]
+        self.assertEqual([r['id'] for r in lines], list(range(5)))
+
+        # same seed and chunks, same results
+        g = io.StringIO()
+        batch.run(records, batch.RecordWriter(g, 'jsonl'), chunk=2, seed=1, band='T', n=500)
+        self.assertEqual(f.getvalue(), g.getvalue())
+
+    def test_write_csv(self):
+        f = io.StringIO()
+        batch.RecordWriter(f, 'csv').write([dict(STAR, id='x', band='T')])
+        lines = f.getvalue().splitlines()
+        self.assertEqual(lines[0], 'teff,uteff,logg,ulogg,feh,ufeh,id,band')
+        self.assertEqual(len(lines), 2)
+
+    def test_write_csv_mixed_laws(self):
+        stars = "teff,uteff,logg,ulogg,feh,ufeh,law\n5500,100,4.4,0.1,0,0.1,quadratic\n5500,100,4.4,0.1,0,0.1,nonlinear\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stars.csv')
+            with open(path, 'w') as f:
+                f.write(stars)
+            out = os.path.join(tmp, 'out.csv')
+            batch.main([path, '--band', 'Kp', '--chunk', '1', '-n', '100', '--cov', '-o', out])
+            with open(out) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]['u3'], '')
+        for name in ['u3', 'u3_std', 'u4', 'u4_std', 'u3_u4_cov']:
+            self.assertTrue(np.isfinite(float(rows[1][name])))
+
+    def test_write_csv_new_field(self):
+        writer = batch.RecordWriter(io.StringIO(), 'csv', fields=batch.result_fields(['quadratic']))
+        writer.write([dict(STAR, u1=0.4)])
+        # empty fields outside the header are fine, values are not dropped silently
+        writer.write([dict(STAR, u1=0.4, u1_u3_cov=np.nan)])
+        with self.assertRaises(ValueError):
+            writer.write([dict(STAR, u1=0.4, u3=0.1)])
+
+
+class TestServe(unittest.TestCase):
+
+    defaults = dict(band='T', law=None, kind='nearest', xi=None, method=None, model=None, n=500, sampler='random',
+                    propagation='mc', quantiles=None, covariance=False, transform=False)
+
+    def test_star(self):
+        response = serve.handle(dict(STAR, id=7, seed=0), self.defaults)
+        self.assertEqual(response['id'], 7)
+        self.assertNotIn('seed', response)
+        self.assertTrue(np.isfinite(response['u1']))
+
+    def test_stars(self):
+        response = serve.handle(dict(stars=[STAR, STAR], law='linear', propagation='unscented', kind='regular'), self.defaults)
+        self.assertEqual(len(response['results']), 2)
+        self.assertEqual(response['results'][0]['law'], 'linear')
+
+    def test_errors(self):
+        self.assertIn('error', serve.handle([1], self.defaults))
+        self.assertEqual(serve.handle(dict(id='x', teff=1), self.defaults)['id'], 'x')
+        self.assertIn('error', json.loads(serve.respond('nonsense', self.defaults)))
+        self.assertIn('error', serve.handle(dict(op='nothing'), self.defaults))
+
+    def test_stream(self):
+        fin = io.StringIO('{"op": "info"}\n' + json.dumps(STAR) + '\n')
+        fout = io.StringIO()
+        serve.serve_stream(fin, fout, self.defaults)
+        info, result = [json.loads(line) for line in fout.getvalue().splitlines()]
+        self.assertIn('hits', info['cache'])
+        self.assertIn('u2_std', result)
+
+    def test_info_after_float32(self):
+        fin = io.StringIO(json.dumps(dict(STAR, dtype='float32')) + '\n{"op": "info"}\n')
+        fout = io.StringIO()
+        serve.serve_stream(fin, fout, self.defaults)
+        result, info = [json.loads(line) for line in fout.getvalue().splitlines()]
+        self.assertIn('u2_std', result)
+        self.assertTrue(any('float32' in key for key in info['cache']['keys']))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+"""
+Unit tests for the benchmark suite.
+"""
+
+import unittest
+from limbdark import bench
+
+
+class TestBench(unittest.TestCase):
+
+    def test_compare(self):
+        baseline = dict(results={'a': dict(time=1.0), 'b': dict(time=1.0), 'c': dict(time=1.0)})
+        current = dict(results={'a': dict(time=1.1), 'b': dict(time=2.0), 'd': dict(time=9.0)})
+        self.assertEqual(bench.compare(current, baseline, threshold=0.25), [('b', 1.0, 2.0)])
+
+    def test_eval(self):
+        results = bench.bench_eval(['regular'], [100], repeat=1)
+        self.assertIn('eval[regular/n=100]', results)
+        self.assertGreater(results['eval[regular/n=100]']['rate'], 0)
+
+    def test_build(self):
+        results = bench.bench_build(['T'], ['linear'], ['nearest'], repeat=1)
+        self.assertEqual(list(results), ['build[T/linear/nearest]'])
+
+
+if __name__ == "__main__":
+    unittest.main()
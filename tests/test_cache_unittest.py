@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Unit tests for the process-wide interpolator cache.
+"""
+
+import unittest
+import numpy as np
+import limbdark
+from limbdark.cache import InterpolatorCache, interpolator_cache
+from limbdark.interpolator import LDInterpolator
+
+
+class TestInterpolatorCache(unittest.TestCase):
+
+    def setUp(self):
+        limbdark.clear_cache()
+
+    def tearDown(self):
+        limbdark.clear_cache()
+
+    def test_reuse(self):
+        a = LDInterpolator('T', kind='nearest')
+        b = LDInterpolator('T', kind='nearest')
+        self.assertIs(a.engine, b.engine)
+        info = limbdark.cache_info()
+        self.assertEqual(info['misses'], 1)
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['size'], 1)
+        self.assertGreater(info['nbytes'], 0)
+        self.assertIn(('T', 'quadratic', 'nearest', False, 2.0, 'L', 'ATLAS'), info['keys'])
+
+    def test_bypass(self):
+        a = LDInterpolator('T', kind='nearest')
+        b = LDInterpolator('T', kind='nearest', cache=False)
+        self.assertIsNot(a.engine, b.engine)
+        self.assertEqual(len(interpolator_cache), 1)
+
+    def test_claret_uses_cache(self):
+        limbdark.claret('T', 5000, 100, 4.5, 0.1, 0.0, 0.1, n=100)
+        limbdark.claret('T', 5100, 100, 4.4, 0.1, 0.0, 0.1, n=100)
+        self.assertEqual(limbdark.cache_info()['hits'], 1)
+
+    def test_clear(self):
+        LDInterpolator('T', kind='nearest')
+        limbdark.clear_cache()
+        info = limbdark.cache_info()
+        self.assertEqual(info['size'], 0)
+        self.assertEqual(info['misses'], 0)
+
+
+class TestEviction(unittest.TestCase):
+
+    def test_lru_order(self):
+        cache = InterpolatorCache(maxsize=2)
+        cache.get('a', lambda: np.zeros(1))
+        cache.get('b', lambda: np.zeros(1))
+        cache.get('a', lambda: np.zeros(1))
+        cache.get('c', lambda: np.zeros(1))
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_maxbytes(self):
+        class Engine:
+            nbytes = 100
+        cache = InterpolatorCache(maxbytes=250)
+        for key in 'abc':
+            cache.get(key, Engine)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.nbytes, 250)
+
+    def test_resize(self):
+        cache = InterpolatorCache(maxsize=4)
+        for key in 'abcd':
+            cache.get(key, object)
+        cache.resize(maxsize=1)
+        self.assertEqual(list(cache.info()['keys']), ['d'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Unit tests for limb darkening from posterior chains.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+import numpy as np
+import limbdark
+from limbdark.cli import main
+from limbdark.chain import open_chain
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+class TestChain(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        # teff and logg strongly correlated, as in a transit + spectroscopy fit
+        cov = [[100.0 ** 2, 0.9 * 100 * 0.1, 0], [0.9 * 100 * 0.1, 0.1 ** 2, 0], [0, 0, 0.1 ** 2]]
+        cls.chain = rng.multivariate_normal([5500, 4.4, 0.0], cov, size=20000)
+        cls.tmp = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmp, 'chain.npy')
+        np.save(cls.path, cls.chain)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_memory_mapped(self):
+        self.assertIsInstance(open_chain(self.path), np.memmap)
+        from_file = limbdark.claret_chain('T', self.path, kind='regular', chunksize=3000, full_output=True)
+        in_memory = limbdark.claret_chain('T', self.chain, kind='regular', full_output=True)
+        np.testing.assert_allclose(from_file.mean, in_memory.mean, rtol=1e-12)
+        np.testing.assert_allclose(from_file.cov, in_memory.cov, rtol=1e-9)
+        self.assertEqual(from_file.n_chain, 20000)
+        self.assertEqual(from_file.n_eff, 20000)
+
+    def test_thin_and_burn(self):
+        result = limbdark.claret_chain('T', self.chain, kind='regular', thin=3, burn=100, chunksize=1000, full_output=True)
+        expected = limbdark.claret_chain('T', self.chain[100::3], kind='regular', full_output=True)
+        self.assertEqual(result.n_chain, len(self.chain[100::3]))
+        np.testing.assert_allclose(result.mean, expected.mean, rtol=1e-12)
+        with self.assertRaises(ValueError):
+            limbdark.claret_chain('T', self.chain, thin=0)
+
+    def test_correlations(self):
+        # independent Gaussians with the same marginals ignore the teff-logg correlation
+        chain = limbdark.claret_chain('T', self.chain, kind='regular', full_output=True)
+        gaussian = limbdark.claret('T', 5500, 100, 4.4, 0.1, 0.0, 0.1, n=20000, kind='regular', seed=0, full_output=True)
+        np.testing.assert_allclose(chain.mean, gaussian.mean, atol=2e-3)
+        self.assertFalse(np.allclose(chain.std, gaussian.std, rtol=0.02))
+
+    def test_columns(self):
+        table = np.zeros(len(self.chain), dtype=[('logg', float), ('feh', float), ('teff', float), ('lnp', float)])
+        table['teff'], table['logg'], table['feh'] = self.chain.T
+        expected = limbdark.claret_chain('Kp', self.chain)
+        np.testing.assert_allclose(limbdark.claret_chain('Kp', table), expected)
+        np.testing.assert_allclose(limbdark.claret_chain('Kp', self.chain[:, [2, 0, 1]], columns=[1, 2, 0]), expected)
+        with self.assertRaises(ValueError):
+            limbdark.claret_chain('Kp', table, columns=['teff', 'logg', 'mh'])
+
+    def test_domain(self):
+        chain = self.chain.copy()
+        chain[:100, 0] = 60000
+        result = limbdark.claret_chain('Kp', chain, domain='clamp', full_output=True)
+        self.assertEqual(result.n_eff, len(chain))
+        self.assertAlmostEqual(result.p_inside, 1 - 100 / len(chain))
+        with self.assertRaises(ValueError):
+            limbdark.claret_chain('Kp', chain, domain='raise')
+        with self.assertRaises(ValueError):
+            limbdark.claret_chain('Kp', chain, domain='truncate')
+
+    @unittest.skipIf(h5py is None, "h5py is not installed")
+    def test_hdf5(self):
+        path = os.path.join(self.tmp, 'chain.h5')
+        with h5py.File(path, 'w') as f:
+            f['samples'] = self.chain
+        result = limbdark.claret_chain('Kp', path, dataset='samples', chunksize=4096)
+        np.testing.assert_allclose(result, limbdark.claret_chain('Kp', self.chain))
+        # closed again: HDF5 refuses to reopen a file for writing while it is open read-only
+        with h5py.File(path, 'r+'):
+            pass
+
+    def test_hdf5_closed(self):
+
+        class Dataset(np.ndarray):
+            """Stands in for an h5py dataset, whose file open_chain opened."""
+
+        rows = self.chain.view(Dataset)
+        rows.file = mock.Mock()
+        with mock.patch('limbdark.chain.open_chain', return_value=rows):
+            limbdark.claret_chain('Kp', 'chain.h5', kind='nearest')
+            rows.file.close.assert_called_once()
+            rows.file.close.reset_mock()
+            with self.assertRaises(ValueError):
+                limbdark.claret_chain('Kp', 'chain.h5', kind='nearest', columns=[0, 1, 7])
+            rows.file.close.assert_called_once()
+            # arrays passed in are the caller's to close
+            rows.file.close.reset_mock()
+            limbdark.claret_chain('Kp', rows, kind='nearest')
+            rows.file.close.assert_not_called()
+
+    def test_cli(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            main(['--band', 'Kp', '--chain', self.path, '--thin', '10'])
+        self.assertIn('u1 = ', stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
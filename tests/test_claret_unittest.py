@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+Unit tests for the claret() Monte Carlo estimators.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+import limbdark
+from limbdark.stats import RunningStats, LDResult
+from limbdark.sampling import standard_normal, SAMPLERS
+from limbdark.propagation import sigma_points, unscented, linearized
+
+
+class TestClaretBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.stars = pd.DataFrame(dict(
+            teff=[5000, 3400, 6000], uteff=[100, 100, 100],
+            logg=[4.5, 5.0, 4.3], ulogg=[0.1, 0.1, 0.1],
+            feh=[0.0, 0.0, 0.1], ufeh=[0.1, 0.1, 0.1],
+            band=['T', 'T', 'Kp'],
+        ), index=['a', 'b', 'c'])
+
+    def test_dataframe(self):
+        out = limbdark.claret_batch(None, self.stars, n=2000, quantiles=[0.16, 0.84])
+        self.assertIsInstance(out, pd.DataFrame)
+        self.assertEqual(list(out.index), ['a', 'b', 'c'])
+        for name in ['u1', 'u1_std', 'u1_q0.16', 'u1_q0.84', 'u2', 'u2_std']:
+            self.assertIn(name, out.columns)
+            self.assertTrue(np.all(np.isfinite(out[name])))
+        self.assertTrue(np.all(out['u1_q0.16'] < out['u1_q0.84']))
+
+    def test_matches_claret(self):
+        star = self.stars.loc['a']
+        np.random.seed(1)
+        expected = limbdark.claret('T', star.teff, star.uteff, star.logg, star.ulogg, star.feh, star.ufeh, n=20000)
+        out = limbdark.claret_batch('T', self.stars.iloc[:1], n=20000)
+        np.testing.assert_allclose(out.loc['a', ['u1', 'u1_std', 'u2', 'u2_std']].values.astype(float), expected, rtol=0.05)
+
+    def test_structured_array(self):
+        stars = {key: self.stars[key].values for key in 'teff uteff logg ulogg feh ufeh'.split()}
+        out = limbdark.claret_batch('V', stars, n=500, law='nonlinear')
+        self.assertIsInstance(out, np.ndarray)
+        self.assertEqual(len(out), 3)
+        self.assertIn('u4_std', out.dtype.names)
+        self.assertTrue(np.all(out['band'] == 'V'))
+
+    def test_transform(self):
+        out = limbdark.claret_batch('T', self.stars, n=500, transform=True)
+        self.assertIn('q1', out.columns)
+        self.assertNotIn('u1', out.columns)
+
+    def test_missing_column(self):
+        with self.assertRaises(ValueError):
+            limbdark.claret_batch('T', dict(teff=[5000]), n=10)
+
+    def test_covariance(self):
+        star = self.stars.loc['a']
+        expected = limbdark.claret('T', star.teff, star.uteff, star.logg, star.ulogg, star.feh, star.ufeh, n=20000, seed=2, full_output=True)
+        out = limbdark.claret_batch('T', self.stars.iloc[:1], n=20000, covariance=True, seed=2)
+        self.assertNotIn('u2_u1_cov', out.columns)
+        np.testing.assert_allclose(out.loc['a', 'u1_u2_cov'], expected.cov[0, 1], rtol=0.2)
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_matches_numpy(self):
+        rng = np.random.default_rng(0)
+        x = rng.normal(size=(1000, 3)) @ [[1, 0.5, 0], [0, 1, 0.2], [0, 0, 2]] + [1, 2, 3]
+        stats = RunningStats(3)
+        for block in np.array_split(x, 7):
+            stats.update(block)
+        self.assertEqual(stats.n, 1000)
+        np.testing.assert_allclose(stats.mean, x.mean(axis=0))
+        np.testing.assert_allclose(stats.cov, np.cov(x.T, ddof=0))
+        np.testing.assert_allclose(stats.std, x.std(axis=0))
+
+    def test_combine_and_nan(self):
+        a, b = RunningStats(2), RunningStats(2)
+        a.update([[1.0, 2.0], [np.nan, 0.0]])
+        b.update([[3.0, 4.0]])
+        a.combine(b)
+        self.assertEqual(a.n, 2)
+        np.testing.assert_allclose(a.mean, [2.0, 3.0])
+        self.assertTrue(np.all(np.isnan(RunningStats(2).result(['u1', 'u2']).mean)))
+
+
+class TestClaretChunked(unittest.TestCase):
+
+    def test_chunked_matches_one_shot(self):
+        args = ('T', 5000, 100, 4.5, 0.1, 0.0, 0.1)
+        np.random.seed(3)
+        one = limbdark.claret(*args, n=10000)
+        np.random.seed(3)
+        chunked = limbdark.claret(*args, n=10000, chunksize=999)
+        np.testing.assert_allclose(chunked, one, rtol=1e-10)
+
+    def test_full_output(self):
+        result = limbdark.claret('T', 5000, 100, 4.5, 0.1, 0.0, 0.1, n=5000, chunksize=1000, full_output=True)
+        self.assertIsInstance(result, LDResult)
+        self.assertEqual(result.names, ['u1', 'u2'])
+        self.assertEqual(result.cov.shape, (2, 2))
+        self.assertEqual(result.n, 5000)
+        self.assertLess(result.corr[0, 1], 0)
+
+    def test_linear_law_layout(self):
+        ld = limbdark.claret('T', 5000, 100, 4.5, 0.1, 0.0, 0.1, n=100, law='linear')
+        self.assertIsInstance(ld, tuple)
+        self.assertEqual(len(ld), 2)
+
+    def test_batch_chunked(self):
+        stars = dict(teff=[5000, 5500, 6000], uteff=[100] * 3, logg=[4.5] * 3, ulogg=[0.1] * 3, feh=[0.0] * 3, ufeh=[0.1] * 3)
+        out = limbdark.claret_batch('T', stars, n=1000, chunksize=1000)
+        self.assertTrue(np.all(np.isfinite(out['u1'])))
+
+
+class TestClaretParallel(unittest.TestCase):
+
+    args = ('T', 5000, 100, 4.5, 0.1, 0.0, 0.1)
+
+    def test_seed_reproducible(self):
+        a = limbdark.claret(*self.args, n=20000, seed=7, chunksize=5000)
+        b = limbdark.claret(*self.args, n=20000, seed=7, chunksize=5000)
+        c = limbdark.claret(*self.args, n=20000, seed=8, chunksize=5000)
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_workers_deterministic(self):
+        serial = limbdark.claret(*self.args, n=20000, seed=7, chunksize=5000)
+        parallel = limbdark.claret(*self.args, n=20000, seed=7, chunksize=5000, workers=2)
+        np.testing.assert_allclose(parallel, serial, rtol=1e-12)
+
+    def test_batch_workers_deterministic(self):
+        stars = dict(teff=[5000, 5500, 6000, 6500], uteff=[100] * 4, logg=[4.5] * 4, ulogg=[0.1] * 4, feh=[0.0] * 4, ufeh=[0.1] * 4)
+        serial = limbdark.claret_batch('T', stars, n=1000, chunksize=2000, seed=3)
+        parallel = limbdark.claret_batch('T', stars, n=1000, chunksize=2000, seed=3, workers=2)
+        np.testing.assert_allclose(parallel['u1'], serial['u1'], rtol=1e-12)
+        np.testing.assert_allclose(parallel['u2_std'], serial['u2_std'], rtol=1e-12)
+
+
+class TestSamplers(unittest.TestCase):
+
+    args = ('Kp', 4970, 120, 4.25, 0.03, 0.0, 0.2)
+
+    def test_generator_seed(self):
+        a = limbdark.claret(*self.args, n=2000, seed=np.random.default_rng(5))
+        b = limbdark.claret(*self.args, n=2000, seed=np.random.default_rng(5))
+        self.assertEqual(a, b)
+
+    def test_standard_normal(self):
+        for sampler in SAMPLERS:
+            z = standard_normal(sampler, 1, 4096)
+            self.assertEqual(z.shape, (4096, 3))
+            self.assertTrue(np.all(np.isfinite(z)))
+            np.testing.assert_allclose(z.mean(axis=0), 0, atol=0.05)
+            np.testing.assert_allclose(z.std(axis=0), 1, atol=0.05)
+
+    def test_sobol_blocks_continue_sequence(self):
+        whole = standard_normal('sobol', 3, 256)
+        parts = np.vstack([standard_normal('sobol', 3, 100), standard_normal('sobol', 3, 156, offset=100)])
+        np.testing.assert_allclose(parts, whole)
+
+    def test_qmc_precision(self):
+        ref = limbdark.claret(*self.args, n=400000, kind='regular', seed=0, full_output=True)
+        for sampler in ['sobol', 'halton', 'lhs']:
+            result = limbdark.claret(*self.args, n=4096, kind='regular', seed=1, sampler=sampler, full_output=True)
+            self.assertEqual(result.n, 4096)
+            self.assertTrue(np.all(result.mcerr < 2e-4))
+            np.testing.assert_allclose(result.mean, ref.mean, atol=5e-4)
+            np.testing.assert_allclose(result.std, ref.std, atol=5e-4)
+
+    def test_random_mcerr(self):
+        result = limbdark.claret(*self.args, n=10000, seed=2, full_output=True)
+        np.testing.assert_allclose(result.mcerr, result.std / 100)
+
+    def test_unknown_sampler(self):
+        with self.assertRaises(ValueError):
+            limbdark.claret(*self.args, n=10, sampler='grid')
+
+
+class TestDeterministicPropagation(unittest.TestCase):
+
+    args = ('T', 5800, 80, 4.4, 0.1, 0.1, 0.1)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.mc = limbdark.claret(*cls.args, n=200000, kind='regular', seed=1, full_output=True)
+
+    def test_sigma_points(self):
+        points, wm, wc = sigma_points(np.zeros(3), np.ones(3))
+        self.assertEqual(points.shape, (7, 3))
+        self.assertAlmostEqual(wm.sum(), 1)
+        mean, cov = unscented(lambda x: x @ np.array([[1.0], [2.0], [3.0]]), [1, 2, 3], [1, 1, 2])
+        np.testing.assert_allclose(mean, [14])
+        np.testing.assert_allclose(cov, [[1 + 4 + 36]])
+
+    def test_linearized_exact_for_linear(self):
+        A = np.array([[1.0, 0.5], [2.0, 0.0], [3.0, -1.0]])
+        mean, cov = linearized(lambda x: x @ A, [1, 2, 3], [1, 0, 2])
+        np.testing.assert_allclose(mean, [14, -2.5])
+        np.testing.assert_allclose(cov, A.T @ np.diag([1, 0, 4]) @ A)
+
+    def test_matches_monte_carlo(self):
+        for propagation in ['unscented', 'linear']:
+            result = limbdark.claret(*self.args, kind='regular', propagation=propagation, full_output=True)
+            self.assertEqual(result.cov.shape, (2, 2))
+            np.testing.assert_allclose(result.mean, self.mc.mean, atol=2e-3)
+            np.testing.assert_allclose(result.std, self.mc.std, rtol=0.1)
+
+    def test_layout(self):
+        ld = limbdark.claret(*self.args, kind='regular', propagation='unscented')
+        self.assertEqual(len(ld), 4)
+        ld = limbdark.claret(*self.args, kind='regular', propagation='linear', law='linear')
+        self.assertIsInstance(ld, tuple)
+
+    def test_nearest_warns(self):
+        with self.assertWarns(UserWarning):
+            limbdark.claret(*self.args, propagation='unscented')
+
+    def test_batch(self):
+        stars = dict(teff=[5800, 6000], uteff=[80, 80], logg=[4.4, 4.4], ulogg=[0.1, 0.1], feh=[0.1, 0.1], ufeh=[0.1, 0.1])
+        out = limbdark.claret_batch('T', stars, kind='regular', propagation='unscented', quantiles=[0.5])
+        result = limbdark.claret(*self.args, kind='regular', propagation='unscented', full_output=True)
+        np.testing.assert_allclose([out['u1'][0], out['u1_std'][0]], [result.mean[0], result.std[0]])
+        np.testing.assert_allclose(out['u1_q0.5'], out['u1'])
+
+
+if __name__ == "__main__":
+    unittest.main()
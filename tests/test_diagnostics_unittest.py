@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Unit tests for the opt-in stage timings and diagnostics.
+"""
+
+import logging
+import unittest
+import warnings
+import limbdark
+from limbdark import diagnostics
+
+STAR = ('T', 5500, 100, 4.4, 0.1, 0.0, 0.1)
+
+
+class TestDiagnostics(unittest.TestCase):
+
+    def test_recorder(self):
+        with diagnostics.recording() as d:
+            with diagnostics.current().stage('a'):
+                pass
+            diagnostics.current().count('samples', 10)
+            diagnostics.current().count('nan', 2)
+        self.assertIs(diagnostics.current(), diagnostics.NULL)
+
+        out = d.to_dict()
+        self.assertIn('a', out['timings'])
+        self.assertEqual(out['nan_fraction'], 0.2)
+
+        merged = diagnostics.Diagnostics().merge(out).merge(d).merge(None).to_dict()
+        self.assertEqual(merged['samples'], 20)
+        self.assertEqual(merged['nan_fraction'], 0.2)
+
+    def test_disabled(self):
+        with diagnostics.recording(False) as d:
+            self.assertFalse(d)
+            self.assertIsNone(d.to_dict())
+        result = limbdark.claret(*STAR, n=100, full_output=True)
+        self.assertNotIn('diagnostics', result.info)
+
+    def test_claret(self):
+        result = limbdark.claret(*STAR, n=3000, chunksize=1000, seed=0, full_output=True, diagnostics=True)
+        out = result.diagnostics
+        for stage in ['sample', 'evaluate', 'reduce', 'total']:
+            self.assertIn(stage, out['timings'])
+        self.assertEqual(out['samples'], 3000)
+        self.assertEqual(out['cache_hits'] + out.get('cache_misses', 0), 3)
+
+    def test_build_stages(self):
+        limbdark.clear_cache()
+        calls = []
+        limbdark.claret(*STAR, n=100, kind='regular', propagation='unscented', diagnostics=calls.append)
+        out, = calls
+        self.assertEqual(out['cache_misses'], 1)
+        self.assertEqual(out['samples'], 7)
+        for stage in ['select', 'build', 'evaluate']:
+            self.assertIn(stage, out['timings'])
+
+    def test_outside_grid(self):
+        # a wide prior on Teff near the cool edge of the grid
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            result = limbdark.claret('T', 3600, 500, 4.5, 0.1, 0.0, 0.1, n=2000, kind='regular', seed=0,
+                                     full_output=True, diagnostics=True)
+        out = result.diagnostics
+        self.assertGreater(out['nan'], 0)
+        self.assertAlmostEqual(out['nan_fraction'], out['nan'] / 2000)
+        self.assertEqual(result.n, 2000 - out['nan'])
+
+    def test_parallel(self):
+        result = limbdark.claret(*STAR, n=4000, chunksize=1000, seed=0, workers=2, full_output=True, diagnostics=True)
+        self.assertEqual(result.diagnostics['samples'], 4000)
+
+    def test_logging(self):
+        with self.assertLogs('limbdark.diagnostics', level='DEBUG') as logs:
+            result = limbdark.claret(*STAR, n=100, full_output=True)
+        self.assertIn('band=T', logs.output[0])
+        self.assertIn('diagnostics', result.info)
+        self.assertFalse(diagnostics.logger.isEnabledFor(logging.DEBUG))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Unit tests for domain-aware sampling near the edges of the grids.
+"""
+
+import unittest
+import warnings
+import numpy as np
+from scipy.special import ndtr
+import limbdark
+from limbdark.domain import check, clamp, inside, probability_inside, standardized_bounds, truncate
+from limbdark.sampling import standard_normal, truncated_normal
+
+# a cool dwarf on the low-Teff, high-logg edge of the Claret+2011 grid
+EDGE = ('Kp', 3600, 200, 4.8, 0.3, 0.0, 0.1)
+
+# a metal-poor star at the low-[Fe/H] edge of the TESS ATLAS grid; the PHOENIX-COND grid has no feh axis
+METAL_POOR = ('T', 6000, 100, 4.4, 0.1, -4.9, 0.3)
+
+
+class TestTruncatedNormal(unittest.TestCase):
+
+    def test_bounds_and_mean(self):
+        a, b = np.array([-np.inf, 1.0, -0.5]), np.array([np.inf, np.inf, 0.5])
+        z = standard_normal('random', 0, 100000, lower=a, upper=b)
+        self.assertTrue(np.all((z >= a) & (z <= b)))
+        # mean of the standard normal truncated to [1, inf)
+        self.assertAlmostEqual(z[:, 1].mean(), 1.5251, places=2)
+        self.assertAlmostEqual(z[:, 2].mean(), 0.0, places=2)
+
+    def test_far_tail(self):
+        u = np.linspace(0.01, 0.99, 99)
+        z = truncated_normal(u, 9.0, 10.0)
+        self.assertTrue(np.all(np.isfinite(z)))
+        self.assertTrue(np.all((z >= 9) & (z <= 10)))
+        # computed through the mirror image in the lower tail
+        lower = truncated_normal(u, -10.0, -9.0)
+        self.assertTrue(np.all(np.diff(lower) > 0))
+        np.testing.assert_allclose(z, -lower)
+
+    def test_qmc(self):
+        z = standard_normal('sobol', 0, 1024, lower=np.array([0.0, 0.0, 0.0]))
+        self.assertTrue(np.all(z >= 0))
+
+    def test_probability_inside(self):
+        lower, upper = np.array([0.0, -np.inf, -1.0]), np.array([np.inf, np.inf, 1.0])
+        p = probability_inside([0.0, 5.0, 0.0], [1.0, 1.0, 0.0], lower, upper)
+        self.assertAlmostEqual(float(p), 0.5)
+        p = probability_inside([0.0, 5.0, 2.0], [1.0, 1.0, 0.0], lower, upper)
+        self.assertEqual(float(p), 0.0)
+        a, b = standardized_bounds([0.0, 5.0, 2.0], [1.0, 1.0, 0.0], lower, upper)
+        self.assertEqual((a[2], b[2]), (-np.inf, np.inf))
+
+    def test_several_boxes(self):
+        # as a SplitEngine's: the box of each side of teff = 0
+        boxes = [(np.array([-np.inf, -1.0, -np.inf]), np.array([0.0, 1.0, np.inf])),
+                 (np.array([0.0, 0.0, -np.inf]), np.array([np.inf, np.inf, np.inf]))]
+        p = [0.5 * (ndtr(1) - ndtr(-1)), 0.25]
+        mu, sigma = np.zeros(3), np.ones(3)
+        self.assertAlmostEqual(float(check('truncate', mu, sigma, boxes)), sum(p))
+        with self.assertRaises(ValueError):
+            check('raise', mu, sigma, boxes)
+
+        z = truncate(np.random.default_rng(0).random((100000, 3)), mu, sigma, boxes)
+        self.assertTrue(np.all(inside(z, boxes)))
+        self.assertAlmostEqual(np.mean(z[:, 0] < 0), p[0] / sum(p), places=2)
+
+        points = np.array([[-1.0, 2.0, 0.0], [1.0, -2.0, 0.0], [-1.0, 0.5, 0.0]])
+        np.testing.assert_array_equal(clamp(points, boxes), [[-1.0, 1.0, 0.0], [1.0, 0.0, 0.0], [-1.0, 0.5, 0.0]])
+
+
+class TestDomain(unittest.TestCase):
+
+    def claret(self, domain, **kwargs):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            result = limbdark.claret(*EDGE, n=20000, kind='regular', seed=1, full_output=True, domain=domain, **kwargs)
+        return result, [str(x.message) for x in w]
+
+    def test_ignore(self):
+        result, messages = self.claret('ignore')
+        self.assertLess(result.n_eff, 15000)
+        self.assertEqual(result.n, result.n_eff)
+        self.assertTrue(any('outside the grid' in m for m in messages))
+
+    def test_truncate(self):
+        result, messages = self.claret('truncate')
+        self.assertEqual(result.n_eff, 20000)
+        self.assertEqual(messages, [])
+        self.assertGreater(result.p_inside, 0.4)
+        self.assertLess(result.p_inside, 0.6)
+        ignored, _ = self.claret('ignore')
+        # both sample the part of the distribution inside the grid
+        np.testing.assert_allclose(result.mean, ignored.mean, atol=3e-3)
+
+    def test_clamp(self):
+        result, _ = self.claret('clamp')
+        self.assertEqual(result.n_eff, 20000)
+        result, _ = self.claret('clamp', propagation='unscented')
+        self.assertTrue(np.all(np.isfinite(result.mean)))
+
+    def test_raise(self):
+        with self.assertRaises(ValueError):
+            self.claret('raise')
+        result = limbdark.claret('Kp', 5500, 100, 4.4, 0.1, 0.0, 0.1, n=100, domain='raise', full_output=True)
+        self.assertGreater(result.p_inside, 0.999)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.claret('nothing')
+        with self.assertRaises(ValueError):
+            self.claret('truncate', propagation='linear')
+
+    def test_batch(self):
+        stars = {key: np.array([value, value2]) for key, value, value2 in
+                 zip('teff uteff logg ulogg feh ufeh'.split(), EDGE[1:], [5500, 100, 4.4, 0.1, 0.0, 0.1])}
+        out = limbdark.claret_batch('Kp', stars, n=2000, kind='regular', seed=0, domain='truncate')
+        np.testing.assert_array_equal(out['n_eff'], [2000, 2000])
+        out = limbdark.claret_batch('Kp', stars, n=2000, kind='regular', seed=0, sampler='sobol', domain='truncate')
+        np.testing.assert_array_equal(out['n_eff'], [2000, 2000])
+        out = limbdark.claret_batch('Kp', stars, n=2000, kind='regular', seed=0)
+        self.assertLess(out['n_eff'][0], 1500)
+        with self.assertRaises(ValueError):
+            limbdark.claret_batch('Kp', stars, n=10, domain='raise')
+
+    def test_tess(self):
+        # cool='auto' routes every sample to one grid, whose box applies to it
+        with self.assertRaises(ValueError):
+            limbdark.claret(*METAL_POOR, n=100, domain='raise')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            ignored = limbdark.claret(*METAL_POOR, n=20000, kind='regular', seed=1, full_output=True)
+        p = ndtr(0.1 / 0.3)
+        for domain in ['truncate', 'clamp']:
+            result = limbdark.claret(*METAL_POOR, n=20000, kind='regular', seed=1, full_output=True, domain=domain)
+            self.assertEqual(result.n_eff, 20000)
+            self.assertAlmostEqual(result.p_inside, p)
+        np.testing.assert_allclose(result.mean, ignored.mean, atol=3e-3)
+
+        # the PHOENIX-COND grid reaches logg 6, above the ATLAS grid
+        result = limbdark.claret('T', 3100, 50, 5.3, 0.05, 0.0, 0.1, n=1000, seed=1, domain='raise', full_output=True)
+        self.assertGreater(result.p_inside, 0.999)
+        stars = {key: np.array([value]) for key, value in zip('teff uteff logg ulogg feh ufeh'.split(), METAL_POOR[1:])}
+        with self.assertRaises(ValueError):
+            limbdark.claret_batch('T', stars, n=10, domain='raise')
+        out = limbdark.claret_batch('T', stars, n=2000, kind='regular', seed=0, domain='truncate')
+        np.testing.assert_array_equal(out['n_eff'], [2000])
+
+        chain = np.random.default_rng(0).normal(METAL_POOR[1::2], METAL_POOR[2::2], size=(2000, 3))
+        with self.assertRaises(ValueError):
+            limbdark.claret_chain('T', chain, domain='raise')
+        result = limbdark.claret_chain('T', chain, kind='regular', domain='clamp', full_output=True)
+        self.assertEqual(result.n_eff, 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Unit tests for the vector-valued interpolator engines.
+"""
+
+import unittest
+import numpy as np
+from scipy.interpolate import LinearNDInterpolator, NearestNDInterpolator
+from limbdark.engines import LinearEngine, NearestEngine, RegularEngine
+from limbdark.util import get_grid, get_interpolator, get_interpolators
+
+
+class TestEngines(unittest.TestCase):
+    """Engines should reproduce scipy's scalar interpolators for every coefficient."""
+
+    @classmethod
+    def setUpClass(cls):
+        grid = get_grid('T', 'nonlinear')
+        cls.points = np.column_stack([grid[key] for key in 'teff logg feh'.split()])
+        cls.values = np.column_stack([grid[key] for key in 'u1 u2 u3 u4'.split()])
+        rng = np.random.default_rng(42)
+        cls.xi = rng.uniform([4000, 4.0, -0.5], [7000, 5.0, 0.5], size=(2000, 3))
+        # include queries far outside the grid and near its holes
+        cls.far = rng.uniform([2000, -1.0, -6.0], [60000, 6.0, 2.0], size=(2000, 3))
+
+    def test_linear_matches_scipy(self):
+        engine = LinearEngine(self.points, self.values)
+        expected = LinearNDInterpolator(self.points, self.values, rescale=True)(self.xi)
+        result = engine(self.xi[:, 0], self.xi[:, 1], self.xi[:, 2])
+        self.assertEqual(result.shape, (len(self.xi), 4))
+        np.testing.assert_allclose(result, expected, atol=1e-12)
+
+    def test_nearest_matches_scipy(self):
+        engine = NearestEngine(self.points, self.values)
+        expected = NearestNDInterpolator(self.points, self.values, rescale=True)(self.xi)
+        result = engine(self.xi[:, 0], self.xi[:, 1], self.xi[:, 2])
+        np.testing.assert_array_equal(result, expected)
+        expected = NearestNDInterpolator(self.points, self.values, rescale=True)(self.far)
+        np.testing.assert_array_equal(engine(*self.far.T), expected)
+        self.assertIsNotNone(engine._tree)
+
+    def test_nearest_without_tree(self):
+        engine = NearestEngine(self.points, self.values)
+        engine(5000, 4.5, 0.0)
+        self.assertIsNone(engine._tree)
+
+    def test_outside_hull_is_nan(self):
+        engine = LinearEngine(self.points, self.values)
+        result = engine(1000, 4.5, 0.0)
+        self.assertEqual(result.shape, (4,))
+        self.assertTrue(np.all(np.isnan(result)))
+
+    def test_linear_nbytes(self):
+        engine = LinearEngine(self.points, self.values)
+        tri = engine.tri
+        # the engine's points are the triangulation's, not a copy
+        self.assertIs(engine.points, tri.points)
+        held = tri.points.nbytes + engine.values.nbytes + sum(a.nbytes for a in [
+            tri.simplices, tri.neighbors, tri.equations, tri.transform, tri.coplanar])
+        self.assertEqual(engine.nbytes, held)
+        # computed on first use, and counted from then on
+        vertex_to_simplex = tri.vertex_to_simplex
+        self.assertEqual(engine.nbytes, held + vertex_to_simplex.nbytes)
+
+    def test_broadcasting(self):
+        engine = get_interpolator('T', law='quadratic')
+        X, Y = np.meshgrid(np.linspace(4500, 5500, 5), np.linspace(4, 5, 3))
+        self.assertEqual(engine(X, Y, 0.0).shape, (3, 5, 2))
+
+    def test_component_interpolators_share_engine(self):
+        interps = get_interpolators('T', law='quadratic')
+        self.assertEqual(len(interps), 2)
+        self.assertIs(interps[0].args[0], interps[1].args[0])
+
+    def test_degenerate_axis(self):
+        """The PHOENIX-COND TESS grids only have Solar metallicity; feh is ignored."""
+        engine = get_interpolator('T', law='quadratic', cool=True)
+        a = engine(3000, 5.0, 0.0)
+        b = engine(3000, 5.0, 0.3)
+        self.assertTrue(np.all(np.isfinite(a)))
+        np.testing.assert_array_equal(a, b)
+
+
+class TestRegularEngine(unittest.TestCase):
+    """Trilinear interpolation on the dense grid cube."""
+
+    @classmethod
+    def setUpClass(cls):
+        grid = get_grid('T', 'quadratic')
+        cls.nodes = np.column_stack([grid['teff'], grid['logg'], grid['feh']])
+        cls.node_values = np.column_stack([grid['u1'], grid['u2']])
+        cls.regular = get_interpolator('T', kind='regular')
+        cls.linear = get_interpolator('T', kind='linear')
+
+    def test_matches_linear_at_nodes(self):
+        teff, logg, feh = self.nodes.T
+        np.testing.assert_allclose(self.regular(teff, logg, feh), self.node_values, atol=1e-12)
+        np.testing.assert_allclose(self.regular(teff, logg, feh), self.linear(teff, logg, feh), atol=1e-10)
+
+    def test_trilinear_in_cell(self):
+        points = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0],
+                           [0, 0, 1], [1, 0, 1], [0, 1, 1], [1, 1, 1]], dtype=float)
+        values = points @ [1.0, 2.0, 3.0] + points.prod(axis=1)
+        engine = RegularEngine(points, values)
+        self.assertAlmostEqual(float(engine(0.5, 0.5, 0.5)[0]), 3.0 + 0.125)
+        self.assertAlmostEqual(float(engine(0.25, 1.0, 0.0)[0]), 2.25)
+
+    def test_holes_and_bounds(self):
+        points = np.array([[0, 0, 0], [1, 0, 0], [2, 0, 0], [0, 1, 0], [1, 1, 0]], dtype=float)
+        engine = RegularEngine(points, np.arange(5.0))
+        self.assertTrue(engine.mask[2, 1, 0])
+        self.assertAlmostEqual(float(engine(0.5, 0.5, 0.0)[0]), 2.0)
+        self.assertAlmostEqual(float(engine(2.0, 0.0, 0.0)[0]), 2.0)
+        self.assertTrue(np.isnan(engine(1.5, 0.5, 0.0)[0]))
+        self.assertTrue(np.isnan(engine(-0.1, 0.5, 0.0)[0]))
+
+    def test_construction_without_triangulation(self):
+        self.assertFalse(hasattr(self.regular, 'tri'))
+        self.assertEqual(self.regular.values.shape, (np.prod(self.regular.shape), 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
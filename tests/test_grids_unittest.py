@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Unit tests for loading the coefficient tables through the binary grid cache.
+"""
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from unittest import mock
+from limbdark import util
+
+
+class TestGridCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {'LIMBDARK_CACHE_DIR': os.path.join(self.tmp, 'cache')})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.tmp)
+
+    def write_source(self, rows):
+        fp = os.path.join(self.tmp, 'table.csv.gz')
+        with gzip.open(fp, 'wt') as f:
+            f.write('logg,teff,feh,u,band\n')
+            for row in rows:
+                f.write(','.join(map(str, row)) + '\n')
+        return fp
+
+    def test_compiles_then_memory_maps(self):
+        fp = self.write_source([(4.5, 5000, 0.0, 0.6, 'V'), (4.5, 5000, 0.0, 0.5, 'z*')])
+        first = util.load_table(fp, band='z*')
+        self.assertNotIsInstance(first, np.memmap)
+        second = util.load_table(fp, band='z*')
+        self.assertIsInstance(second, np.memmap)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(second['band'][0], 'z*')
+        self.assertEqual(float(util.load_table(fp, band='V')['u'][0]), 0.6)
+
+    def test_invalidated_when_source_changes(self):
+        fp = self.write_source([(4.5, 5000, 0.0, 0.6, 'V')])
+        self.assertEqual(float(util.load_table(fp, band='V')['u'][0]), 0.6)
+        fp = self.write_source([(4.5, 5000, 0.0, 0.7, 'V'), (4.0, 5000, 0.0, 0.8, 'V')])
+        os.utime(fp, ns=(0, 123456789))
+        grid = util.load_table(fp, band='V')
+        self.assertEqual(len(grid), 2)
+        # the earlier version may still be in use by another install
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp, 'cache', 'grids'))), 2)
+
+    def test_shared_between_installs(self):
+        fp = self.write_source([(4.5, 5000, 0.0, 0.6, 'V')])
+        util.load_table(fp, band='V')
+        # the same data installed elsewhere, with another modification time
+        other = os.path.join(self.tmp, 'other')
+        os.makedirs(other)
+        copy = shutil.copy(fp, os.path.join(other, 'table.csv.gz'))
+        os.utime(copy, ns=(0, 123456789))
+        self.assertIsInstance(util.load_table(copy, band='V'), np.memmap)
+        self.assertEqual(util._source_digest(copy), util._source_digest(fp))
+
+    def test_older_formats_removed(self):
+        fp = self.write_source([(4.5, 5000, 0.0, 0.6, 'V')])
+        grids = os.path.join(self.tmp, 'cache', 'grids')
+        os.makedirs(os.path.join(grids, 'table-v0-0123456789abcdef'))
+        util.load_table(fp, band='V')
+        self.assertEqual(os.listdir(grids), ['table-v{}-{}'.format(util.GRID_FORMAT, util._source_digest(fp))])
+
+    def test_disabled(self):
+        fp = self.write_source([(4.5, 5000, 0.0, 0.6, 'V')])
+        with mock.patch.dict(os.environ, {'LIMBDARK_CACHE_DIR': ''}):
+            util.load_table(fp, band='V')
+            # parsed once per process
+            with mock.patch.object(util, '_read_csv', side_effect=AssertionError):
+                self.assertEqual(float(util.load_table(fp, band='V')['u'][0]), 0.6)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'cache')))
+
+    def test_text_columns(self):
+        fp = self.write_source([(4.5, 5000, 0.0, 0.6, '"z*"'), (4.0, 5000, 0.0, 0.5, 'Kp')])
+        table = util._read_csv(fp)
+        self.assertEqual(table.dtype['band'], np.dtype('U2'))
+        self.assertEqual(table['band'].tolist(), ['z*', 'Kp'])
+        fp = self.write_source([(4.5, 5000, 0.0, 0.6, 'Strömgren')])
+        self.assertEqual(util._read_csv(fp)['band'][0], 'Strömgren')
+
+    def test_packaged_grid(self):
+        grid = util.load_grid('T', 'quadratic')
+        df = util.get_df('T', 'quadratic')
+        self.assertEqual(len(grid), len(df))
+        np.testing.assert_array_equal(df.u1.values, grid['u1'])
+
+
+class TestGridSelection(unittest.TestCase):
+
+    def assert_unique_nodes(self, grid):
+        nodes = np.column_stack([grid['teff'], grid['logg'], grid['feh']])
+        self.assertEqual(len(np.unique(nodes, axis=0)), len(nodes))
+
+    def test_default_selection(self):
+        grid = util.get_grid('Kp', 'quadratic')
+        self.assert_unique_nodes(grid)
+        self.assertTrue(np.all(grid['xi'] == 2.0))
+        self.assertTrue(np.all(grid['method'] == 'L'))
+        self.assertTrue(np.all(grid['model'] == 'ATLAS'))
+        self.assertLess(len(grid), len(util.load_grid('Kp', 'quadratic')))
+
+    def test_explicit_selection(self):
+        grid = util.get_grid('V', 'quadratic', xi=4, method='F', model='ATLAS')
+        self.assert_unique_nodes(grid)
+        self.assertTrue(np.all(grid['method'] == 'F'))
+        phoenix = util.get_grid('V', 'quadratic', model='PHOENIX')
+        self.assert_unique_nodes(phoenix)
+        self.assertEqual(phoenix['teff'].min(), 2000)
+
+    def test_tess_tables(self):
+        self.assert_unique_nodes(util.get_grid('T', 'nonlinear'))
+        cool = util.get_grid('T', 'nonlinear', cool=True)
+        self.assert_unique_nodes(cool)
+        self.assertTrue(np.all(cool['feh'] == 0))
+        with self.assertRaises(ValueError):
+            util.get_grid('T', 'quadratic', method='F')
+
+    def test_unknown_selection(self):
+        with self.assertRaises(ValueError):
+            util.get_grid('Kp', 'quadratic', xi=3)
+
+    def test_selection_keys_cache(self):
+        from limbdark.interpolator import LDInterpolator
+        a = LDInterpolator('V', kind='nearest', method='L')
+        b = LDInterpolator('V', kind='nearest', method='F')
+        c = LDInterpolator('V', kind='nearest')
+        self.assertIsNot(a.engine, b.engine)
+        self.assertIs(a.engine, c.engine)
+        self.assertEqual(c.selection, dict(xi=2.0, method='L', model='ATLAS'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Import-time regression tests for the command line: a warm-cache call must not
+load pandas or scipy, and should print its result shortly after numpy is loaded.
+"""
+
+import sys
+import json
+import unittest
+import subprocess
+
+SCRIPT = """
+import io, sys, json, time, contextlib
+import numpy
+start = time.perf_counter()
+from limbdark.cli import main
+imported = time.perf_counter() - start
+with contextlib.redirect_stdout(io.StringIO()) as out:
+    main(['--teff', '5500,100', '--logg', '4.4,0.1', '--feh', '0,0.1', '-n', '1000'])
+total = time.perf_counter() - start
+modules = sorted(m for m in sys.modules if m.split('.')[0] in ('pandas', 'scipy'))
+print(json.dumps(dict(imported=imported, total=total, modules=modules, output=out.getvalue())))
+"""
+
+
+def run_cli():
+
+    result = subprocess.run([sys.executable, '-c', SCRIPT], stdout=subprocess.PIPE, check=True)
+    return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+
+class TestImport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # first call compiles the grid cache, if needed
+        run_cli()
+        cls.result = run_cli()
+
+    def test_output(self):
+        self.assertIn('u1 = ', self.result['output'])
+
+    def test_no_heavy_imports(self):
+        self.assertEqual(self.result['modules'], [])
+
+    def test_startup_time(self):
+        # tens of milliseconds on a typical machine; generous bounds for slow CI
+        self.assertLess(self.result['imported'], 1.0)
+        self.assertLess(self.result['total'], 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
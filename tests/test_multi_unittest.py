@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Unit tests for multi-band, multi-law evaluation on shared samples.
+"""
+
+import unittest
+import numpy as np
+import limbdark
+from limbdark.engines import RegularEngine, SharedEngine, SplitEngine
+from limbdark.util import get_grid, get_shared_interpolator
+
+STAR = (5500, 100, 4.4, 0.1, 0.0, 0.1)
+BANDS = ['Kp', 'V', 'z*']
+
+
+class TestSharedEngine(unittest.TestCase):
+
+    def test_shared_nodes(self):
+        grids = [dict(band=band, law='quadratic') for band in BANDS] + [dict(band='T', law='quadratic', cool='auto')]
+        engine = get_shared_interpolator(grids, kind='regular')
+        self.assertIsInstance(engine, SharedEngine)
+        # the Claret+2011 bands share one engine, T switches between two grids
+        self.assertEqual(len(engine.groups), 2)
+        self.assertEqual(len(engine.groups[0][1]), 3)
+        self.assertIsInstance(engine.groups[1][0], SplitEngine)
+        self.assertEqual(engine.ncoef, 8)
+
+        xi = np.array([[5500, 4.4, 0.0], [5012, 4.13, -0.2], [4000, 4.9, 0.3]])
+        out = engine(*xi.T)
+        for i, band in enumerate(BANDS):
+            expected = limbdark.LDInterpolator(band, kind='regular').evaluate(*xi.T)
+            np.testing.assert_allclose(out[:, 2 * i:2 * i + 2], expected, rtol=1e-12)
+
+    def test_layout(self):
+        grid = get_grid('V', 'quadratic')
+        points = np.column_stack([grid[key] for key in 'teff logg feh'.split()])
+        u1, u2 = grid['u1'], grid['u2']
+        engine = RegularEngine(points, u1)
+        other = RegularEngine(points, u2)
+        np.testing.assert_array_equal(engine.layout(u2), other.values)
+
+
+class TestClaretMulti(unittest.TestCase):
+
+    def test_matches_claret(self):
+        out = limbdark.claret_multi(BANDS, *STAR, n=5000, kind='regular', seed=0)
+        self.assertEqual(list(out), BANDS)
+        for band in BANDS:
+            np.testing.assert_allclose(out[band], limbdark.claret(band, *STAR, n=5000, kind='regular', seed=0), rtol=1e-12)
+
+    def test_cross_band_covariance(self):
+        result = limbdark.claret_multi(BANDS, *STAR, n=5000, seed=0, full_output=True)
+        self.assertEqual(result.names, ['Kp_u1', 'Kp_u2', 'V_u1', 'V_u2', 'z*_u1', 'z*_u2'])
+        self.assertEqual(result.cov.shape, (6, 6))
+        np.testing.assert_allclose(result.cov, result.cov.T)
+        self.assertGreater(result.corr[0, 2], 0.9)
+
+    def test_laws(self):
+        out = limbdark.claret_multi(['Kp', 'T'], *STAR, laws=['linear', 'nonlinear'], n=2000, seed=0)
+        self.assertEqual(list(out), [('Kp', 'linear'), ('Kp', 'nonlinear'), ('T', 'linear'), ('T', 'nonlinear')])
+        self.assertIsInstance(out[('Kp', 'linear')], tuple)
+        self.assertEqual(len(out[('T', 'nonlinear')]), 8)
+        np.testing.assert_allclose(out[('T', 'nonlinear')], limbdark.claret('T', *STAR, law='nonlinear', n=2000, seed=0))
+
+    def test_deterministic(self):
+        result = limbdark.claret_multi(BANDS, *STAR, kind='regular', propagation='unscented', transform=True, full_output=True)
+        self.assertEqual(result.names[:2], ['Kp_q1', 'Kp_q2'])
+        expected = limbdark.claret('V', *STAR, kind='regular', propagation='unscented', transform=True, full_output=True)
+        np.testing.assert_allclose(result.mean[2:4], expected.mean, rtol=1e-12)
+
+    def test_cache(self):
+        limbdark.claret_multi(BANDS, *STAR, n=100)
+        hits = limbdark.cache_info()['hits']
+        limbdark.claret_multi(BANDS, *STAR, n=100)
+        self.assertEqual(limbdark.cache_info()['hits'], hits + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Unit tests for compact grids and single-precision evaluation.
+"""
+
+import unittest
+import numpy as np
+import limbdark
+from limbdark.util import compact_grid, get_grid, get_interpolator, get_shared_interpolator
+
+STAR = (5500, 100, 4.4, 0.1, 0.0, 0.1)
+EPS = np.finfo(np.float32).eps
+
+
+class TestCompactGrid(unittest.TestCase):
+
+    def test_matches_grid(self):
+        grid = get_grid('V', 'nonlinear', xi=1.0)
+        points, values = compact_grid('V', 'nonlinear', xi=1.0)
+        self.assertEqual(points.dtype, np.float32)
+        self.assertEqual(values.shape, (len(grid), 4))
+        self.assertTrue(points.flags.c_contiguous and values.flags.c_contiguous)
+        np.testing.assert_array_equal(values[:, 2], grid['u3'].astype(np.float32))
+        np.testing.assert_array_equal(points[:, 0], grid['teff'])
+
+        points, values = compact_grid('T', 'quadratic', cool=True, dtype='float64')
+        np.testing.assert_array_equal(values[:, 1], get_grid('T', 'quadratic', cool=True)['u2'])
+
+    def test_one_grid(self):
+        for function in [compact_grid, get_grid]:
+            with self.assertRaises(ValueError):
+                function('T', 'quadratic', cool='auto')
+        # other bands have a single grid
+        np.testing.assert_array_equal(compact_grid('V', 'quadratic', cool='auto')[1], compact_grid('V', 'quadratic')[1])
+
+
+class TestFloat32(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(1)
+        cls.xi = rng.uniform([2500, 0.0, -5.0], [40000, 5.0, 1.0], size=(20000, 3)).T
+
+    def check(self, double, single):
+        a, b = double(*self.xi), single(*self.xi)
+        self.assertEqual(b.dtype, np.float32)
+        np.testing.assert_array_equal(np.isnan(a), np.isnan(b))
+        # the bound documented in claret()
+        scale = np.nanmax(np.abs(a), axis=0)
+        self.assertTrue(np.all(np.nanmax(np.abs(a - b), axis=0) <= 4 * EPS * scale))
+
+    def test_engines(self):
+        for kind in ['nearest', 'regular']:
+            for band, law, cool in [('Kp', 'quadratic', False), ('T', 'nonlinear', 'auto'), ('u', 'squareroot', False)]:
+                double = get_interpolator(band, kind=kind, law=law, cool=cool)
+                single = get_interpolator(band, kind=kind, law=law, cool=cool, dtype='float32')
+                self.assertIsNot(double, single)
+                self.check(double, single)
+
+        double = get_interpolator('Kp', kind='regular', law='nonlinear')
+        single = get_interpolator('Kp', kind='regular', law='nonlinear', dtype=np.float32)
+        self.assertEqual(single.nbytes * 2, double.nbytes + sum(axis.nbytes for axis in double.grid))
+
+    def test_shared(self):
+        grids = [dict(band=band, law='quadratic', cool='auto') for band in ['Kp', 'T']]
+        double = get_shared_interpolator(grids, kind='regular')
+        single = get_shared_interpolator([dict(grid, dtype='float32') for grid in grids], kind='regular')
+        self.check(double, single)
+
+    def test_claret(self):
+        double = limbdark.claret('T', *STAR, law='nonlinear', n=5000, kind='regular', seed=0)
+        single = limbdark.claret('T', *STAR, law='nonlinear', n=5000, kind='regular', seed=0, dtype='float32')
+        np.testing.assert_allclose(single, double, rtol=1e-5, atol=1e-6)
+
+        table = dict(teff=[5500, 3300], uteff=[100, 50], logg=[4.4, 4.9], ulogg=[0.1, 0.1], feh=[0.0, 0.0], ufeh=[0.1, 0.1])
+        double = limbdark.claret_batch('T', table, n=1000, kind='regular', seed=0)
+        single = limbdark.claret_batch('T', table, n=1000, kind='regular', seed=0, dtype='float32')
+        np.testing.assert_allclose(single['u1'], double['u1'], rtol=1e-5)
+        self.assertEqual(single['u1'].dtype, float)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            get_interpolator('Kp', kind='nearest', dtype='float16')
+
+
+if __name__ == "__main__":
+    unittest.main()
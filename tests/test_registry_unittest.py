@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Unit tests for the grid source registry and limbdark ingest.
+"""
+
+import io
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+import contextlib
+import numpy as np
+import limbdark
+from limbdark import registry
+from limbdark.cli import main
+from limbdark.ingest import ingest, read_table
+from limbdark.util import get_grid, get_interpolator
+
+STAR = (5500, 100, 4.4, 0.1, 0.0, 0.1)
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_builtins(self):
+        self.assertEqual(registry.sources()[:3], ['claret2011', 'claret2017', 'claret2017-cool'])
+        self.assertEqual(registry.default_source('T', cool=True), 'claret2017-cool')
+        self.assertIn('V', registry.lookup('claret2011').bands)
+        explicit = limbdark.claret('Kp', *STAR, n=1000, seed=0, source='claret2011')
+        np.testing.assert_allclose(explicit, limbdark.claret('Kp', *STAR, n=1000, seed=0))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            registry.lookup('no-such-source')
+        with self.assertRaises(ValueError):
+            limbdark.claret('T', *STAR, n=10, source='claret2011')
+        with self.assertRaises(ValueError):
+            registry.register(registry.lookup('claret2011'))
+
+
+    def test_registered_in_workers(self):
+        limbdark.claret('Kp', *STAR, n=2000, chunksize=1000, seed=0, workers=2)
+        # registered after the worker pool started
+        registry.register(registry.PackagedSource('kp-workers', ['Kp'], {'quadratic': 'claret+2011_quadratic.csv.gz'}, by_band=True),
+                          replace=True)
+        try:
+            result = limbdark.claret('Kp', *STAR, n=2000, chunksize=1000, seed=0, workers=2, source='kp-workers')
+            np.testing.assert_allclose(result, limbdark.claret('Kp', *STAR, n=2000, chunksize=1000, seed=0))
+        finally:
+            del registry._sources['kp-workers']
+
+class TestIngest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.environ = os.environ.get('LIMBDARK_GRIDS_DIR')
+        os.environ['LIMBDARK_GRIDS_DIR'] = os.path.join(cls.tmp, 'grids')
+        cls.grid = get_grid('Kp', 'quadratic')
+        cls.csv = os.path.join(cls.tmp, 'kp.csv')
+        with open(cls.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Teff', 'logg', '[Fe/H]', 'u1', 'u2'])
+            for row in cls.grid:
+                writer.writerow([row['teff'], row['logg'], row['feh'], row['u1'], row['u2']])
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.environ is None:
+            del os.environ['LIMBDARK_GRIDS_DIR']
+        else:
+            os.environ['LIMBDARK_GRIDS_DIR'] = cls.environ
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_matches_packaged(self):
+        source = ingest(self.csv, 'kp-copy', 'quadratic', band='Kp', reference='Claret & Bloemen 2011')
+        self.assertEqual(source.bands, ['Kp'])
+        self.assertEqual(source.info['reference'], 'Claret & Bloemen 2011')
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp, 'grids', 'kp-copy', 'quadratic', 'Kp.npy')))
+        for kind in ['nearest', 'regular']:
+            ingested = limbdark.claret('Kp', *STAR, n=2000, kind=kind, seed=0, source='kp-copy')
+            np.testing.assert_allclose(ingested, limbdark.claret('Kp', *STAR, n=2000, kind=kind, seed=0), rtol=1e-12)
+        with self.assertRaises(ValueError):
+            limbdark.claret('Kp', *STAR, n=10, law='linear', source='kp-copy')
+
+    def test_vizier(self):
+        path = os.path.join(self.tmp, 'table.tsv')
+        rows = self.grid[:200]
+        with open(path, 'w') as f:
+            f.write('#RESOURCE=yCat_35290075\n#Title: Claret & Bloemen 2011\n')
+            f.write('logg\tTeff\tZ\txi\ta\tb\tFilt\tMet\tMod\n')
+            f.write('[cm/s2]\tK\t[Sun]\tkm/s\t\t\t\t\t\n')
+            f.write('----\t-----\t----\t--\t------\t------\t--\t-\t--\n')
+            for row in rows:
+                f.write('\t'.join(map(str, [row['logg'], row['teff'], row['feh'], row['xi'], row['u1'], row['u2'], 'Kp', 'L', 'A'])) + '\n')
+
+        table = read_table(path)
+        self.assertEqual(len(table), 200)
+        source = ingest(path, 'vizier-copy', 'quadratic')
+        self.assertEqual(source.selection, dict(xi=2.0, method='L', model='ATLAS'))
+        stored = np.load(os.path.join(source.directory, 'quadratic', 'Kp.npy'))
+        np.testing.assert_array_equal(stored['u1'], rows['u1'])
+        self.assertEqual(stored['model'][0], 'ATLAS')
+
+        with self.assertRaises(ValueError):
+            ingest(path, 'renamed', 'quadratic', columns=dict(teff='T'))
+        with self.assertRaises(ValueError):
+            ingest(path, 'claret2011', 'quadratic')
+
+    def test_ingest_again(self):
+        path = os.path.join(self.tmp, 'doubled.csv')
+        with open(self.csv) as f, open(path, 'w', newline='') as out:
+            writer = csv.writer(out)
+            for i, row in enumerate(csv.reader(f)):
+                writer.writerow(row if i == 0 else row[:3] + [2 * float(row[3]), row[4]])
+
+        ingest(self.csv, 'kp-again', 'quadratic', band='Kp')
+        before = limbdark.claret('Kp', *STAR, n=4000, chunksize=1000, seed=0, workers=2, source='kp-again')
+        ingest(path, 'kp-again', 'quadratic', band='Kp')
+        # the worker processes must not keep the engines or the registration of the first version
+        after = limbdark.claret('Kp', *STAR, n=4000, chunksize=1000, seed=0, workers=2, source='kp-again')
+        np.testing.assert_allclose(after, limbdark.claret('Kp', *STAR, n=4000, chunksize=1000, seed=0, source='kp-again'))
+        self.assertAlmostEqual(after[0], 2 * before[0])
+
+    def test_replaced_elsewhere(self):
+        source = ingest(self.csv, 'kp-elsewhere', 'quadratic', band='Kp')
+        engine = get_interpolator('Kp', kind='nearest', source='kp-elsewhere')
+        self.assertIs(get_interpolator('Kp', kind='nearest', source='kp-elsewhere'), engine)
+        # as another process ingesting it again would
+        fn = os.path.join(source.directory, 'quadratic', 'Kp.npy')
+        table = np.load(fn)
+        table['u1'] *= 2
+        np.save(fn, table)
+        replaced = get_interpolator('Kp', kind='nearest', source='kp-elsewhere')
+        np.testing.assert_allclose(replaced(5500, 4.5, 0.0)[0], 2 * engine(5500, 4.5, 0.0)[0])
+
+    def test_band_with_separator(self):
+        path = os.path.join(self.tmp, 'sdss.csv')
+        with open(self.csv) as f, open(path, 'w', newline='') as out:
+            writer = csv.writer(out)
+            for i, row in enumerate(csv.reader(f)):
+                writer.writerow(row + ['band'] if i == 0 else row + ['SDSS/u'])
+
+        source = ingest(path, 'sdss', 'quadratic', columns={'feh': '[Fe/H]'})
+        self.assertEqual(source.bands, ['SDSS/u'])
+        self.assertEqual(os.listdir(os.path.join(source.directory, 'quadratic')), ['SDSS%2Fu.npy'])
+        result = limbdark.claret('SDSS/u', *STAR, n=1000, kind='nearest', seed=0, source='sdss')
+        np.testing.assert_allclose(result, limbdark.claret('Kp', *STAR, n=1000, kind='nearest', seed=0))
+
+    def test_cli(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            main(['ingest', self.csv, '--name', 'cli-copy', '--band', 'Kp', '--columns', 'feh=[Fe/H]'])
+        self.assertIn('1 quadratic table(s) for bands Kp', out.getvalue())
+
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            main(['ingest', '--list'])
+        self.assertIn('cli-copy: 1 bands, laws quadratic', out.getvalue())
+
+        # a fresh process finds the source in LIMBDARK_GRIDS_DIR by name
+        del registry._sources['cli-copy']
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            main(['--band', 'Kp', '--teff', '5500,100', '--logg', '4.4,0.1', '--feh', '0,0.1', '--source', 'cli-copy'])
+        self.assertTrue(out.getvalue())
+
+    def test_output_directory(self):
+        output = os.path.join(self.tmp, 'elsewhere')
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            main(['ingest', self.csv, '--name', 'kp-output', '--band', 'Kp', '--output', output])
+        path = os.path.join(output, 'kp-output')
+        self.assertIn('--source ' + path, out.getvalue())
+
+        # found by path, also in a fresh process
+        del registry._sources['kp-output']
+        with self.assertRaises(ValueError):
+            registry.lookup('kp-output')
+        self.assertEqual(registry.lookup(path).directory, path)
+        del registry._sources[path]
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            main(['--band', 'Kp', '--teff', '5500,100', '--logg', '4.4,0.1', '--feh', '0,0.1', '--source', path])
+        self.assertIn('u1 = ', out.getvalue())
+
+    def test_unknown_source(self):
+        for source in ['no-such-source', os.path.join(self.tmp, 'no-such-source')]:
+            with contextlib.redirect_stderr(io.StringIO()) as err, self.assertRaises(SystemExit):
+                main(['--band', 'Kp', '--teff', '5500,100', '--logg', '4.4,0.1', '--feh', '0,0.1', '--source', source])
+            self.assertIn('no-such-source', err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
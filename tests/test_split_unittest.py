@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Unit tests for per-sample switching between the TESS PHOENIX-COND and ATLAS grids.
+"""
+
+import io
+import unittest
+import warnings
+import contextlib
+import numpy as np
+import limbdark
+from limbdark.engines import SplitEngine
+from limbdark.util import get_interpolator, COOL_TEFF
+
+# a TESS M dwarf whose Teff prior straddles the switch between the grids
+STAR = ('T', 3450, 150, 4.8, 0.1, 0.0, 0.1)
+
+
+class TestSplitEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cool = get_interpolator('T', kind='regular', cool=True)
+        cls.hot = get_interpolator('T', kind='regular', cool=False)
+
+    def test_routing(self):
+        engine = get_interpolator('T', kind='regular', cool='auto')
+        self.assertIsInstance(engine, SplitEngine)
+        teff = np.array([3000.0, 3499.0, 3500.0, 5000.0])
+        out = engine(teff, 4.8, 0.0)
+        np.testing.assert_array_equal(out[:2], self.cool(teff[:2], 4.8, 0.0))
+        np.testing.assert_array_equal(out[2:], self.hot(teff[2:], 4.8, 0.0))
+        self.assertTrue(np.all(np.isnan(engine(np.nan, 4.8, 0.0))))
+
+    def test_blend(self):
+        engine = SplitEngine(self.cool, self.hot, boundary=COOL_TEFF, blend=200)
+        np.testing.assert_array_equal(engine.weight([3400, 3500, 3550, 3700, 3800]), [0, 0, 0.25, 1, 1])
+        # continuous across both ends of the blend zone
+        teff = np.array([3499.9, 3500.1, 3699.9, 3700.1])
+        out = engine(teff, 4.8, 0.0)
+        np.testing.assert_allclose(out[0], out[1], atol=1e-3)
+        np.testing.assert_allclose(out[2], out[3], atol=1e-3)
+        expected = 0.75 * self.cool(3550, 4.8, 0.0) + 0.25 * self.hot(3550, 4.8, 0.0)
+        np.testing.assert_allclose(engine(3550, 4.8, 0.0), expected)
+
+    def test_bounds(self):
+        engine = SplitEngine(self.cool, self.hot, boundary=COOL_TEFF)
+        self.assertEqual(engine.lower[0], self.cool.lower[0])
+        self.assertEqual(engine.upper[0], self.hot.upper[0])
+        self.assertEqual(engine.nbytes, self.cool.nbytes + self.hot.nbytes)
+
+
+class TestClaret(unittest.TestCase):
+
+    def test_single_pass_without_print(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            result = limbdark.claret(*STAR, n=4000, kind='regular', seed=0, full_output=True)
+            cool = limbdark.claret(*STAR, n=4000, kind='regular', seed=0, full_output=True, cool=True)
+            hot = limbdark.claret(*STAR, n=4000, kind='regular', seed=0, full_output=True, cool=False)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertGreater(result.n_eff, 3500)
+        # the mixture lies between the two grids
+        self.assertTrue(min(cool.mean[0], hot.mean[0]) < result.mean[0] < max(cool.mean[0], hot.mean[0]))
+        # most of the prior is below 3500 K, where ATLAS has no nodes
+        self.assertLess(hot.n_eff, 3000)
+
+    def test_other_bands_ignore_cool(self):
+        args = ('Kp', 5500, 100, 4.4, 0.1, 0.0, 0.1)
+        self.assertEqual(limbdark.claret(*args, n=1000, seed=0), limbdark.claret(*args, n=1000, seed=0, cool=False))
+
+    def test_batch(self):
+        stars = dict(teff=[3450.0, 3200.0], uteff=[150.0, 100.0], logg=[4.8, 4.9], ulogg=[0.1, 0.1],
+                     feh=[0.0, 0.0], ufeh=[0.1, 0.1])
+        stars = {key: np.array(value) for key, value in stars.items()}
+        out = limbdark.claret_batch('T', stars, n=4000, kind='regular', seed=0, blend=200)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            single = limbdark.claret(*STAR, n=4000, kind='regular', seed=0, blend=200, full_output=True)
+        self.assertAlmostEqual(out['u1'][0], single.mean[0], places=2)
+        self.assertGreater(out['n_eff'][0], 3500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Unit tests for the persistent result store.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+import numpy as np
+import limbdark
+from concurrent.futures import ProcessPoolExecutor
+from limbdark import store
+from limbdark.stats import LDResult
+
+
+def _put(args):
+    path, i = args
+    s = store.ResultStore(path, timeout=60)
+    s.put(store.make_key(i=i), LDResult(['u'], [float(i)], [[1.0]], 10))
+    return i
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'results.sqlite')
+        self.result = LDResult(['u1', 'u2'], [0.4, 0.2], [[0.01, -0.002], [-0.002, 0.004]], 1000,
+                               mcerr=np.array([1e-3, 2e-3]), sampler='random')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_roundtrip(self):
+        s = store.ResultStore(self.path)
+        key = store.make_key(a=1)
+        self.assertIsNone(s.get(key))
+        s.put(key, self.result)
+        result = store.ResultStore(self.path).get(key)
+        self.assertEqual(result.names, self.result.names)
+        np.testing.assert_array_equal(result.cov, self.result.cov)
+        np.testing.assert_array_equal(result.mcerr, self.result.mcerr)
+        self.assertEqual(result.sampler, 'random')
+        self.assertEqual((s.hits, s.misses, len(s)), (0, 1, 1))
+
+    def test_key(self):
+        self.assertEqual(store.make_key(a=1, b=2.0), store.make_key(b=2.0, a=1))
+        self.assertNotEqual(store.make_key(a=1), store.make_key(a=2))
+
+    def test_eviction(self):
+        s = store.ResultStore(self.path)
+        s.put('a', self.result)
+        size = s.nbytes
+        s.maxbytes = 2 * size
+        s.put('b', self.result)
+        s.get('a')
+        s.put('c', self.result)
+        # b was used least recently
+        self.assertIsNotNone(s.get('a'))
+        self.assertIsNone(s.get('b'))
+        self.assertLessEqual(s.nbytes, s.maxbytes)
+
+    def test_concurrent_writers(self):
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            list(pool.map(_put, [(self.path, i) for i in range(20)]))
+        s = store.ResultStore(self.path)
+        self.assertEqual(len(s), 20)
+        self.assertEqual(s.get(store.make_key(i=7)).mean[0], 7.0)
+
+    def test_claret(self):
+        args = ('T', 5500, 100, 4.4, 0.1, 0.0, 0.1)
+        s = store.ResultStore(self.path)
+        first = limbdark.claret(*args, n=2000, seed=1, store=s)
+        second = limbdark.claret(*args, n=2000, seed=1, store=self.path)
+        self.assertEqual(first, second)
+        self.assertEqual(len(s), 1)
+
+        limbdark.claret(*args, n=2000, seed=2, store=s)
+        limbdark.claret(*args, kind='regular', propagation='unscented', store=s)
+        self.assertEqual(len(s), 3)
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            limbdark.claret(*args, n=2000, store=s)
+        self.assertEqual(len(w), 1)
+        self.assertEqual(len(s), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()